@@ -0,0 +1,185 @@
+"""
+API HTTP de détection de véhicules
+Fichier : api.py
+
+UTILISATION :
+uvicorn api:app --host 0.0.0.0 --port 8000
+
+curl --data-binary @image.jpg -H "Content-Type: image/jpeg" "http://localhost:8000/detect?conf=0.5"
+curl -F "file=@image.jpg" "http://localhost:8000/detect?profile=fast"
+curl http://localhost:8000/metrics
+
+TEST LOCAL :
+from fastapi.testclient import TestClient
+with TestClient(api.create_app()) as client:
+    client.post("/detect", content=open("image.jpg", "rb").read())
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from PIL import UnidentifiedImageError
+
+from backends import DEFAULT_BACKEND, cpu_layout, load_replicas
+from batching import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, MicroBatcher
+from detection import (
+    CONF_FLOOR, DEFAULT_CONF, DEFAULT_PROFILE, MODEL_PATH, PROFILES, decode_image_scaled,
+    inference_params, to_records,
+)
+from inference_pool import INFERENCE_PROCESSES, InferencePool
+from metrics import (
+    METRICS_CONTENT_TYPE, SERVICE_COUNTERS, MetricsCollector, create_registry, render_metrics,
+)
+from timing import LATENCY_BUCKETS_MS, REQUEST_LATENCIES, add_model_stages, request_trace, stage
+
+# Nombre de threads d'inférence et nombre maximal de requêtes en attente
+API_WORKERS = int(os.environ.get("API_WORKERS", "2"))
+API_MAX_PENDING = int(os.environ.get("API_MAX_PENDING", "32"))
+
+
+async def read_image_bytes(request):
+    """Octets de l'image : corps brut ou champ `file` d'un envoi multipart"""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Champ 'file' manquant")
+        return await upload.read()
+    return await request.body()
+
+
+def create_app(model=None, workers=API_WORKERS, max_pending=API_MAX_PENDING,
+               max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS):
+    """Crée l'application ; `model` permet d'injecter un modèle (ou des répliques) déjà chargé"""
+    state = {
+        "model": model, "executor": None, "batcher": None, "pool": None, "pending": 0, "startup": [],
+    }
+
+    @asynccontextmanager
+    async def lifespan(app):
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="inference")
+        state["executor"] = executor
+        if state["model"] is None and INFERENCE_PROCESSES:
+            # Répliques dans des processus séparés, épinglés par le pool lui-même
+            loop = asyncio.get_running_loop()
+            state["pool"] = await loop.run_in_executor(
+                executor, InferencePool, INFERENCE_PROCESSES, DEFAULT_BACKEND, MODEL_PATH
+            )
+            state["model"], state["startup"] = state["pool"].workers, state["pool"].timer.report()
+        elif state["model"] is None:
+            loop = asyncio.get_running_loop()
+            state["model"], startup = await loop.run_in_executor(
+                executor, load_replicas, DEFAULT_BACKEND, MODEL_PATH
+            )
+            state["startup"] = startup.report()
+        # Les requêtes concurrentes sont regroupées en micro-lots devant les répliques
+        replicas = state["model"] if isinstance(state["model"], list) else [state["model"]]
+        layout = cpu_layout(len(replicas)) if state["pool"] is None else None
+        state["batcher"] = MicroBatcher(replicas, max_batch_size, max_wait_ms, layout)
+        yield
+        state["batcher"].close()
+        if state["pool"] is not None:
+            state["pool"].close()
+        executor.shutdown(wait=True)
+
+    app = FastAPI(title="Détection de Véhicules", lifespan=lifespan)
+    registry = create_registry(MetricsCollector(lambda: {
+        "batcher": state["batcher"], "pool": state["pool"], "startup": state["startup"],
+        "pending": state["pending"],
+    }))
+
+    @app.middleware("http")
+    async def count_requests(request, call_next):
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # Compté aussi quand une exception non gérée traverse l'application
+            route = request.scope.get("route")
+            SERVICE_COUNTERS.observe_request(route.path if route else "inconnue", status)
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok", "model_loaded": state["model"] is not None}
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "pending": state["pending"],
+            "batching": state["batcher"].stats(),
+            "pool": state["pool"].stats() if state["pool"] else None,
+            "startup": state["startup"],
+            "latency": {
+                "buckets_ms": list(LATENCY_BUCKETS_MS),
+                "percentiles": REQUEST_LATENCIES.percentiles(),
+                "histograms": REQUEST_LATENCIES.histograms(),
+            },
+        }
+
+    @app.get("/metrics")
+    async def metrics():
+        return Response(render_metrics(registry), media_type=METRICS_CONTENT_TYPE)
+
+    @app.post("/detect")
+    async def detect(request: Request, conf: float = Query(DEFAULT_CONF, ge=CONF_FLOOR, le=1.0),
+                     profile: str = Query(DEFAULT_PROFILE)):
+        if profile not in PROFILES:
+            raise HTTPException(
+                status_code=400, detail=f"Profil inconnu (choix : {', '.join(PROFILES)})"
+            )
+        with request_trace():
+            with stage("lecture de l'envoi"):
+                data = await read_image_bytes(request)
+            if not data:
+                raise HTTPException(status_code=400, detail="Image manquante")
+            if state["pending"] >= max_pending:
+                raise HTTPException(status_code=503, detail="Serveur saturé, réessayez plus tard")
+
+            # Décodage dans le pool de threads, inférence dans le planificateur de lots :
+            # la boucle d'événements reste libre
+            state["pending"] += 1
+            try:
+                loop = asyncio.get_running_loop()
+                # JPEG décodé directement réduit près de la taille d'entrée du modèle
+                try:
+                    with stage("décodage"):
+                        image, scale, shape = await loop.run_in_executor(
+                            state["executor"], decode_image_scaled, data, PROFILES[profile]
+                        )
+                except UnidentifiedImageError:
+                    raise HTTPException(status_code=400, detail="Format d'image non reconnu")
+                except (OSError, ValueError):
+                    # JPEG tronqué ou corrompu
+                    raise HTTPException(status_code=400, detail="Image illisible ou tronquée")
+                start = time.perf_counter()
+                detections = await asyncio.wrap_future(
+                    state["batcher"].submit(image, **inference_params(profile))
+                )
+                add_model_stages([detections], time.perf_counter() - start)
+            finally:
+                state["pending"] -= 1
+
+            with stage("sérialisation"):
+                filtered = detections.to_original(scale, shape=shape).filter(conf)
+                records = to_records(filtered)
+            SERVICE_COUNTERS.observe_detections([filtered], "api")
+        return {
+            "profile": profile,
+            "imgsz": PROFILES[profile],
+            "width": shape[1],
+            "height": shape[0],
+            "count": len(filtered),
+            "detections": records,
+        }
+
+    return app
+
+
+app = create_app()
@@ -3,11 +3,19 @@ Interface Streamlit pour la détection de véhicules
 """
 
 import streamlit as st
-from ultralytics import YOLO
-from PIL import Image
-import numpy as np
-import pandas as pd
-import os
+import time
+
+from backends import BACKENDS, DEFAULT_BACKEND
+from detection import CONF_FLOOR, DEFAULT_CONF, MODEL_PATH, decode_image_scaled, inference_params
+from metrics import SERVICE_COUNTERS
+from resources import (
+    ModelLoading, get_batcher, get_result_cache, publish_metrics, require_model_file, start_metrics,
+)
+from result_cache import make_key, model_fingerprint
+from timing import add_model_stages, request_trace, stage
+from ui import (
+    image_output_options, profile_option, show_request_timing, show_results, show_startup_report,
+)
 
 # Configuration de la page
 st.set_page_config(
@@ -58,128 +66,115 @@ with st.sidebar:
     """)
     
     st.header("⚙️ Paramètres")
+    backend = st.selectbox(
+        "Moteur d'inférence",
+        BACKENDS,
+        index=BACKENDS.index(DEFAULT_BACKEND) if DEFAULT_BACKEND in BACKENDS else 0,
+        help="PyTorch (ultralytics, fp32 ou INT8), ONNX Runtime ou OpenVINO "
+             "(exports automatiques de best.pt)"
+    )
+    profile = profile_option()
     conf_threshold = st.slider(
         "Seuil de confiance",
-        min_value=0.0,
+        # Les détections sont calculées au seuil plancher : rien à montrer en dessous
+        min_value=CONF_FLOOR,
         max_value=1.0,
-        value=0.5,
+        value=DEFAULT_CONF,
         step=0.05,
         help="Seuil minimum de confiance pour afficher les détections"
     )
+    image_format, image_quality = image_output_options()
     
     st.markdown("---")
     st.markdown("**Projet IATP - 2026**")
 
-# Fonction pour charger le modèle
-@st.cache_resource
-def load_model():
-    """Charge le modèle YOLO"""
-    model_path = "best.pt"
-    
-    if not os.path.exists(model_path):
-        st.error(f"❌ Modèle non trouvé : {model_path}")
-        st.info("Placez le fichier best.pt dans le même dossier que cette application")
-        return None
-    
-    try:
-        model = YOLO(model_path)
-        return model
-    except Exception as e:
-        st.error(f"❌ Erreur lors du chargement du modèle : {e}")
-        return None
-
-# Charger le modèle
-with st.spinner("🔄 Chargement du modèle..."):
-    model = load_model()
+# Ressources partagées entre les sessions (voir resources.py)
+result_cache = get_result_cache()
+start_metrics()
+require_model_file()
 
-if model is None:
-    st.stop()
+# L'interface s'affiche pendant que le modèle se charge
+model_loading = ModelLoading(backend)
 
-st.success("✅ Modèle chargé avec succès !")
+with request_trace() as trace:
+    # Layout en deux colonnes
+    col1, col2 = st.columns(2)
 
-# Layout en deux colonnes
-col1, col2 = st.columns(2)
-
-with col1:
-    st.header("📤 Upload d'image")
-    uploaded_file = st.file_uploader(
-        "Téléchargez une image à analyser",
-        type=['jpg', 'jpeg', 'png'],
-        help="Formats acceptés : JPG, JPEG, PNG"
-    )
+    with col1:
+        st.header("📤 Upload d'image")
+        uploaded_file = st.file_uploader(
+            "Téléchargez une image à analyser",
+            type=['jpg', 'jpeg', 'png'],
+            help="Formats acceptés : JPG, JPEG, PNG"
+        )
     
-    if uploaded_file is not None:
-        # Afficher l'image originale
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Image originale", use_container_width=True)
+        if uploaded_file is not None:
+            # Afficher l'image originale (le décodage NumPy n'a lieu qu'en cas d'inférence)
+            with stage("lecture de l'envoi"):
+                image_bytes = uploaded_file.getvalue()
+            st.image(image_bytes, caption="Image originale", use_container_width=True)
 
-with col2:
-    st.header("📊 Résultats")
+    with col2:
+        st.header("📊 Résultats")
     
-    if uploaded_file is not None:
-        if st.button("🔍 Détecter les objets", type="primary"):
-            with st.spinner("Analyse en cours..."):
-                # Convertir l'image en numpy array
-                image_np = np.array(image)
-                
-                # Prédiction
-                results = model.predict(image_np, conf=conf_threshold)
-                
-                # Afficher l'image avec détections
-                for result in results:
-                    # Sauvegarder temporairement
-                    result.save("temp_result.jpg")
-                    result_img = Image.open("temp_result.jpg")
-                    st.image(result_img, caption="Image avec détections", use_container_width=True)
-                    
-                    # Nombre de détections
-                    num_detections = len(result.boxes)
+        if uploaded_file is not None:
+            # Clé de cache : contenu de l'image, empreinte du modèle et paramètres
+            params = inference_params(profile)
+            with stage("cache des résultats"):
+                cache_key = make_key(
+                    image_bytes, model_fingerprint(MODEL_PATH), {**params, "backend": backend}
+                )
+                # Analyse déjà faite dans cette session (page réexécutée, curseur déplacé)
+                analysis = st.session_state.get("analysis", {}).get(cache_key)
+        
+            if analysis is not None:
+                st.caption("⚡ Résultats déjà calculés pour cette image (cache)")
+        
+            requested = st.button("🔍 Détecter les objets", type="primary") and analysis is None
+            if requested:
+                # Cache partagé consulté seulement à la demande : les réexécutions
+                # de la page ne comptent pas comme des échecs du cache
+                with stage("cache des résultats"):
+                    analysis = result_cache.get(cache_key)
+                if analysis is not None:
+                    SERVICE_COUNTERS.observe_request("/images", 200)
+                    st.caption("⚡ Résultats déjà calculés pour cette image (cache)")
+        
+            if requested and analysis is None:
+                with st.spinner("Analyse en cours..."):
+                    model = model_loading.get()
+                    if model is not None:
+                        # Décodage JPEG réduit près de la taille d'entrée du modèle
+                        image_np, scale, shape = decode_image_scaled(image_bytes, params["imgsz"])
                     
-                    if num_detections > 0:
-                        st.success(f"✅ {num_detections} objet(s) détecté(s)")
-                        
-                        # Créer un DataFrame avec les détections
-                        st.subheader("📋 Détails des détections")
-                        
-                        detections = []
-                        for box in result.boxes:
-                            cls = int(box.cls)
-                            conf = float(box.conf)
-                            class_name = result.names.get(cls, f"Classe {cls}")
-                            bbox = box.xyxy[0].tolist()
-                            
-                            detections.append({
-                                "Classe": class_name,
-                                "Confiance": f"{conf:.2%}",
-                                "X_min": f"{bbox[0]:.0f}",
-                                "Y_min": f"{bbox[1]:.0f}",
-                                "X_max": f"{bbox[2]:.0f}",
-                                "Y_max": f"{bbox[3]:.0f}"
-                            })
-                        
-                        # Afficher le tableau
-                        df = pd.DataFrame(detections)
-                        st.dataframe(df, use_container_width=True)
-                        
-                        # Statistiques par classe
-                        st.subheader("📈 Statistiques")
-                        class_counts = df['Classe'].value_counts()
-                        st.bar_chart(class_counts)
-                        
-                        # Métriques
-                        col_m1, col_m2, col_m3 = st.columns(3)
-                        with col_m1:
-                            st.metric("Total détections", num_detections)
-                        with col_m2:
-                            avg_conf = sum([float(d['Confiance'].strip('%'))/100 for d in detections]) / len(detections)
-                            st.metric("Confiance moyenne", f"{avg_conf:.2%}")
-                        with col_m3:
-                            st.metric("Classes différentes", len(class_counts))
-                    else:
-                        st.warning("⚠️ Aucun objet détecté. Essayez de réduire le seuil de confiance.")
+                        # Prédiction unique au seuil plancher ; le seuil du curseur
+                        # est appliqué ensuite sur les détections en cache
+                        start = time.perf_counter()
+                        detections = get_batcher(backend, model).predict([image_np], **params)[0]
+                        add_model_stages([detections], time.perf_counter() - start)
+                        SERVICE_COUNTERS.observe_request("/images", 200)
+                        SERVICE_COUNTERS.observe_detections([detections.filter(conf_threshold)], "streamlit")
+                        analysis = {
+                            "image": image_np,
+                            "detections": detections.to_original(scale, shape=shape),
+                            "scale": scale,
+                        }
+                        result_cache.put(cache_key, analysis)
+        
+            # Afficher les détections filtrées au seuil courant
+            if analysis is not None:
+                st.session_state["analysis"] = {cache_key: analysis}
+                show_results(
+                    analysis["image"], analysis["detections"], conf_threshold,
+                    image_format, image_quality, analysis["scale"],
+                )
     
-    elif uploaded_file is None:
-        st.info("👆 Téléchargez une image pour commencer l'analyse")
+        elif uploaded_file is None:
+            st.info("👆 Téléchargez une image pour commencer l'analyse")
+
+# Détail du temps passé dans chaque étape de la requête
+with col2:
+    show_request_timing(trace)
 
 # Instructions
 with st.expander("📖 Instructions d'utilisation"):
@@ -213,3 +208,9 @@ st.markdown("""
     <p>Développé avec ❤️ en utilisant Streamlit et YOLO</p>
 </div>
 """, unsafe_allow_html=True)
+
+# Fin du chargement du modèle une fois toute l'interface affichée
+model = model_loading.get()
+if model is not None:
+    show_startup_report(model_loading.startup_report())
+    publish_metrics(model_loading, model, result_cache)
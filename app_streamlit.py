@@ -4,11 +4,27 @@ Fichier : app_streamlit.py
 """
 
 import streamlit as st
-from ultralytics import YOLO
-from PIL import Image
-import numpy as np
-import pandas as pd
 import os
+import tempfile
+import time
+
+from backends import BACKENDS, DEFAULT_BACKEND
+from counting import DEFAULT_COUNT_LINE
+from detection import (
+    BATCH_SIZE, CONF_FLOOR, DEFAULT_CONF, MODEL_PATH, decode_image, decode_image_scaled, inference_params,
+)
+from metrics import SERVICE_COUNTERS
+from resources import (
+    ModelLoading, get_batcher, get_result_cache, publish_metrics, require_model_file, start_metrics,
+)
+from result_cache import make_key, model_fingerprint
+from timing import add_model_stages, request_trace, stage
+from tiling import MERGE_METHODS, TILE_OVERLAP, TILE_SIZE, predict_tiled
+from ui import (
+    image_output_options, profile_option, show_batch_summary, show_request_timing, show_results,
+    show_startup_report, show_video_analysis,
+)
+from video import VIDEO_EXTENSIONS, frame_stride, video_info
 
 # Configuration de la page
 st.set_page_config(
@@ -67,135 +83,299 @@ with st.sidebar:
     """)
     
     st.header("⚙️ Paramètres")
+    backend = st.selectbox(
+        "Moteur d'inférence",
+        BACKENDS,
+        index=BACKENDS.index(DEFAULT_BACKEND) if DEFAULT_BACKEND in BACKENDS else 0,
+        help="PyTorch (ultralytics, fp32 ou INT8), ONNX Runtime ou OpenVINO "
+             "(exports automatiques de best.pt)"
+    )
+    profile = profile_option()
+    source = st.radio("Source", ["Images", "Vidéo"], horizontal=True)
     conf_threshold = st.slider(
         "Seuil de confiance",
-        min_value=0.0,
+        # Les détections sont calculées au seuil plancher : rien à montrer en dessous
+        min_value=CONF_FLOOR,
         max_value=1.0,
-        value=0.5,
+        value=DEFAULT_CONF,
         step=0.05,
         help="Seuil minimum de confiance pour afficher les détections"
     )
+    batch_size = st.slider(
+        "Taille de lot",
+        min_value=1,
+        max_value=32,
+        value=BATCH_SIZE,
+        help="Nombre d'images (ou de tuiles) envoyées ensemble au modèle"
+    )
+    if source == "Vidéo":
+        video_stride = st.slider(
+            "Analyser une image sur N",
+            min_value=1,
+            max_value=30,
+            value=5,
+            help="Les images intermédiaires sont sautées sans être analysées"
+        )
+        video_target_fps = st.number_input(
+            "Fréquence d'analyse cible (images/s, 0 = désactivée)",
+            min_value=0.0,
+            max_value=60.0,
+            value=0.0,
+            step=1.0,
+            help="Si renseignée, remplace le pas ci-dessus selon la fréquence de la vidéo"
+        )
+        video_tracking = st.checkbox(
+            "Suivi des véhicules",
+            value=True,
+            help="Identifiants persistants : chaque véhicule n'est compté qu'une fois"
+        )
+        video_detect_every = st.slider(
+            "Inférence une image analysée sur N",
+            min_value=1,
+            max_value=10,
+            value=1,
+            disabled=not video_tracking,
+            help="Entre deux inférences, les boîtes sont propagées par le modèle de mouvement du suivi"
+        )
+        video_motion_gate = st.checkbox(
+            "Filtre de mouvement (caméra fixe)",
+            help="Les images sans changement reprennent les détections précédentes ; "
+                 "un mouvement localisé n'est analysé que sur la région concernée"
+        )
+        count_lines = st.text_area(
+            "Lignes de comptage",
+            value=DEFAULT_COUNT_LINE,
+            disabled=not video_tracking,
+            help="Une ligne par ligne de texte : x1,y1,x2,y2 en pixels ou en fraction "
+                 "de la largeur / hauteur (0 à 1)"
+        )
+        count_zones = st.text_area(
+            "Zones de comptage",
+            disabled=not video_tracking,
+            help="Une zone par ligne de texte : sommets \"x1,y1 x2,y2 x3,y3 ...\" "
+                 "en pixels ou en fraction de la largeur / hauteur"
+        )
+    else:
+        tiling = st.checkbox(
+            "Découpage en tuiles",
+            help="Images haute résolution (4K, vues aériennes) : le modèle analyse des tuiles "
+                 "recouvrantes au lieu de l'image réduite, les véhicules lointains restent visibles"
+        )
+        tile_size = st.slider(
+            "Taille des tuiles",
+            min_value=320,
+            max_value=1280,
+            value=TILE_SIZE,
+            step=64,
+            disabled=not tiling,
+        )
+        tile_overlap = st.slider(
+            "Recouvrement des tuiles",
+            min_value=0.0,
+            max_value=0.5,
+            value=TILE_OVERLAP,
+            step=0.05,
+            disabled=not tiling,
+        )
+        tile_merge = st.selectbox(
+            "Fusion des détections des tuiles",
+            MERGE_METHODS,
+            format_func=str.upper,
+            disabled=not tiling,
+            help="NMS : garde la meilleure boîte ; WBF : moyenne des boîtes pondérée par les scores"
+        )
+    image_format, image_quality = image_output_options()
     
     st.markdown("---")
     st.markdown("**Projet IATP - 2026**")
 
-# Fonction pour charger le modèle
-@st.cache_resource
-def load_model():
-    """Charge le modèle YOLO"""
-    model_path = "best.pt"
-    
-    if not os.path.exists(model_path):
-        st.error(f"❌ Modèle non trouvé : {model_path}")
-        st.info("Placez le fichier best.pt dans le même dossier que cette application")
-        return None
-    
-    try:
-        model = YOLO(model_path)
-        return model
-    except Exception as e:
-        st.error(f"❌ Erreur lors du chargement du modèle : {e}")
-        return None
-
-# Charger le modèle
-model = load_model()
-
-# Layout en deux colonnes
-col1, col2 = st.columns(2)
-
-with col1:
-    st.header("📤 Upload d'image")
-    uploaded_file = st.file_uploader(
-        "Téléchargez une image à analyser",
-        type=['jpg', 'jpeg', 'png'],
-        help="Formats acceptés : JPG, JPEG, PNG"
+# Ressources partagées entre les sessions (voir resources.py)
+result_cache = get_result_cache()
+start_metrics()
+require_model_file()
+
+# L'interface s'affiche pendant que le modèle se charge
+model_loading = ModelLoading(backend)
+
+if source == "Vidéo":
+    st.header("🎬 Analyse vidéo")
+    uploaded_video = st.file_uploader(
+        "Téléchargez une vidéo à analyser",
+        type=VIDEO_EXTENSIONS,
+        help="Formats acceptés : MP4, AVI"
     )
     
-    if uploaded_file is not None:
-        # Afficher l'image originale
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Image originale", use_container_width=True)
+    if uploaded_video is None:
+        st.info("👆 Téléchargez une vidéo pour commencer l'analyse")
+    elif st.button("🎬 Analyser la vidéo", type="primary") and model_loading.get() is not None:
+        # OpenCV lit la vidéo depuis un fichier : copie temporaire propre à la session
+        suffix = os.path.splitext(uploaded_video.name)[1]
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as tmp:
+            tmp.write(uploaded_video.getvalue())
+        lines = [spec for spec in count_lines.splitlines() if spec.strip()]
+        zones = [spec for spec in count_zones.splitlines() if spec.strip()]
+        # Sans suivi, la ligne proposée par défaut n'est pas une demande de comptage
+        if not video_tracking and count_lines.strip() == DEFAULT_COUNT_LINE:
+            lines = []
+        try:
+            stride = frame_stride(video_info(tmp.name)["fps"], video_stride, video_target_fps)
+            batcher = get_batcher(backend, model_loading.get())
+            show_video_analysis(
+                batcher.run_batch, tmp.name, stride, conf_threshold, inference_params(profile),
+                image_format, image_quality, video_tracking, video_detect_every,
+                lines=lines, zones=zones, motion_gate=video_motion_gate,
+            )
+        finally:
+            os.remove(tmp.name)
 
-with col2:
-    st.header("📊 Résultats")
-    
-    if uploaded_file is not None and model is not None:
-        if st.button("🔍 Détecter les objets", type="primary"):
-            with st.spinner("Analyse en cours..."):
-                # Convertir l'image en numpy array
-                image_np = np.array(image)
-                
-                # Prédiction
-                results = model.predict(image_np, conf=conf_threshold)
-                
-                # Afficher l'image avec détections
-                for result in results:
-                    # Sauvegarder temporairement
-                    result.save("temp_result.jpg")
-                    result_img = Image.open("temp_result.jpg")
-                    st.image(result_img, caption="Image avec détections", use_container_width=True)
-                    
-                    # Nombre de détections
-                    num_detections = len(result.boxes)
-                    
-                    if num_detections > 0:
-                        st.success(f"✅ {num_detections} objet(s) détecté(s)")
-                        
-                        # Créer un DataFrame avec les détections
-                        st.subheader("📋 Détails des détections")
-                        
-                        detections = []
-                        for box in result.boxes:
-                            cls = int(box.cls)
-                            conf = float(box.conf)
-                            class_name = result.names.get(cls, f"Classe {cls}")
-                            bbox = box.xyxy[0].tolist()
-                            
-                            detections.append({
-                                "Classe": class_name,
-                                "Confiance": f"{conf:.2%}",
-                                "X_min": f"{bbox[0]:.0f}",
-                                "Y_min": f"{bbox[1]:.0f}",
-                                "X_max": f"{bbox[2]:.0f}",
-                                "Y_max": f"{bbox[3]:.0f}"
-                            })
-                        
-                        # Afficher le tableau
-                        df = pd.DataFrame(detections)
-                        st.dataframe(df, use_container_width=True)
+else:
+    with request_trace() as trace:
+        # Layout en deux colonnes
+        col1, col2 = st.columns(2)
+
+        with col1:
+            st.header("📤 Upload d'images")
+            uploaded_files = st.file_uploader(
+                "Téléchargez une ou plusieurs images à analyser",
+                type=['jpg', 'jpeg', 'png'],
+                accept_multiple_files=True,
+                help="Formats acceptés : JPG, JPEG, PNG"
+            )
+        
+            if uploaded_files:
+                # Afficher les images originales (le décodage NumPy n'a lieu qu'en cas d'inférence)
+                with stage("lecture de l'envoi"):
+                    images_bytes = [uploaded_file.getvalue() for uploaded_file in uploaded_files]
+                file_names = [uploaded_file.name for uploaded_file in uploaded_files]
+                if len(uploaded_files) == 1:
+                    st.image(images_bytes[0], caption="Image originale", use_container_width=True)
+                else:
+                    st.image(images_bytes, caption=file_names, width=160)
+
+        with col2:
+            st.header("📊 Résultats")
+        
+            if uploaded_files:
+                # Clés de cache : contenu de chaque image, empreinte du modèle et paramètres
+                params = inference_params(profile)
+                key_params = {**params, "backend": backend}
+                if tiling:
+                    key_params["tiles"] = f"{tile_size}/{tile_overlap}/{tile_merge}"
+                with stage("cache des résultats"):
+                    fingerprint = model_fingerprint(MODEL_PATH)
+                    cache_keys = [
+                        make_key(image_bytes, fingerprint, key_params) for image_bytes in images_bytes
+                    ]
+                    # Analyses déjà faites dans cette session (page réexécutée, curseur déplacé)
+                    session_analyses = st.session_state.get("analyses", {})
+                    analyses = [session_analyses.get(cache_key) for cache_key in cache_keys]
+                missing = [i for i, analysis in enumerate(analyses) if analysis is None]
+            
+                if not missing:
+                    st.caption("⚡ Résultats déjà calculés pour ces images (cache)")
+            
+                requested = st.button("🔍 Détecter les objets", type="primary") and missing
+                if requested:
+                    # Cache partagé consulté seulement à la demande : les réexécutions
+                    # de la page ne comptent pas comme des échecs du cache
+                    with stage("cache des résultats"):
+                        for i in missing:
+                            analyses[i] = result_cache.get(cache_keys[i])
+                    missing = [i for i in missing if analyses[i] is None]
+                    if not missing:
+                        SERVICE_COUNTERS.observe_request("/images", 200)
+                        st.caption("⚡ Résultats déjà calculés pour ces images (cache)")
+            
+                if requested and missing:
+                    with st.spinner(f"Analyse de {len(missing)} image(s) en cours..."):
+                        model = model_loading.get()
+                        if model is not None:
+                            batcher = get_batcher(backend, model)
                         
-                        # Statistiques par classe
-                        st.subheader("📈 Statistiques")
-                        class_counts = df['Classe'].value_counts()
-                        st.bar_chart(class_counts)
+                            if tiling:
+                                # Les tuiles ont besoin de la pleine résolution
+                                decoded = [(decode_image(images_bytes[i]), 1.0, None) for i in missing]
+                            else:
+                                # Décodage JPEG réduit près de la taille d'entrée du modèle
+                                decoded = [
+                                    decode_image_scaled(images_bytes[i], params["imgsz"]) for i in missing
+                                ]
+                            images = [image_np for image_np, _, _ in decoded]
                         
-                        # Métriques
-                        col_m1, col_m2, col_m3 = st.columns(3)
-                        with col_m1:
-                            st.metric("Total détections", num_detections)
-                        with col_m2:
-                            avg_conf = sum([float(d['Confiance'].strip('%'))/100 for d in detections]) / len(detections)
-                            st.metric("Confiance moyenne", f"{avg_conf:.2%}")
-                        with col_m3:
-                            st.metric("Classes différentes", len(class_counts))
-                    else:
-                        st.warning("⚠️ Aucun objet détecté. Essayez de réduire le seuil de confiance.")
-    
-    elif uploaded_file is None:
-        st.info("👆 Téléchargez une image pour commencer l'analyse")
-    
-    elif model is None:
-        st.error("❌ Le modèle n'a pas pu être chargé")
+                            # Prédiction par lots au seuil plancher ; le seuil du curseur
+                            # est appliqué ensuite sur les détections en cache
+                            start = time.perf_counter()
+                            if tiling:
+                                # Tuiles de chaque image envoyées en lots, puis fusionnées
+                                batch_detections = [
+                                    predict_tiled(
+                                        batcher.run_batch, image_np, tile_size, tile_overlap,
+                                        batch_size, tile_merge, **params,
+                                    )
+                                    for image_np in images
+                                ]
+                            elif len(images) == 1:
+                                batch_detections = batcher.predict(images, **params)
+                            else:
+                                batch_detections = batcher.run_batch(images, batch_size, **params)
+                            add_model_stages(batch_detections, time.perf_counter() - start)
+                            SERVICE_COUNTERS.observe_request("/images", 200)
+                            SERVICE_COUNTERS.observe_detections(
+                                [detections.filter(conf_threshold) for detections in batch_detections],
+                                "streamlit",
+                            )
+                            for i, (image_np, scale, shape), detections in zip(
+                                missing, decoded, batch_detections
+                            ):
+                                analyses[i] = {
+                                    "image": image_np,
+                                    "detections": detections.to_original(scale, shape=shape),
+                                    "scale": scale,
+                                }
+                                result_cache.put(cache_keys[i], analyses[i])
+                st.session_state["analyses"] = {
+                    cache_key: analysis
+                    for cache_key, analysis in zip(cache_keys, analyses) if analysis is not None
+                }
+            
+                # Afficher les détections filtrées au seuil courant
+                done = [(name, analysis) for name, analysis in zip(file_names, analyses) if analysis is not None]
+                if len(uploaded_files) == 1 and done:
+                    analysis = done[0][1]
+                    show_results(
+                        analysis["image"], analysis["detections"], conf_threshold,
+                        image_format, image_quality, analysis["scale"],
+                    )
+                elif done:
+                    show_batch_summary(
+                        [name for name, _ in done],
+                        [analysis["detections"] for _, analysis in done],
+                        conf_threshold,
+                    )
+                    for name, analysis in done:
+                        with st.expander(f"🖼️ {name}"):
+                            show_results(
+                                analysis["image"], analysis["detections"], conf_threshold,
+                                image_format, image_quality, analysis["scale"],
+                            )
+        
+            else:
+                st.info("👆 Téléchargez une ou plusieurs images pour commencer l'analyse")
+
+    # Détail du temps passé dans chaque étape de la requête
+    with col2:
+        show_request_timing(trace)
 
 # Instructions
 with st.expander("📖 Instructions d'utilisation"):
     st.markdown("""
     ### Comment utiliser cette application ?
     
-    1. **Téléchargez une image** contenant des véhicules (JPG, PNG)
+    1. **Téléchargez une ou plusieurs images** contenant des véhicules (JPG, PNG)
     2. **Ajustez le seuil de confiance** dans la barre latérale si nécessaire
     3. **Cliquez sur "Détecter les objets"** pour lancer l'analyse
     4. **Consultez les résultats** : image annotée, tableau des détections, statistiques
+       (avec plusieurs images : tableau récapitulatif puis détail par image)
     
     ### Classes détectées :
     - Bus
@@ -220,6 +400,12 @@ st.markdown("""
 </div>
 """, unsafe_allow_html=True)
 
+# Fin du chargement du modèle une fois toute l'interface affichée
+model = model_loading.get()
+if model is not None:
+    show_startup_report(model_loading.startup_report())
+    publish_metrics(model_loading, model, result_cache)
+
 """
 INSTALLATION :
 pip install streamlit ultralytics pillow numpy pandas
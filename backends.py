@@ -0,0 +1,527 @@
+"""
+Moteurs d'inférence : PyTorch (ultralytics, fp32 ou INT8), ONNX Runtime ou OpenVINO
+Fichier : backends.py
+"""
+
+import abc
+import ast
+import glob
+import importlib
+import json
+import os
+import platform
+import sys
+import threading
+import time
+import warnings
+from concurrent.futures import Future
+
+import cv2
+import numpy as np
+
+from detection import (
+    BATCH_SIZE, CONF_FLOOR, DEFAULT_PROFILE, IMGSZ, IOU, LETTERBOX_COLOR, MODEL_PATH, PROFILES,
+    Detections, letterbox, load_yolo, predict,
+)
+from result_cache import model_fingerprint
+from timing import StageTimer
+
+# Moteurs disponibles ; le choix par défaut peut être imposé par variable d'environnement
+BACKENDS = ("pytorch", "pytorch-int8", "onnx", "openvino", "openvino-int8")
+DEFAULT_BACKEND = os.environ.get("DETECTION_BACKEND", "pytorch")
+
+# Threads ONNX Runtime (0 = choix automatique d'ONNX Runtime, un par cœur physique)
+ORT_INTRA_THREADS = int(os.environ.get("ORT_INTRA_THREADS", "0"))
+ORT_INTER_THREADS = int(os.environ.get("ORT_INTER_THREADS", "1"))
+
+# Threads et mode d'exécution OpenVINO (0 = automatique)
+OV_NUM_THREADS = int(os.environ.get("OV_NUM_THREADS", "0"))
+OV_PERFORMANCE_HINT = os.environ.get("OV_PERFORMANCE_HINT", "LATENCY")
+
+# Threads de calcul torch par réplique (0 = cœurs disponibles répartis entre les
+# répliques) et threads inter-opérations (0 = valeur par défaut de torch)
+TORCH_NUM_THREADS = int(os.environ.get("TORCH_NUM_THREADS", "0"))
+TORCH_INTEROP_THREADS = int(os.environ.get("TORCH_INTEROP_THREADS", "0"))
+
+# Répliques du modèle servies en parallèle, chacune par son thread, et épinglage
+# de chaque thread sur ses propres cœurs
+INFERENCE_REPLICAS = max(1, int(os.environ.get("INFERENCE_REPLICAS", "1")))
+INFERENCE_PIN_CPUS = os.environ.get("INFERENCE_PIN_CPUS", "0") == "1"
+
+# Moteur de quantification PyTorch : fbgemm sur x86, qnnpack sur ARM
+TORCH_QUANT_ENGINE = os.environ.get(
+    "TORCH_QUANT_ENGINE", "qnnpack" if platform.machine().lower() in ("arm64", "aarch64") else "fbgemm"
+)
+
+# Tailles de lot des passes de préchauffage au chargement ("" = pas de préchauffage)
+WARMUP_BATCH_SIZES = tuple(
+    int(size) for size in os.environ.get("WARMUP_BATCH_SIZES", "1,4").split(",") if size.strip()
+)
+
+# Tailles d'entrée préchauffées : celles des profils servis, par défaut celle du
+# profil par défaut (ex. "320,640" pour servir aussi le profil rapide sans délai)
+WARMUP_IMGSZ = tuple(
+    int(size) for size in os.environ.get("WARMUP_IMGSZ", str(PROFILES[DEFAULT_PROFILE])).split(",")
+    if size.strip()
+)
+
+# Modules lourds importés au démarrage, selon le moteur
+STARTUP_IMPORTS = {
+    "pytorch": ("torch", "ultralytics"),
+    "pytorch-int8": ("torch", "ultralytics"),
+    "onnx": ("onnxruntime",),
+    "openvino": ("openvino",),
+    "openvino-int8": ("openvino",),
+}
+
+# Nombre maximal de détections conservées par image (comme ultralytics)
+MAX_DETECTIONS = 300
+
+
+def exported_path(model_path, suffix):
+    """Chemin d'un export rangé à côté des poids et lié à leur empreinte"""
+    stem = os.path.splitext(model_path)[0]
+    return f"{stem}.{model_fingerprint(model_path)[:12]}{suffix}"
+
+
+def remove_stale_exports(model_path, current, pattern):
+    """Supprime les exports correspondant à d'anciennes versions des poids
+
+    Les fichiers dont le chemin commence par `current` (export en cours et ses
+    fichiers associés) sont conservés.
+    """
+    stem = os.path.splitext(model_path)[0]
+    for stale in glob.glob(f"{glob.escape(stem)}.{pattern}"):
+        if not os.path.abspath(stale).startswith(os.path.abspath(current)) and os.path.isfile(stale):
+            os.remove(stale)
+
+
+def export_onnx(model_path=MODEL_PATH, imgsz=IMGSZ):
+    """Exporte les poids en ONNX une seule fois (export invalidé si best.pt change)"""
+    target = exported_path(model_path, ".onnx")
+    if not os.path.exists(target):
+        exported = load_yolo(model_path).export(format="onnx", imgsz=imgsz, dynamic=True)
+        os.replace(exported, target)
+        remove_stale_exports(model_path, target, "*.onnx")
+    return target
+
+
+def onnx_names(onnx_path):
+    """Noms des classes enregistrés par ultralytics dans les métadonnées ONNX"""
+    import onnx
+
+    model = onnx.load(onnx_path, load_external_data=False)
+    metadata = {prop.key: prop.value for prop in model.metadata_props}
+    return ast.literal_eval(metadata.get("names", "{}"))
+
+
+def openvino_paths(model_path, precision):
+    """Fichiers du modèle OpenVINO : IR (.xml, poids dans le .bin voisin) et noms des classes"""
+    base = exported_path(model_path, f".openvino-{precision}")
+    return f"{base}.xml", f"{base}.names.json"
+
+
+def save_openvino(ov_model, xml_path, names_path, names):
+    """Enregistre un modèle OpenVINO et les noms de ses classes"""
+    import openvino as ov
+
+    ov.save_model(ov_model, xml_path, compress_to_fp16=False)
+    with open(names_path, "w", encoding="utf-8") as f:
+        json.dump({str(k): v for k, v in names.items()}, f, ensure_ascii=False)
+
+
+def export_openvino(model_path=MODEL_PATH, imgsz=IMGSZ):
+    """Convertit l'export ONNX en modèle OpenVINO fp32 (mis en cache comme l'ONNX)"""
+    import openvino as ov
+
+    xml_path, names_path = openvino_paths(model_path, "fp32")
+    if not os.path.exists(xml_path):
+        onnx_path = export_onnx(model_path, imgsz)
+        save_openvino(ov.Core().read_model(onnx_path), xml_path, names_path, onnx_names(onnx_path))
+        remove_stale_exports(model_path, xml_path[:-len(".xml")], "*.openvino-fp32.*")
+    return xml_path
+
+
+def quantize_openvino(calibration_images, model_path=MODEL_PATH, imgsz=IMGSZ):
+    """Quantification INT8 post-entraînement (NNCF) calibrée sur des images représentatives"""
+    import nncf
+    import openvino as ov
+
+    fp32_xml = export_openvino(model_path, imgsz)
+    xml_path, names_path = openvino_paths(model_path, "int8")
+
+    def transform(image):
+        return preprocess_batch([image], imgsz)[0]
+
+    quantized = nncf.quantize(
+        ov.Core().read_model(fp32_xml),
+        nncf.Dataset(calibration_images, transform),
+        preset=nncf.QuantizationPreset.MIXED,
+        subset_size=len(calibration_images),
+        # La tête de détection (décodage des boîtes) reste en virgule flottante
+        ignored_scope=nncf.IgnoredScope(types=["Multiply", "Subtract", "Sigmoid"]),
+    )
+    save_openvino(quantized, xml_path, names_path, load_openvino_names(fp32_xml))
+    remove_stale_exports(model_path, xml_path[:-len(".xml")], "*.openvino-int8.*")
+    return xml_path
+
+
+def torch_int8_path(model_path=MODEL_PATH, engine=TORCH_QUANT_ENGINE):
+    """État du modèle PyTorch quantifié, lié à l'empreinte des poids et au moteur"""
+    return exported_path(model_path, f".torch-int8-{engine}.pt")
+
+
+def prepare_torch_int8(model, engine=TORCH_QUANT_ENGINE):
+    """Prépare la quantification statique des convolutions d'un modèle YOLO ultralytics
+
+    Chaque convolution (fusionnée avec sa BatchNorm) est isolée entre une
+    quantification et une déquantification : les activations SiLU, les
+    concaténations et les convolutions finales de la tête restent en float.
+    """
+    import torch
+    from torch.ao import quantization as tq
+    from ultralytics.nn.modules import Conv
+
+    torch.backends.quantized.engine = engine
+    network = model.model.fuse(verbose=False).eval()
+    qconfig = tq.get_default_qconfig(engine)
+    for module in network.modules():
+        if isinstance(module, Conv):
+            module.conv = tq.QuantWrapper(module.conv)
+            module.conv.qconfig = qconfig
+    tq.prepare(network, inplace=True)
+    return network
+
+
+def quantize_torch(calibration_images, model_path=MODEL_PATH, imgsz=IMGSZ, engine=TORCH_QUANT_ENGINE):
+    """Quantification INT8 statique calibrée, enregistrée à côté des poids"""
+    import torch
+    from torch.ao import quantization as tq
+
+    model = load_yolo(model_path)
+    network = prepare_torch_int8(model, engine)
+    with torch.inference_mode():
+        for image in calibration_images:
+            network(torch.from_numpy(preprocess_batch([image], imgsz)[0]))
+    tq.convert(network, inplace=True)
+
+    target = torch_int8_path(model_path, engine)
+    torch.save(network.state_dict(), target)
+    remove_stale_exports(model_path, target, f"*.torch-int8-{engine}.pt")
+    return target
+
+
+def load_torch_int8(model_path=MODEL_PATH, engine=TORCH_QUANT_ENGINE):
+    """Charge le modèle YOLO dont les convolutions ont été quantifiées par quantize_torch"""
+    import torch
+    from torch.ao import quantization as tq
+
+    target = torch_int8_path(model_path, engine)
+    if not os.path.exists(target):
+        raise FileNotFoundError(
+            "Modèle PyTorch INT8 absent : lancez d'abord "
+            "`python quantize_torch.py calibrate <dossier d'images>`"
+        )
+    model = load_yolo(model_path)
+    network = prepare_torch_int8(model, engine)
+    with warnings.catch_warnings():
+        # Observateurs vides : les paramètres de quantification viennent de l'état enregistré
+        warnings.simplefilter("ignore")
+        tq.convert(network, inplace=True)
+    network.load_state_dict(torch.load(target, map_location="cpu"))
+    return model
+
+
+def load_openvino_names(xml_path):
+    """Noms des classes enregistrés à côté d'un modèle OpenVINO"""
+    with open(xml_path[:-len(".xml")] + ".names.json", encoding="utf-8") as f:
+        return {int(k): v for k, v in json.load(f).items()}
+
+
+def preprocess_batch(images, imgsz, channels="RGB"):
+    """Letterbox puis tenseur NCHW float32 normalisé ; retourne aussi échelles et décalages"""
+    boxed = [letterbox(image, imgsz) for image in images]
+    batch = np.stack([canvas for canvas, _, _ in boxed])
+    if channels == "BGR":
+        batch = batch[..., ::-1]
+    batch = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+    return batch, [(scale, offset) for _, scale, offset in boxed]
+
+
+def nms(boxes, scores, classes, iou, max_det=MAX_DETECTIONS):
+    """NMS par classe ; retourne les indices conservés par score décroissant"""
+    if len(scores) == 0:
+        return np.empty(0, dtype=np.int64)
+    xywh = np.concatenate([boxes[:, :2], boxes[:, 2:] - boxes[:, :2]], axis=1)
+    keep = cv2.dnn.NMSBoxesBatched(
+        xywh.tolist(), scores.tolist(), classes.tolist(), 0.0, iou, top_k=max_det
+    )
+    keep = np.asarray(keep, dtype=np.int64).reshape(-1)
+    return keep[np.argsort(-scores[keep], kind="stable")][:max_det]
+
+
+def decode_output(output, conf, iou, names):
+    """Sortie brute YOLOv8 (4 + nc, ancres) -> Détections dans le repère letterbox"""
+    predictions = output.T
+    class_scores = predictions[:, 4:]
+    classes = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(classes)), classes]
+    candidates = scores >= conf
+    predictions, classes, scores = predictions[candidates], classes[candidates], scores[candidates]
+
+    # Boîtes centre/largeur/hauteur -> coins
+    half = predictions[:, 2:4] / 2
+    boxes = np.concatenate([predictions[:, :2] - half, predictions[:, :2] + half], axis=1)
+    keep = nms(boxes, scores, classes, iou)
+    return Detections(
+        boxes=boxes[keep].astype(np.float32, copy=False),
+        scores=scores[keep].astype(np.float32, copy=False),
+        classes=classes[keep].astype(np.int64),
+        names=names,
+    )
+
+
+class ExportedBackend(abc.ABC):
+    """Base des moteurs exportés : prétraitement NumPy et décodage de la sortie YOLOv8"""
+
+    names = {}
+
+    @abc.abstractmethod
+    def run(self, batch):
+        """Exécute le modèle sur un tenseur NCHW ; retourne la sortie (B, 4 + nc, ancres)"""
+
+    def predict_images(self, images, batch_size=BATCH_SIZE, imgsz=IMGSZ, conf=CONF_FLOOR,
+                       iou=IOU, channels="RGB"):
+        """Même interface que detection.predict"""
+        detections = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+
+            t0 = time.perf_counter()
+            batch, transforms = preprocess_batch(chunk, imgsz, channels)
+            t1 = time.perf_counter()
+            outputs = self.run(batch)
+            t2 = time.perf_counter()
+            chunk_detections = [
+                decode_output(output, conf, iou, self.names).to_original(scale, offset, image.shape)
+                for output, image, (scale, offset) in zip(outputs, chunk, transforms)
+            ]
+            t3 = time.perf_counter()
+
+            speed = {
+                "preprocess": 1000 * (t1 - t0) / len(chunk),
+                "inference": 1000 * (t2 - t1) / len(chunk),
+                "postprocess": 1000 * (t3 - t2) / len(chunk),
+            }
+            for item in chunk_detections:
+                item.speed = speed
+            detections.extend(chunk_detections)
+        return detections
+
+
+class OnnxBackend(ExportedBackend):
+    """Inférence CPU avec ONNX Runtime"""
+
+    def __init__(self, onnx_path, intra_threads=ORT_INTRA_THREADS, inter_threads=ORT_INTER_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.intra_op_num_threads = intra_threads
+        options.inter_op_num_threads = inter_threads
+        self.session = ort.InferenceSession(
+            onnx_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+        metadata = self.session.get_modelmeta().custom_metadata_map
+        self.names = ast.literal_eval(metadata["names"]) if "names" in metadata else {}
+
+    def run(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(ExportedBackend):
+    """Inférence CPU avec OpenVINO (modèle fp32 ou quantifié INT8)"""
+
+    def __init__(self, xml_path, num_threads=OV_NUM_THREADS, performance_hint=OV_PERFORMANCE_HINT):
+        import openvino as ov
+
+        config = {"PERFORMANCE_HINT": performance_hint}
+        if num_threads:
+            config["INFERENCE_NUM_THREADS"] = num_threads
+        self.compiled = ov.Core().compile_model(xml_path, "CPU", config)
+        self.output = self.compiled.output(0)
+        self.names = load_openvino_names(xml_path)
+
+    def run(self, batch):
+        # Une requête d'inférence par appel : utilisable depuis plusieurs threads
+        request = self.compiled.create_infer_request()
+        return request.infer({0: batch})[self.output]
+
+
+def load_backend(backend=DEFAULT_BACKEND, model_path=MODEL_PATH):
+    """Charge le modèle avec le moteur demandé (voir BACKENDS)"""
+    if backend == "pytorch":
+        return load_yolo(model_path)
+    if backend == "pytorch-int8":
+        return load_torch_int8(model_path)
+    if backend == "onnx":
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            raise ImportError("Le moteur ONNX nécessite onnx et onnxruntime (pip install onnx onnxruntime)")
+        return OnnxBackend(export_onnx(model_path))
+    if backend in ("openvino", "openvino-int8"):
+        try:
+            import openvino  # noqa: F401
+        except ImportError:
+            raise ImportError("Le moteur OpenVINO nécessite openvino et onnx (pip install openvino onnx)")
+        if backend == "openvino":
+            return OpenVinoBackend(export_openvino(model_path))
+        xml_path, _ = openvino_paths(model_path, "int8")
+        if not os.path.exists(xml_path):
+            raise FileNotFoundError(
+                "Modèle INT8 absent : lancez d'abord "
+                "`python quantize_openvino.py calibrate <dossier d'images>`"
+            )
+        return OpenVinoBackend(xml_path)
+    raise ValueError(f"Moteur inconnu : {backend} (choix : {', '.join(BACKENDS)})")
+
+
+def warmup_sizes(imgsz):
+    """Tailles d'entrée à préchauffer : `imgsz` est une taille ou une liste de tailles"""
+    return (imgsz,) if isinstance(imgsz, int) else tuple(imgsz)
+
+
+def warm_up(model, batch_sizes=WARMUP_BATCH_SIZES, imgsz=WARMUP_IMGSZ):
+    """Passes sur des images factices : allocations et choix des noyaux avant la première requête
+
+    Chaque taille d'entrée servie est préchauffée : allocations et noyaux
+    dépendent de la forme des tenseurs.
+    """
+    for input_size in warmup_sizes(imgsz):
+        image = np.full((input_size, input_size, 3), LETTERBOX_COLOR, dtype=np.uint8)
+        for size in batch_sizes:
+            predict(model, [image] * size, batch_size=size, imgsz=input_size)
+
+
+def load_backend_timed(backend=DEFAULT_BACKEND, model_path=MODEL_PATH, warmup=WARMUP_BATCH_SIZES,
+                       imgsz=WARMUP_IMGSZ, extra_imports=()):
+    """Charge et préchauffe le modèle ; retourne aussi le détail du temps de démarrage
+
+    Étapes : imports des modules lourds, lecture des poids (ou de l'export),
+    fusion Conv+BN (PyTorch) et préchauffage.
+    """
+    timer = StageTimer()
+    for module in STARTUP_IMPORTS.get(backend, ()) + tuple(extra_imports):
+        with timer.stage(f"import {module}"):
+            try:
+                importlib.import_module(module)
+            except ImportError:
+                pass  # load_backend signale le module manquant
+    if backend.startswith("pytorch"):
+        configure_torch_threads()
+    with timer.stage("lecture des poids"):
+        model = load_backend(backend, model_path)
+    network = getattr(model, "model", None)
+    if hasattr(network, "fuse"):
+        with timer.stage("fusion des couches"):
+            network.fuse(verbose=False)
+    if warmup:
+        with timer.stage("préchauffage", sum(warmup) * len(warmup_sizes(imgsz))):
+            warm_up(model, warmup, imgsz)
+    return model, timer
+
+
+def available_cpus():
+    """Cœurs utilisables par le processus (masque d'affinité sous Linux)"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def cpu_layout(replicas=INFERENCE_REPLICAS, threads=TORCH_NUM_THREADS, pin=INFERENCE_PIN_CPUS):
+    """Cœurs et threads de calcul de chaque réplique : [(cœurs ou None, threads), ...]
+
+    Sans `threads`, les cœurs disponibles sont répartis entre les répliques ;
+    toutes reçoivent le même nombre de threads (voir set_torch_threads).
+    Avec `pin`, chaque réplique reçoit des cœurs consécutifs distincts (repris
+    depuis le début s'il n'y en a pas assez).
+    """
+    cpus = available_cpus()
+    threads = threads or max(1, len(cpus) // replicas)
+    layout = []
+    for index in range(replicas):
+        assigned = None
+        if pin:
+            assigned = [cpus[(index * threads + k) % len(cpus)] for k in range(threads)]
+        layout.append((assigned, threads))
+    return layout
+
+
+def configure_torch_threads(interop=TORCH_INTEROP_THREADS):
+    """Fixe les threads inter-opérations de torch, avant tout calcul du processus"""
+    if not interop:
+        return
+    import torch
+
+    try:
+        torch.set_num_interop_threads(interop)
+    except RuntimeError:
+        pass  # déjà fixé, ou un calcul parallèle a déjà eu lieu
+
+
+def set_torch_threads(threads=0):
+    """Fixe les threads de calcul torch du processus, une seule fois pour toutes les répliques
+
+    torch.set_num_threads est global au processus et non propre au thread
+    appelant : appliqué par réplique, le dernier réglage l'emporterait. Les
+    threads des répliques démarrés ensuite reprennent tous cette valeur.
+    """
+    if threads and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+
+
+def bind_worker_thread(cpus=None):
+    """Épingle le thread appelant sur `cpus`
+
+    Sous Linux, les threads OpenMP de torch créés ensuite depuis ce thread
+    héritent de son affinité. Les moteurs ONNX Runtime et OpenVINO gardent
+    leurs propres réglages (ORT_INTRA_THREADS, OV_NUM_THREADS).
+    """
+    if cpus and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cpus)
+
+
+def load_replicas(backend=DEFAULT_BACKEND, model_path=MODEL_PATH, replicas=INFERENCE_REPLICAS,
+                  warmup=WARMUP_BATCH_SIZES, imgsz=WARMUP_IMGSZ):
+    """Charge `replicas` exemplaires indépendants et préchauffés du modèle
+
+    Retourne la liste des répliques et le détail du démarrage de la première.
+    """
+    model, timer = load_backend_timed(backend, model_path, warmup, imgsz)
+    if replicas > 1:
+        with timer.stage("répliques", replicas - 1):
+            others = [load_backend_timed(backend, model_path, warmup, imgsz)[0]
+                      for _ in range(replicas - 1)]
+        return [model, *others], timer
+    return [model], timer
+
+
+def load_backend_async(backend=DEFAULT_BACKEND, model_path=MODEL_PATH, **kwargs):
+    """Lance load_backend_timed dans un thread ; retourne un Future de (modèle, StageTimer)
+
+    L'interface peut s'afficher pendant l'import de torch et le préchauffage.
+    """
+    future = Future()
+
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                future.set_result(load_backend_timed(backend, model_path, **kwargs))
+            except Exception as e:
+                future.set_exception(e)
+
+    threading.Thread(target=run, name="model-loading", daemon=True).start()
+    return future
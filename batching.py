@@ -0,0 +1,174 @@
+"""
+Planificateur de micro-lots devant le modèle partagé
+Fichier : batching.py
+"""
+
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from dataclasses import dataclass
+
+from backends import bind_worker_thread, set_torch_threads
+from detection import inference_params, predict
+
+# Taille maximale d'un lot et attente maximale avant de lancer un lot incomplet
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("BATCH_MAX_WAIT_MS", "10"))
+
+_STOP = object()
+
+
+@dataclass
+class _BatchJob:
+    """Lot déjà constitué par l'appelant, exécuté tel quel par un thread du modèle"""
+    images: list
+    batch_size: int
+    params: dict
+    future: Future
+
+
+class MicroBatcher:
+    """Regroupe les requêtes arrivant dans une courte fenêtre en un seul appel au modèle
+
+    Chaque réplique du modèle (`model` peut être une liste) est servie par son
+    propre thread : les appelants soumettent des images et attendent leur
+    Future. Le lot part dès que `max_batch_size` images sont réunies ou que
+    `max_wait_ms` s'est écoulé depuis la première requête. Le modèle ne tourne
+    que sur ces threads, épinglés selon `layout` (voir `backends.cpu_layout`) :
+    les threads des sessions appelantes ne lancent jamais de calcul.
+    """
+
+    def __init__(self, model, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_MAX_WAIT_MS,
+                 layout=None):
+        self.models = list(model) if isinstance(model, (list, tuple)) else [model]
+        self.model = self.models[0]
+        self.layout = layout or [(None, 0)] * len(self.models)
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._batch_sizes = Counter()
+        self._stats_lock = threading.Lock()
+        # Réglage global du processus : appliqué une fois, avant le démarrage des threads
+        set_torch_threads(max(threads for _, threads in self.layout))
+        self._threads = [
+            threading.Thread(
+                target=self._run, args=(replica, cpus),
+                name=f"micro-batcher-{index}", daemon=True,
+            )
+            for index, (replica, (cpus, _)) in enumerate(zip(self.models, self.layout))
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image, **params):
+        """Soumet une image RVB ; retourne un Future résolu avec ses Détections"""
+        future = Future()
+        params = {**inference_params(), **params}
+        self._queue.put((image, tuple(sorted(params.items())), future))
+        return future
+
+    def predict(self, images, **params):
+        """Soumet plusieurs images et attend leurs Détections"""
+        futures = [self.submit(image, **params) for image in images]
+        return [future.result() for future in futures]
+
+    def run_batch(self, images, batch_size, **params):
+        """Exécute un lot déjà constitué (envoi multiple d'une session, vidéo)"""
+        job = _BatchJob(images, batch_size, {**inference_params(), **params}, Future())
+        self._queue.put(job)
+        return job.future.result()
+
+    def stats(self):
+        """Distribution des tailles de lot obtenues et profondeur de la file"""
+        with self._stats_lock:
+            sizes = dict(sorted(self._batch_sizes.items()))
+        batches = sum(sizes.values())
+        images = sum(size * count for size, count in sizes.items())
+        return {
+            "batches": batches,
+            "images": images,
+            "mean_batch_size": images / batches if batches else 0.0,
+            "batch_size_distribution": sizes,
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+            "replicas": len(self.models),
+        }
+
+    def close(self):
+        """Arrête les threads après avoir traité les requêtes déjà en file"""
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for thread in self._threads:
+            thread.join()
+
+    def _record(self, size):
+        with self._stats_lock:
+            self._batch_sizes[size] += 1
+
+    def _collect(self):
+        """Attend une première requête puis complète le lot jusqu'à l'échéance
+
+        Les lots déjà constitués reçus entre-temps sont retournés à part.
+        """
+        first = self._queue.get()
+        if first is _STOP:
+            return [], [], True
+        if isinstance(first, _BatchJob):
+            return [], [first], False
+        batch, jobs = [first], []
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return batch, jobs, True
+            if isinstance(item, _BatchJob):
+                jobs.append(item)
+            else:
+                batch.append(item)
+        return batch, jobs, False
+
+    def _run(self, model, cpus):
+        bind_worker_thread(cpus)
+        stop = False
+        while not stop:
+            batch, jobs, stop = self._collect()
+
+            # Les requêtes aux paramètres différents ne peuvent pas partager un passage
+            groups = {}
+            for image, params, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(params, []).append((image, future))
+
+            for params, items in groups.items():
+                images = [image for image, _ in items]
+                try:
+                    detections = predict(model, images, batch_size=len(images), **dict(params))
+                except Exception as e:
+                    for _, future in items:
+                        future.set_exception(e)
+                    continue
+                self._record(len(images))
+                for (_, future), result in zip(items, detections):
+                    future.set_result(result)
+
+            for job in jobs:
+                if not job.future.set_running_or_notify_cancel():
+                    continue
+                try:
+                    detections = predict(model, job.images, batch_size=job.batch_size, **job.params)
+                except Exception as e:
+                    job.future.set_exception(e)
+                    continue
+                for start in range(0, len(job.images), job.batch_size):
+                    self._record(len(job.images[start:start + job.batch_size]))
+                job.future.set_result(detections)
@@ -0,0 +1,84 @@
+"""
+Temps de décodage et pic mémoire : décodage complet ou JPEG réduit (mode draft)
+Fichier : bench_decode.py
+
+UTILISATION :
+python bench_decode.py photo_4k.jpg autoroute.jpg
+python bench_decode.py images/*.jpg --imgsz 640 --repeat 5
+
+Chaque mesure a lieu dans un processus neuf : le pic mémoire (ru_maxrss)
+n'est pas faussé par les décodages précédents.
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+
+from detection import IMGSZ, decode_image, decode_image_scaled
+
+# Modes de décodage comparés
+MODES = ("complet", "réduit")
+
+
+def peak_rss_mb():
+    """Pic de mémoire résidente du processus (ru_maxrss : Ko sous Linux, octets sous macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(path, mode, imgsz, repeat):
+    """Décode `repeat` fois dans le processus courant ; temps moyen et hausse du pic mémoire"""
+    with open(path, "rb") as f:
+        data = f.read()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        if mode == "complet":
+            image = decode_image(data)
+        else:
+            image, _, _ = decode_image_scaled(data, imgsz)
+    elapsed = time.perf_counter() - start
+    return {
+        "decode_ms": 1000 * elapsed / repeat,
+        "peak_mb": peak_rss_mb() - baseline,
+        "decoded": f"{image.shape[1]}x{image.shape[0]}",
+    }
+
+
+def measure_in_subprocess(path, mode, imgsz, repeat):
+    completed = subprocess.run(
+        [sys.executable, __file__, "--child", mode, "--imgsz", str(imgsz), "--repeat", str(repeat), path],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Comparaison des modes de décodage des images")
+    parser.add_argument("images", nargs="+", help="Images à décoder (JPEG de grande taille)")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ, help="Taille d'entrée du modèle visée")
+    parser.add_argument("--repeat", type=int, default=3, help="Décodages par mesure")
+    parser.add_argument("--child", choices=MODES, help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(measure(args.images[0], args.child, args.imgsz, args.repeat)))
+        return 0
+
+    print(f"{'Image':<32}{'Mode':<10}{'Décodée':>12}{'ms':>9}{'Pic (Mo)':>10}")
+    for path in args.images:
+        for mode in MODES:
+            result = measure_in_subprocess(path, mode, args.imgsz, args.repeat)
+            print(f"{path[-31:]:<32}{mode:<10}{result['decoded']:>12}"
+                  f"{result['decode_ms']:>9.1f}{result['peak_mb']:>10.1f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
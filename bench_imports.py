@@ -0,0 +1,119 @@
+"""
+Temps d'import des modules, mesuré avec `python -X importtime`
+Fichier : bench_imports.py
+
+UTILISATION :
+python bench_imports.py
+python bench_imports.py torch ultralytics --top 20
+
+Chaque module est importé seul dans un interpréteur neuf. La ligne
+« interface » mesure les imports en tête de app.py et app_streamlit.py (lus
+dans leur code) : torch, ultralytics et pandas ne doivent pas y apparaître
+(code de sortie 1 sinon). Un module lourd déjà importé par streamlit lui-même
+(pandas avec certaines versions) est signalé sans faire échouer le contrôle.
+"""
+
+import argparse
+import ast
+import os
+import subprocess
+import sys
+
+# Modules mesurés par défaut
+DEFAULT_MODULES = ["streamlit", "numpy", "cv2", "PIL.Image", "pandas", "torch", "ultralytics"]
+
+# Applications Streamlit dont les imports de premier niveau sont contrôlés
+SHELL_APPS = ["app.py", "app_streamlit.py"]
+
+# Modules lourds qui doivent rester chargés à la demande
+LAZY_MODULES = ["torch", "ultralytics", "pandas"]
+
+
+def shell_modules(apps=SHELL_APPS):
+    """Modules importés au niveau module par les applications (hors imports différés)"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    modules = []
+    for app in apps:
+        with open(os.path.join(root, app), encoding="utf-8") as f:
+            tree = ast.parse(f.read())
+        for node in tree.body:
+            if isinstance(node, ast.Import):
+                names = [alias.name for alias in node.names]
+            elif isinstance(node, ast.ImportFrom) and node.level == 0:
+                names = [node.module]
+            else:
+                continue
+            modules += [name for name in names if name not in modules]
+    return modules
+
+
+def import_times(modules):
+    """Importe `modules` dans un nouvel interpréteur ; retourne {module: (propre µs, cumulé µs)}"""
+    code = "; ".join(f"import {module}" for module in modules)
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True,
+    )
+    times = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        times[name.strip()] = (int(self_us), int(cumulative_us))
+    return times
+
+
+def total_ms(times, modules):
+    """Temps cumulé des imports de premier niveau"""
+    return sum(times[module][1] for module in modules if module in times) / 1000
+
+
+def print_top(times, top):
+    """Modules dont l'import propre est le plus coûteux"""
+    heaviest = sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:top]
+    for name, (self_us, cumulative_us) in heaviest:
+        print(f"    {name:<50}{self_us / 1000:>9.1f}{cumulative_us / 1000:>11.1f}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Temps d'import des modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES, help="Modules à mesurer")
+    parser.add_argument("--top", type=int, default=0,
+                        help="Afficher les N sous-modules les plus coûteux de chaque import")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    print(f"{'Module':<54}{'Cumulé (ms)':>12}")
+    for module in args.modules:
+        try:
+            times = import_times([module])
+        except subprocess.CalledProcessError:
+            print(f"{module:<54}{'absent':>12}")
+            continue
+        print(f"{module:<54}{total_ms(times, [module]):>12.1f}")
+        if args.top:
+            print_top(times, args.top)
+
+    modules = shell_modules()
+    times = import_times(modules)
+    print(f"{'interface (imports de app.py)':<54}{total_ms(times, modules):>12.1f}")
+    if args.top:
+        print_top(times, args.top)
+
+    # Modules lourds chargés par streamlit lui-même : hors du contrôle de l'application
+    by_streamlit = import_times(["streamlit"])
+    inherited = [module for module in LAZY_MODULES if module in by_streamlit]
+    if inherited:
+        print(f"Importés par streamlit lui-même : {', '.join(inherited)}", file=sys.stderr)
+    eager = [module for module in LAZY_MODULES if module in times and module not in inherited]
+    if eager:
+        print(f"Modules lourds importés par l'interface : {', '.join(eager)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,173 @@
+"""
+Débit et latence selon la disposition des répliques du modèle sur les cœurs
+Fichier : bench_layouts.py
+
+UTILISATION :
+python bench_layouts.py
+python bench_layouts.py --layouts 1x32 4x8 8x4 32x1 --clients 1 4 16 64 --pin -o layouts.json
+
+Une disposition « RxT » sert R répliques du modèle avec T threads de calcul
+torch chacune. Pour chaque disposition (dans un processus neuf) et chaque
+nombre de clients simultanés, des clients en boucle fermée soumettent des
+images au planificateur de lots : on obtient la courbe débit / latence.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import numpy as np
+
+from backends import (
+    BACKENDS, DEFAULT_BACKEND, TORCH_INTEROP_THREADS, available_cpus, configure_torch_threads,
+    cpu_layout, load_replicas,
+)
+from batching import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, MicroBatcher
+from bench_pipeline import THREAD_ENV_VARS, synthetic_images
+from detection import MODEL_PATH, decode_image_scaled
+
+# Nombres de clients simultanés mesurés par défaut
+BENCH_CLIENTS = (1, 2, 4, 8, 16)
+
+# Durée de mesure de chaque point de la courbe (s)
+BENCH_DURATION = 10.0
+
+
+def default_layouts():
+    """Dispositions couvrant les cœurs disponibles : 1xN, 2x(N/2), ..., Nx1"""
+    cpus = len(available_cpus())
+    layouts, replicas = [], 1
+    while replicas <= cpus:
+        layouts.append(f"{replicas}x{cpus // replicas}")
+        replicas *= 2
+    return layouts
+
+
+def parse_layout(spec):
+    replicas, threads = (int(value) for value in spec.lower().split("x"))
+    return replicas, threads
+
+
+def closed_loop(batcher, images, clients, duration, imgsz):
+    """`clients` threads soumettent chacun une image et attendent sa réponse, en boucle"""
+    latencies = [[] for _ in range(clients)]
+    before = batcher.stats()
+    deadline = time.perf_counter() + duration
+
+    def client(index):
+        position = index
+        while time.perf_counter() < deadline:
+            image = images[position % len(images)]
+            start = time.perf_counter()
+            batcher.submit(image, imgsz=imgsz).result()
+            latencies[index].append(1000 * (time.perf_counter() - start))
+            position += clients
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    samples = np.concatenate([np.array(values) for values in latencies])
+    after = batcher.stats()
+    batches = after["batches"] - before["batches"]
+    return {
+        "clients": clients,
+        "images_per_s": len(samples) / elapsed,
+        "latency_p50_ms": float(np.percentile(samples, 50)),
+        "latency_p95_ms": float(np.percentile(samples, 95)),
+        "latency_p99_ms": float(np.percentile(samples, 99)),
+        "mean_batch_size": (after["images"] - before["images"]) / batches if batches else 0.0,
+    }
+
+
+def run_layout(args, spec):
+    """Mesure la courbe d'une disposition dans le processus courant"""
+    replicas, threads = parse_layout(spec)
+    # Un thread inter-opérations par défaut : les répliques fournissent le parallélisme
+    configure_torch_threads(TORCH_INTEROP_THREADS or 1)
+    images = [decode_image_scaled(data, args.imgsz)[0] for data in synthetic_images()]
+    models, _ = load_replicas(args.backend, args.model, replicas, (1,), args.imgsz)
+    batcher = MicroBatcher(models, args.max_batch_size, args.max_wait_ms,
+                           cpu_layout(replicas, threads, args.pin))
+    try:
+        return {
+            "layout": spec,
+            "replicas": replicas,
+            "threads": threads,
+            "pin": args.pin,
+            "points": [closed_loop(batcher, images, clients, args.duration, args.imgsz)
+                       for clients in args.clients],
+        }
+    finally:
+        batcher.close()
+
+
+def run_layout_in_subprocess(args, spec):
+    """Disposition mesurée dans un processus neuf (threads inter-opérations fixés au démarrage)"""
+    _, threads = parse_layout(spec)
+    env = {**os.environ, **{name: str(threads) for name in THREAD_ENV_VARS}}
+    command = [
+        sys.executable, __file__, "--child", spec,
+        "--backend", args.backend, "--model", args.model, "--imgsz", str(args.imgsz),
+        "--clients", *map(str, args.clients), "--duration", str(args.duration),
+        "--max-batch-size", str(args.max_batch_size), "--max-wait-ms", str(args.max_wait_ms),
+    ]
+    if args.pin:
+        command.append("--pin")
+    completed = subprocess.run(command, capture_output=True, text=True, env=env, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Courbes débit / latence par disposition des répliques")
+    parser.add_argument("--layouts", nargs="+", help="Dispositions RxT (défaut : 1xN à Nx1)")
+    parser.add_argument("--clients", type=int, nargs="+", default=list(BENCH_CLIENTS),
+                        help="Nombres de clients simultanés")
+    parser.add_argument("--duration", type=float, default=BENCH_DURATION, help="Durée par point (s)")
+    parser.add_argument("--pin", action="store_true", help="Épingler chaque réplique sur ses cœurs")
+    parser.add_argument("--imgsz", type=int, default=640, help="Taille d'entrée du modèle")
+    parser.add_argument("--max-batch-size", type=int, default=BATCH_MAX_SIZE, help="Taille maximale des lots")
+    parser.add_argument("--max-wait-ms", type=float, default=BATCH_MAX_WAIT_MS,
+                        help="Attente maximale avant un lot incomplet")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Moteur d'inférence")
+    parser.add_argument("-o", "--output", help="Courbes au format JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_layout(args, args.child)))
+        return 0
+
+    results = []
+    print(f"{'Disposition':<13}{'Clients':>8}{'img/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'Lot moy.':>10}")
+    for spec in args.layouts or default_layouts():
+        result = run_layout_in_subprocess(args, spec)
+        results.append(result)
+        label = f"{spec}{' épinglé' if args.pin else ''}"
+        for point in result["points"]:
+            print(f"{label:<13}{point['clients']:>8}{point['images_per_s']:>8.1f}"
+                  f"{point['latency_p50_ms']:>9.1f}{point['latency_p95_ms']:>9.1f}"
+                  f"{point['latency_p99_ms']:>9.1f}{point['mean_batch_size']:>10.2f}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cpus": len(available_cpus()), "results": results}, f,
+                      ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
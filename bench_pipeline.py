@@ -0,0 +1,337 @@
+"""
+Banc de performance reproductible du chemin de détection sur CPU
+Fichier : bench_pipeline.py
+
+UTILISATION :
+python bench_pipeline.py run -o bench.json
+python bench_pipeline.py run --images images_exemples/ --imgsz 320 640 --batch-sizes 1 4 -o bench.json
+python bench_pipeline.py compare bench.json baseline.json --threshold 0.1
+python bench_pipeline.py run -o bench.json --baseline baseline.json
+
+Chaque configuration (taille d'entrée, taille de lot) est mesurée dans un
+processus neuf, avec un nombre de threads fixé : chargement du modèle,
+décodage, prédiction, post-traitement et rendu. Le fichier JSON produit se
+compare à une référence ; le code de sortie vaut 1 en cas de régression.
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, DEFAULT_BACKEND, load_backend_timed
+from bench_decode import peak_rss_mb
+from detect_batch import list_images
+from detection import IOU, MODEL_PATH, decode_image_scaled, predict, to_dataframe
+from render import draw_detections, encode_image
+from result_cache import model_fingerprint
+from timing import StageTimer
+
+# Images synthétiques : tailles (largeur, hauteur) parcourues dans l'ordre, graine fixe
+SYNTHETIC_SIZES = ((640, 480), (1280, 720), (1920, 1080), (3840, 2160))
+SYNTHETIC_COUNT = 8
+SYNTHETIC_SEED = 0
+
+# Configurations mesurées par défaut
+BENCH_IMGSZ = (320, 640)
+BENCH_BATCH_SIZES = (1, 4)
+BENCH_THREADS = min(4, os.cpu_count() or 1)
+
+# Seuil de confiance de l'inférence et du post-traitement. Les images synthétiques
+# n'obtiennent que des scores faibles : au seuil de l'interface (0.5), et même au
+# plancher (0.05), post-traitement et rendu mesureraient un chemin sans boîte.
+# Avec des images réelles (--images), --conf 0.05 reproduit l'interface.
+BENCH_CONF = 0.01
+
+# Écart relatif toléré avant de signaler une régression
+REGRESSION_THRESHOLD = 0.10
+
+# Métriques comparées et sens de l'amélioration (+1 : plus haut est meilleur)
+COMPARED_METRICS = {
+    "images_per_s": 1,
+    "latency_p50_ms": -1,
+    "latency_p95_ms": -1,
+    "latency_p99_ms": -1,
+    "peak_rss_mb": -1,
+}
+
+# Variables d'environnement des bibliothèques de calcul fixées au nombre de threads,
+# dont les sessions ONNX Runtime et OpenVINO (lues par backends.py à l'import)
+THREAD_ENV_VARS = (
+    "OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS", "ORT_INTRA_THREADS", "OV_NUM_THREADS",
+)
+
+
+def synthetic_images(count=SYNTHETIC_COUNT, seed=SYNTHETIC_SEED):
+    """Images JPEG déterministes : chaussée grise et rectangles colorés de tailles variées"""
+    rng = np.random.default_rng(seed)
+    images = []
+    for i in range(count):
+        width, height = SYNTHETIC_SIZES[i % len(SYNTHETIC_SIZES)]
+        image = np.full((height, width, 3), 110, dtype=np.uint8)
+        image[: height // 3] = (200, 170, 140)
+        for _ in range(12):
+            w = int(rng.integers(width // 20, width // 5))
+            h = int(rng.integers(height // 20, height // 5))
+            x = int(rng.integers(0, width - w))
+            y = int(rng.integers(height // 3, height - h))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.rectangle(image, (x, y), (x + w, y + h), color, -1)
+        noise = rng.integers(-8, 9, image.shape, dtype=np.int16)
+        image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        images.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return images
+
+
+def bench_images(source=None, limit=None):
+    """Octets des images du banc : synthétiques, puis celles du dossier `source`"""
+    images = synthetic_images()
+    if source:
+        for path in list_images(source)[:limit]:
+            with open(path, "rb") as f:
+                images.append(f.read())
+    return images
+
+
+def configure_threads(backend, threads):
+    """Fixe le nombre de threads d'OpenCV, et de torch pour les moteurs PyTorch, dans le processus courant"""
+    if backend.startswith("pytorch"):
+        import torch
+
+        torch.set_num_threads(threads)
+    cv2.setNumThreads(threads)
+
+
+def engine_version(backend):
+    """Version de la bibliothèque d'inférence du moteur, importée seulement pour celui-ci"""
+    if backend.startswith("pytorch"):
+        import torch
+
+        return {"torch": torch.__version__}
+    if backend == "onnx":
+        import onnxruntime
+
+        return {"onnxruntime": onnxruntime.__version__}
+    from openvino.runtime import get_version
+
+    return {"openvino": get_version()}
+
+
+def run_config(backend, model_path, images, imgsz, batch_size, repeat, threads, conf=BENCH_CONF):
+    """Mesure le chemin complet pour une configuration, dans le processus courant"""
+    configure_threads(backend, threads)
+    load_start = time.perf_counter()
+    model, _ = load_backend_timed(backend, model_path, (batch_size,), imgsz)
+    load_seconds = time.perf_counter() - load_start
+
+    timer = StageTimer()
+    latencies = []
+    detections_count = 0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for first in range(0, len(images), batch_size):
+            chunk = images[first:first + batch_size]
+            batch_start = time.perf_counter()
+            with timer.stage("décodage", len(chunk)):
+                decoded = [decode_image_scaled(data, imgsz) for data in chunk]
+            with timer.stage("prédiction", len(chunk)):
+                batch = predict(model, [image for image, _, _ in decoded],
+                                batch_size=batch_size, imgsz=imgsz, conf=conf, iou=IOU)
+            with timer.stage("post-traitement", len(chunk)):
+                filtered = [detections.filter(conf) for detections in batch]
+                for detections, (_, scale, shape) in zip(filtered, decoded):
+                    to_dataframe(detections.to_original(scale, shape=shape))
+            with timer.stage("rendu", len(chunk)):
+                for detections, (image, _, _) in zip(filtered, decoded):
+                    encode_image(draw_detections(image, detections))
+            latencies.append(1000 * (time.perf_counter() - batch_start))
+            detections_count += sum(len(detections) for detections in filtered)
+    elapsed = time.perf_counter() - start
+
+    processed = repeat * len(images)
+    return {
+        "backend": backend,
+        "imgsz": imgsz,
+        "batch_size": batch_size,
+        "threads": threads,
+        "images": processed,
+        "load_s": load_seconds,
+        "images_per_s": processed / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies, 50)),
+        "latency_p95_ms": float(np.percentile(latencies, 95)),
+        "latency_p99_ms": float(np.percentile(latencies, 99)),
+        "stages_ms_per_image": {row["Étape"]: row["ms / élément"] for row in timer.report()},
+        "detections": detections_count // repeat,
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def run_config_in_subprocess(args, imgsz, batch_size):
+    """Lance la mesure d'une configuration dans un processus neuf aux threads fixés"""
+    env = {**os.environ, **{name: str(args.threads) for name in THREAD_ENV_VARS}}
+    command = [
+        sys.executable, __file__, "run", "--child",
+        "--backend", args.backend, "--model", args.model,
+        "--imgsz", str(imgsz), "--batch-sizes", str(batch_size),
+        "--repeat", str(args.repeat), "--threads", str(args.threads), "--conf", str(args.conf),
+    ]
+    if args.images:
+        command += ["--images", args.images, "--limit", str(args.limit)]
+    completed = subprocess.run(command, capture_output=True, text=True, env=env, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def metadata(args, image_count):
+    """Contexte de la mesure, pour ne comparer que des résultats comparables"""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "date": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": commit,
+        "model": os.path.basename(args.model),
+        "model_fingerprint": model_fingerprint(args.model)[:16],
+        "backend": args.backend,
+        "threads": args.threads,
+        "conf": args.conf,
+        "repeat": args.repeat,
+        "images": image_count,
+        "python": platform.python_version(),
+        **engine_version(args.backend),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def compare(current, baseline, threshold=REGRESSION_THRESHOLD):
+    """Écart relatif de chaque métrique par configuration ; liste des régressions"""
+    reference = {(r["backend"], r["imgsz"], r["batch_size"]): r for r in baseline["results"]}
+    rows, regressions = [], []
+    for result in current["results"]:
+        key = (result["backend"], result["imgsz"], result["batch_size"])
+        base = reference.get(key)
+        if base is None:
+            continue
+        for metric, direction in COMPARED_METRICS.items():
+            before, after = base[metric], result[metric]
+            change = (after - before) / before if before else 0.0
+            regressed = direction * change < -threshold
+            rows.append((key, metric, before, after, change, regressed))
+            if regressed:
+                regressions.append((key, metric, change))
+    return rows, regressions
+
+
+def print_results(results):
+    print(f"{'Moteur':<10}{'imgsz':>6}{'Lot':>5}{'img/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'p99 ms':>9}{'RSS Mo':>8}{'Charg. s':>9}{'Boîtes':>8}")
+    for r in results:
+        print(f"{r['backend']:<10}{r['imgsz']:>6}{r['batch_size']:>5}{r['images_per_s']:>8.1f}"
+              f"{r['latency_p50_ms']:>9.1f}{r['latency_p95_ms']:>9.1f}{r['latency_p99_ms']:>9.1f}"
+              f"{r['peak_rss_mb']:>8.0f}{r['load_s']:>9.2f}{r['detections']:>8}")
+    if any(r["detections"] == 0 for r in results):
+        print("Attention : aucune boîte détectée, post-traitement et rendu mesurés à vide "
+              "(abaisser --conf ou fournir des images réelles avec --images)", file=sys.stderr)
+
+
+def print_comparison(rows, threshold):
+    print(f"\n{'Configuration':<24}{'Métrique':<16}{'Référence':>11}{'Actuel':>11}{'Écart':>9}")
+    for (backend, imgsz, batch_size), metric, before, after, change, regressed in rows:
+        flag = "  RÉGRESSION" if regressed else ""
+        print(f"{f'{backend} {imgsz} x{batch_size}':<24}{metric:<16}{before:>11.1f}{after:>11.1f}"
+              f"{change:>+9.1%}{flag}")
+    print(f"(seuil de régression : {threshold:.0%})")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Banc de performance du chemin de détection")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Mesure les configurations et écrit le résultat JSON")
+    run.add_argument("-o", "--output", help="Fichier JSON de résultats")
+    run.add_argument("--images", help="Dossier d'images d'exemple ajoutées aux images synthétiques")
+    run.add_argument("--limit", type=int, default=16, help="Nombre maximal d'images d'exemple")
+    run.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    run.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Moteur d'inférence")
+    run.add_argument("--imgsz", type=int, nargs="+", default=list(BENCH_IMGSZ),
+                     help="Tailles d'entrée mesurées")
+    run.add_argument("--batch-sizes", type=int, nargs="+", default=list(BENCH_BATCH_SIZES),
+                     help="Tailles de lot mesurées")
+    run.add_argument("--repeat", type=int, default=3, help="Passes sur les images")
+    run.add_argument("--threads", type=int, default=BENCH_THREADS, help="Threads de calcul")
+    run.add_argument("--conf", type=float, default=BENCH_CONF,
+                     help="Seuil de confiance de l'inférence et du post-traitement")
+    run.add_argument("--baseline", help="Résultat de référence à comparer")
+    run.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                     help="Écart relatif toléré (0.1 = 10 %%)")
+    run.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+
+    diff = commands.add_parser("compare", help="Compare un résultat à une référence")
+    diff.add_argument("current", help="Résultat JSON mesuré")
+    diff.add_argument("baseline", help="Résultat JSON de référence")
+    diff.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD,
+                      help="Écart relatif toléré (0.1 = 10 %%)")
+    return parser.parse_args(argv)
+
+
+def report_comparison(current, baseline_path, threshold):
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline["meta"].get("cpu_count") != current["meta"].get("cpu_count"):
+        print("Attention : référence mesurée sur une autre machine", file=sys.stderr)
+    if baseline["meta"].get("conf") != current["meta"].get("conf"):
+        print("Attention : référence mesurée avec un autre seuil de confiance", file=sys.stderr)
+    rows, regressions = compare(current, baseline, threshold)
+    print_comparison(rows, threshold)
+    if regressions:
+        print(f"{len(regressions)} régression(s) au-delà de {threshold:.0%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "compare":
+        with open(args.current, encoding="utf-8") as f:
+            current = json.load(f)
+        return report_comparison(current, args.baseline, args.threshold)
+
+    if args.child:
+        images = bench_images(args.images, args.limit)
+        print(json.dumps(run_config(
+            args.backend, args.model, images, args.imgsz[0], args.batch_sizes[0],
+            args.repeat, args.threads, args.conf,
+        )))
+        return 0
+
+    results = []
+    for imgsz in args.imgsz:
+        for batch_size in args.batch_sizes:
+            print(f"Mesure imgsz={imgsz}, lot={batch_size}...", file=sys.stderr)
+            results.append(run_config_in_subprocess(args, imgsz, batch_size))
+    current = {"meta": metadata(args, len(bench_images(args.images, args.limit))), "results": results}
+    print_results(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(current, f, ensure_ascii=False, indent=2)
+    if args.baseline:
+        return report_comparison(current, args.baseline, args.threshold)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+"""
+Saturation : répliques dans le processus principal ou processus d'inférence
+Fichier : bench_pool.py
+
+UTILISATION :
+python bench_pool.py
+python bench_pool.py --modes threads:4 processes:4 processes-copy:4 --clients 1 4 16 64 -o pool.json
+python bench_pool.py --modes processes:4 --restart
+
+Modes : `threads:N` (N répliques servies par des threads, comme
+INFERENCE_REPLICAS), `processes:N` (N processus partageant les poids projetés
+en mémoire, comme INFERENCE_PROCESSES) et `processes-copy:N` (N processus
+chargeant chacun best.pt). Le nombre de clients en boucle fermée augmente
+jusqu'à ce que le débit ne progresse plus : on obtient le point de saturation,
+et la mémoire totale (PSS, pages partagées comptées au prorata) du service.
+Avec `--restart`, un redémarrage progressif des processus est lancé pendant
+la dernière mesure : aucune requête ne doit échouer.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from backends import BACKENDS, DEFAULT_BACKEND, available_cpus, cpu_layout, load_replicas
+from batching import BATCH_MAX_SIZE, BATCH_MAX_WAIT_MS, MicroBatcher
+from bench_layouts import closed_loop
+from bench_pipeline import synthetic_images
+from detection import MODEL_PATH, decode_image_scaled
+from inference_pool import InferencePool
+
+# Nombres de clients simultanés essayés par défaut
+BENCH_CLIENTS = (1, 2, 4, 8, 16, 32)
+
+# Durée de mesure de chaque point (s)
+BENCH_DURATION = 10.0
+
+# Gain de débit sous lequel le service est considéré saturé
+SATURATION_GAIN = 0.05
+
+MODES = ("threads", "processes", "processes-copy")
+
+
+def default_modes():
+    cpus = len(available_cpus())
+    return [f"threads:{cpus}", f"processes:{cpus}", f"processes-copy:{cpus}"]
+
+
+def parse_mode(spec):
+    mode, _, count = spec.partition(":")
+    if mode not in MODES:
+        raise ValueError(f"Mode inconnu : {mode} (choix : {', '.join(MODES)})")
+    return mode, int(count or 1)
+
+
+def pss_mb(pids):
+    """Mémoire proportionnelle (PSS) cumulée des processus, en Mo (Linux uniquement)"""
+    total = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/smaps_rollup") as f:
+                for line in f:
+                    if line.startswith("Pss:"):
+                        total += int(line.split()[1])
+        except OSError:
+            return None
+    return total / 1024
+
+
+def run_mode(args, spec):
+    """Mesure la courbe de saturation d'un mode dans le processus courant"""
+    mode, count = parse_mode(spec)
+    images = [decode_image_scaled(data, args.imgsz)[0] for data in synthetic_images()]
+    pool = None
+    if mode == "threads":
+        models, _ = load_replicas(args.backend, args.model, count, (1,), args.imgsz)
+        batcher = MicroBatcher(models, args.max_batch_size, args.max_wait_ms, cpu_layout(count))
+    else:
+        pool = InferencePool(count, args.backend, args.model, warmup=(1,), imgsz=args.imgsz,
+                             share_weights=mode == "processes")
+        batcher = MicroBatcher(pool.workers, args.max_batch_size, args.max_wait_ms)
+
+    points, restart = [], None
+    try:
+        for index, clients in enumerate(args.clients):
+            last = index == len(args.clients) - 1
+            restarter = None
+            if pool and args.restart and last:
+                restarter = threading.Timer(args.duration / 4, pool.restart)
+                restarter.start()
+            try:
+                point = closed_loop(batcher, images, clients, args.duration, args.imgsz)
+            except Exception as e:
+                point = {"clients": clients, "error": f"{type(e).__name__}: {e}"}
+            if restarter:
+                restarter.join()
+                restart = {"clients": clients, "restarts": pool.stats()["restarts"],
+                           "ok": "error" not in point}
+            points.append(point)
+            if "error" in point:
+                break
+            previous = points[-2]["images_per_s"] if len(points) > 1 else 0.0
+            # Saturé : plus de clients n'apportent plus de débit (toutes les mesures avec --restart)
+            saturated = previous and point["images_per_s"] < previous * (1 + SATURATION_GAIN)
+            if saturated and not (pool and args.restart):
+                break
+        # Mémoire en charge, modèle et tampons alloués
+        memory = pss_mb([os.getpid()] + ([worker.pid for worker in pool.workers] if pool else []))
+        return {"mode": mode, "count": count, "pss_mb": memory, "points": points,
+                "saturation": max(points, key=lambda p: p.get("images_per_s", 0.0)), "restart": restart}
+    finally:
+        batcher.close()
+        if pool:
+            pool.close()
+
+
+def run_mode_in_subprocess(args, spec):
+    """Mode mesuré dans un processus neuf"""
+    command = [
+        sys.executable, __file__, "--child", spec,
+        "--backend", args.backend, "--model", args.model, "--imgsz", str(args.imgsz),
+        "--clients", *map(str, args.clients), "--duration", str(args.duration),
+        "--max-batch-size", str(args.max_batch_size), "--max-wait-ms", str(args.max_wait_ms),
+    ]
+    if args.restart:
+        command.append("--restart")
+    completed = subprocess.run(command, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Saturation : threads ou processus d'inférence")
+    parser.add_argument("--modes", nargs="+", help="Modes mode:N (défaut : un par cœur pour chaque mode)")
+    parser.add_argument("--clients", type=int, nargs="+", default=list(BENCH_CLIENTS),
+                        help="Nombres croissants de clients simultanés")
+    parser.add_argument("--duration", type=float, default=BENCH_DURATION, help="Durée par point (s)")
+    parser.add_argument("--restart", action="store_true",
+                        help="Redémarrage progressif des processus pendant la dernière mesure")
+    parser.add_argument("--imgsz", type=int, default=640, help="Taille d'entrée du modèle")
+    parser.add_argument("--max-batch-size", type=int, default=BATCH_MAX_SIZE, help="Taille maximale des lots")
+    parser.add_argument("--max-wait-ms", type=float, default=BATCH_MAX_WAIT_MS,
+                        help="Attente maximale avant un lot incomplet")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Moteur d'inférence")
+    parser.add_argument("-o", "--output", help="Courbes au format JSON")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.child:
+        print(json.dumps(run_mode(args, args.child)))
+        return 0
+
+    results = []
+    print(f"{'Mode':<20}{'Clients':>8}{'img/s':>8}{'p50 ms':>9}{'p99 ms':>9}{'PSS Mo':>9}")
+    for spec in args.modes or default_modes():
+        parse_mode(spec)
+        result = run_mode_in_subprocess(args, spec)
+        results.append(result)
+        memory = f"{result['pss_mb']:.0f}" if result["pss_mb"] is not None else "-"
+        for point in result["points"]:
+            if "error" in point:
+                print(f"{spec:<20}{point['clients']:>8}  échec : {point['error']}")
+                continue
+            print(f"{spec:<20}{point['clients']:>8}{point['images_per_s']:>8.1f}"
+                  f"{point['latency_p50_ms']:>9.1f}{point['latency_p99_ms']:>9.1f}{memory:>9}")
+        saturation = result["saturation"]
+        print(f"{spec:<20}saturation à {saturation['clients']} clients"
+              f" ({saturation.get('images_per_s', 0.0):.1f} img/s)")
+        if result["restart"]:
+            status = "sans échec" if result["restart"]["ok"] else "avec échecs"
+            print(f"{spec:<20}{result['restart']['restarts']} redémarrages sous charge, {status}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"cpus": len(available_cpus()), "results": results}, f,
+                      ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,83 @@
+"""
+Latence et nombre de détections de chaque profil vitesse / précision
+Fichier : bench_profiles.py
+
+UTILISATION :
+python bench_profiles.py images_exemples/
+python bench_profiles.py images_exemples/ --backend onnx --profiles fast balanced --repeat 3
+"""
+
+import argparse
+import sys
+import time
+
+import numpy as np
+
+from backends import BACKENDS, DEFAULT_BACKEND, load_backend, warm_up
+from detection import CONF_FLOOR, IOU, MODEL_PATH, PROFILES, predict
+from quantize_openvino import load_images
+
+
+def bench_profile(model, images, imgsz, conf, repeat):
+    """Latence par image (moyenne, p50, p95 en ms) et détections par classe au seuil `conf`"""
+    warm_up(model, (1,), imgsz)
+    latencies = []
+    counts = {}
+    for pass_index in range(repeat):
+        for image in images:
+            start = time.perf_counter()
+            detections = predict(model, [image], batch_size=1, imgsz=imgsz, conf=CONF_FLOOR, iou=IOU)[0]
+            latencies.append(1000 * (time.perf_counter() - start))
+            if pass_index == 0:
+                filtered = detections.filter(conf)
+                per_class = np.bincount(filtered.classes, minlength=len(filtered.names))
+                for cls, name in filtered.names.items():
+                    counts[name] = counts.get(name, 0) + int(per_class[cls])
+    return {
+        "latency_mean": float(np.mean(latencies)),
+        "latency_p50": float(np.percentile(latencies, 50)),
+        "latency_p95": float(np.percentile(latencies, 95)),
+        "counts": counts,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Comparaison des profils vitesse / précision")
+    parser.add_argument("images", help="Dossier d'images d'exemple")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Moteur d'inférence")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES),
+                        help="Profils comparés")
+    parser.add_argument("--conf", type=float, default=0.5, help="Seuil de confiance des comptages")
+    parser.add_argument("--limit", type=int, help="Nombre maximal d'images")
+    parser.add_argument("--repeat", type=int, default=1, help="Passes sur les images (latence)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    _, images = load_images(args.images, args.limit)
+    if not images:
+        print(f"Aucune image trouvée dans {args.images}", file=sys.stderr)
+        return 1
+    model = load_backend(args.backend, args.model)
+
+    results = {profile: bench_profile(model, images, PROFILES[profile], args.conf, args.repeat)
+               for profile in args.profiles}
+
+    names = list(next(iter(results.values()))["counts"])
+    print(f"{len(images)} image(s), moteur {args.backend}, détections au seuil {args.conf}")
+    header = f"{'Profil':<13}{'imgsz':>6}{'moy. ms':>9}{'p50 ms':>8}{'p95 ms':>8}{'Total':>7}"
+    print(header + "".join(f"{name[:12]:>13}" for name in names))
+    for profile, result in results.items():
+        counts = result["counts"]
+        print(
+            f"{profile:<13}{PROFILES[profile]:>6}{result['latency_mean']:>9.1f}"
+            f"{result['latency_p50']:>8.1f}{result['latency_p95']:>8.1f}{sum(counts.values()):>7}"
+            + "".join(f"{counts[name]:>13}" for name in names)
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""
+Comptage des véhicules franchissant des lignes ou entrant dans des zones
+Fichier : counting.py
+
+Les coordonnées des lignes et des zones sont en pixels, ou relatives à la
+taille de l'image si toutes sont comprises entre 0 et 1 (« 0,0.6,1,0.6 »).
+"""
+
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+# Colonnes des événements de comptage
+EVENT_COLUMNS = ["Temps (s)", "Image", "Compteur", "Classe", "ID", "Sens"]
+
+# Couleur (RVB) des lignes et zones dessinées
+COUNTER_COLOR = (255, 255, 0)
+
+# Ligne proposée par défaut dans l'interface : horizontale aux 3/5 de la hauteur
+DEFAULT_COUNT_LINE = "0,0.6,1,0.6"
+
+
+@dataclass
+class Line:
+    """Ligne virtuelle : compte les véhicules qui la franchissent, dans chaque sens"""
+    name: str
+    points: np.ndarray   # (2, 2) extrémités en pixels
+    # « aller » : passage vers la droite de la ligne orientée du 1er au 2e point, en
+    # coordonnées image (y vers le bas) ; ligne tracée de gauche à droite : vers le bas
+    directions = ("aller", "retour")
+
+
+@dataclass
+class Zone:
+    """Zone polygonale : compte les véhicules qui y entrent et qui en sortent"""
+    name: str
+    points: np.ndarray   # (K, 2) sommets en pixels
+    directions = ("entrée", "sortie")
+
+
+def parse_points(spec, width, height):
+    """« x1,y1 x2,y2 ... » ou « x1,y1,x2,y2 » -> tableau (K, 2) en pixels"""
+    values = np.array([float(v) for v in spec.replace(" ", ",").split(",") if v], dtype=np.float64)
+    if len(values) < 4 or len(values) % 2:
+        raise ValueError(f"Coordonnées invalides : {spec!r}")
+    points = values.reshape(-1, 2)
+    if np.all((points >= 0) & (points <= 1)):
+        points = points * (width, height)
+    return points
+
+
+def anchors(detections):
+    """Point de contact au sol de chaque boîte : milieu du bord inférieur"""
+    boxes = detections.boxes
+    return np.stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]], axis=1).astype(np.float64)
+
+
+def _orientation(a, b, points):
+    """Signe du produit vectoriel (b - a) x (p - a) pour chaque point"""
+    return (b[..., 0] - a[..., 0]) * (points[..., 1] - a[..., 1]) - \
+        (b[..., 1] - a[..., 1]) * (points[..., 0] - a[..., 0])
+
+
+def line_crossings(line, previous, current):
+    """Franchissements de la ligne par les déplacements previous -> current (N, 2)
+
+    Retourne +1 (de sa gauche vers sa droite, ligne orientée en coordonnées image),
+    -1 (sens inverse) ou 0.
+    """
+    a, b = line[0], line[1]
+    side_before = _orientation(a, b, previous) > 0
+    side_after = _orientation(a, b, current) > 0
+    # Le déplacement doit couper le segment lui-même, pas son prolongement
+    within = _orientation(previous, current, a) * _orientation(previous, current, b) <= 0
+    crossed = (side_before != side_after) & within
+    return np.where(crossed, np.where(side_after, 1, -1), 0)
+
+
+def points_in_polygon(points, polygon):
+    """Test du rayon vectorisé : points (N, 2) à l'intérieur du polygone (K, 2)"""
+    x, y = points[:, :1], points[:, 1:]
+    x1, y1 = polygon[:, 0], polygon[:, 1]
+    x2, y2 = np.roll(polygon[:, 0], -1), np.roll(polygon[:, 1], -1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        crosses = ((y1 > y) != (y2 > y)) & (x < (x2 - x1) * (y - y1) / (y2 - y1) + x1)
+    return np.count_nonzero(crosses, axis=1) % 2 == 1
+
+
+class CrossingCounter:
+    """Compte par classe les franchissements de lignes et les entrées/sorties de zones
+
+    Consomme les détections suivies (avec `ids`) image après image ; chaque
+    véhicule est compté au plus une fois par compteur et par sens.
+    """
+
+    def __init__(self, counters):
+        self.counters = list(counters)
+        self.names = {}
+        self.counts = {}
+        self._counted = set()
+        self._ids = np.zeros(0, dtype=np.int64)
+        self._points = np.zeros((0, 2))
+        self._inside = [np.zeros(0, dtype=bool) for _ in self.counters]
+        self.first_timestamp = None
+        self.last_timestamp = None
+
+    def update(self, tracks, timestamp, index=None):
+        """Met à jour les compteurs ; retourne les nouveaux événements (dictionnaires EVENT_COLUMNS)"""
+        if tracks.ids is None:
+            raise ValueError("Le comptage nécessite des détections suivies (tracking.Tracker)")
+        self.names = tracks.names
+        if self.first_timestamp is None:
+            self.first_timestamp = timestamp
+        self.last_timestamp = timestamp
+
+        ids, points = tracks.ids, anchors(tracks)
+        # Position précédente des pistes déjà vues
+        _, current_idx, previous_idx = np.intersect1d(ids, self._ids, return_indices=True)
+
+        events = []
+        inside_now = []
+        for counter_idx, counter in enumerate(self.counters):
+            if isinstance(counter, Line):
+                direction = np.zeros(len(ids), dtype=np.int64)
+                direction[current_idx] = line_crossings(
+                    counter.points, self._points[previous_idx], points[current_idx]
+                )
+            else:
+                inside = points_in_polygon(points, counter.points)
+                was_inside = np.zeros(len(ids), dtype=bool)
+                was_inside[current_idx] = self._inside[counter_idx][previous_idx]
+                seen = np.zeros(len(ids), dtype=bool)
+                seen[current_idx] = True
+                # Une piste qui apparaît directement dans la zone y est entrée
+                direction = np.where(inside & ~was_inside, 1, np.where(~inside & was_inside & seen, -1, 0))
+                inside_now.append(inside)
+
+            for i in np.flatnonzero(direction):
+                sens = counter.directions[0] if direction[i] > 0 else counter.directions[1]
+                key = (counter_idx, int(ids[i]), sens)
+                if key in self._counted:
+                    continue
+                self._counted.add(key)
+                cls = int(tracks.classes[i])
+                count_key = (counter.name, self.names.get(cls, f"Classe {cls}"), sens)
+                self.counts[count_key] = self.counts.get(count_key, 0) + 1
+                events.append({
+                    "Temps (s)": timestamp, "Image": index, "Compteur": counter.name,
+                    "Classe": count_key[1], "ID": int(ids[i]), "Sens": sens,
+                })
+
+        zones = iter(inside_now)
+        self._inside = [next(zones) if isinstance(counter, Zone) else self._inside[k]
+                        for k, counter in enumerate(self.counters)]
+        self._ids, self._points = ids, points
+        return events
+
+    def summary(self):
+        """Comptes par compteur, classe et sens, avec le débit par minute de vidéo"""
+        duration = (self.last_timestamp or 0.0) - (self.first_timestamp or 0.0)
+        return [
+            {
+                "Compteur": counter, "Classe": name, "Sens": sens, "Véhicules": count,
+                "Véhicules / min": 60 * count / duration if duration else 0.0,
+            }
+            for (counter, name, sens), count in sorted(self.counts.items())
+        ]
+
+    def draw(self, canvas, channels="RGB"):
+        """Dessine les lignes et les zones sur l'image (en place)"""
+        color = COUNTER_COLOR[::-1] if channels == "BGR" else COUNTER_COLOR
+        thickness = max(round(sum(canvas.shape[:2]) / 2 * 0.003), 2)
+        for counter in self.counters:
+            points = np.rint(counter.points).astype(np.int32)
+            cv2.polylines(canvas, [points], isinstance(counter, Zone), color, thickness, cv2.LINE_AA)
+            cv2.putText(canvas, counter.name, tuple(points[0].tolist()), 0, thickness / 3, color,
+                        max(thickness - 1, 1), cv2.LINE_AA)
+        return canvas
+
+
+def build_counters(lines=(), zones=(), width=1, height=1):
+    """Crée les compteurs à partir de spécifications texte (voir parse_points)"""
+    counters = [Line(f"ligne {i}", parse_points(spec, width, height)[:2])
+                for i, spec in enumerate(lines, 1)]
+    for i, spec in enumerate(zones, 1):
+        points = parse_points(spec, width, height)
+        if len(points) < 3:
+            raise ValueError(f"Une zone demande au moins trois sommets : {spec!r}")
+        counters.append(Zone(f"zone {i}", points))
+    return counters
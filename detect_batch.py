@@ -0,0 +1,294 @@
+"""
+Détection de véhicules en ligne de commande, sur un dossier d'images
+Fichier : detect_batch.py
+
+UTILISATION :
+python detect_batch.py images/ -o detections.csv
+python detect_batch.py --file-list frames.txt -o detections.parquet --batch-size 16
+python detect_batch.py images/ -o detections.jsonl --resume
+"""
+
+import argparse
+import glob
+import itertools
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+from backends import BACKENDS, DEFAULT_BACKEND, load_backend
+from detection import (
+    BATCH_SIZE, DEFAULT_CONF, DEFAULT_PROFILE, IOU, MODEL_PATH, PROFILES, decode_image, predict,
+    to_dataframe,
+)
+
+# Extensions d'images prises en compte lors du parcours d'un dossier
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".bmp", ".webp"}
+
+# Formats de sortie, déduits de l'extension du fichier
+OUTPUT_FORMATS = {".csv": "csv", ".parquet": "parquet", ".jsonl": "jsonl"}
+
+# Une partie Parquet n'est lisible qu'une fois fermée (pied de fichier) : elle est
+# close après ce nombre de lignes ou cette durée, et ses images marquées traitées
+PARQUET_PART_ROWS = 100_000
+PARQUET_PART_SECONDS = 60.0
+
+
+def list_images(source=None, file_list=None):
+    """Liste triée des images d'un dossier (récursif) ou d'un fichier de chemins"""
+    if file_list:
+        with open(file_list, encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    paths = []
+    for root, _, files in os.walk(source):
+        for name in files:
+            if os.path.splitext(name)[1].lower() in IMAGE_EXTENSIONS:
+                paths.append(os.path.join(root, name))
+    return sorted(paths)
+
+
+def read_image(path):
+    """Lit et décode une image depuis le disque"""
+    with open(path, "rb") as f:
+        return decode_image(f.read())
+
+
+def decoded_images(paths, workers, prefetch):
+    """Décode les images dans un pool de threads, en conservant l'ordre
+
+    Au plus `prefetch` images sont en cours de décodage ou en attente, ce qui
+    borne la mémoire quel que soit le nombre de fichiers.
+    """
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="decode") as executor:
+        pending = deque()
+        paths = iter(paths)
+        for path in paths:
+            pending.append((path, executor.submit(read_image, path)))
+            if len(pending) >= prefetch:
+                break
+        while pending:
+            path, future = pending.popleft()
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, executor.submit(read_image, next_path)))
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, None, e
+
+
+def batches(items, size):
+    """Regroupe un itérable en listes de taille `size`"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class DetectionWriter:
+    """Écriture en flux des détections en CSV, Parquet ou JSONL
+
+    En Parquet, les détections sont réparties en parties (`<sortie>.parquet`,
+    puis `<sortie>.part1.parquet`, ...) : un fichier Parquet ne peut pas être
+    complété, ni relu avant sa fermeture. La partie en cours est écrite sous un
+    nom temporaire et ne prend son nom qu'une fois fermée.
+    """
+
+    def __init__(self, path, output_format, append=False):
+        self.path = path
+        self.format = output_format
+        self._parquet_writer = None
+        self._part_path = None
+        self._part_rows = 0
+        self._part_start = 0.0
+        self._has_rows = append and os.path.exists(path) and os.path.getsize(path) > 0
+
+        if output_format == "parquet":
+            if not append:
+                # Nouvelle exécution : les parties d'une exécution précédente sont remplacées
+                for stale in [path, *self._part_paths()]:
+                    if os.path.exists(stale):
+                        os.remove(stale)
+            self._file = None
+        else:
+            self._file = open(path, "a" if append else "w", encoding="utf-8", newline="")
+
+    def _part_paths(self):
+        stem, ext = os.path.splitext(self.path)
+        return glob.glob(f"{glob.escape(stem)}.part*{ext}")
+
+    def _next_part(self):
+        """Premier nom libre : la sortie elle-même, puis <stem>.partN<ext>"""
+        stem, ext = os.path.splitext(self.path)
+        names = itertools.chain([self.path], (f"{stem}.part{n}{ext}" for n in itertools.count(1)))
+        return next(name for name in names if not os.path.exists(name))
+
+    def write(self, df):
+        if df.empty:
+            return
+        if self.format == "csv":
+            df.to_csv(self._file, header=not self._has_rows, index=False)
+        elif self.format == "jsonl":
+            text = df.to_json(orient="records", lines=True, force_ascii=False)
+            self._file.write(text if text.endswith("\n") else text + "\n")
+        else:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            if self._parquet_writer is None:
+                self._part_path = self._next_part()
+                self._parquet_writer = pq.ParquetWriter(f"{self._part_path}.tmp", table.schema)
+                self._part_start = time.perf_counter()
+            self._parquet_writer.write_table(table)
+            self._part_rows += len(table)
+        self._has_rows = True
+
+    def flush(self, force=False):
+        """Rend durables les détections écrites ; retourne False si elles ne le sont pas encore
+
+        En Parquet, la partie en cours n'est fermée qu'après PARQUET_PART_ROWS
+        lignes ou PARQUET_PART_SECONDS secondes (ou avec `force`).
+        """
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+        if self._parquet_writer is None:
+            return True
+        full = self._part_rows >= PARQUET_PART_ROWS
+        if not (force or full or time.perf_counter() - self._part_start >= PARQUET_PART_SECONDS):
+            return False
+        self._parquet_writer.close()
+        os.replace(f"{self._part_path}.tmp", self._part_path)
+        self._parquet_writer, self._part_rows = None, 0
+        return True
+
+    def close(self):
+        if self._parquet_writer is not None:
+            self.flush(force=True)
+        if self._file is not None:
+            self._file.close()
+
+
+def load_checkpoint(path):
+    """Ensemble des images déjà traitées lors d'une exécution précédente"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding="utf-8") as f:
+        return {line.rstrip("\n") for line in f if line.strip()}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Détection de véhicules sur un dossier d'images")
+    parser.add_argument("source", nargs="?", help="Dossier d'images (parcours récursif)")
+    parser.add_argument("--file-list", help="Fichier texte contenant un chemin d'image par ligne")
+    parser.add_argument("-o", "--output", required=True, help="Fichier de sortie (.csv, .parquet ou .jsonl)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Moteur d'inférence")
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF, help="Seuil de confiance")
+    parser.add_argument("--iou", type=float, default=IOU, help="Seuil IoU de la NMS")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="Profil vitesse / précision (taille d'entrée du modèle)")
+    parser.add_argument("--imgsz", type=int, help="Taille d'entrée du modèle (remplace --profile)")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE, help="Images par lot")
+    parser.add_argument("--workers", type=int, default=4, help="Threads de décodage")
+    parser.add_argument("--checkpoint", help="Fichier de reprise (défaut : <output>.ckpt)")
+    parser.add_argument("--resume", action="store_true", help="Reprendre après une interruption")
+    parser.add_argument("--report-every", type=float, default=10.0, help="Intervalle du rapport de débit (s)")
+    args = parser.parse_args(argv)
+
+    if not args.source and not args.file_list:
+        parser.error("indiquez un dossier source ou --file-list")
+    if os.path.splitext(args.output)[1].lower() not in OUTPUT_FORMATS:
+        parser.error("le fichier de sortie doit se terminer par .csv, .parquet ou .jsonl")
+    if args.output.lower().endswith(".parquet"):
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            parser.error("la sortie Parquet nécessite pyarrow (pip install pyarrow)")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    output_format = OUTPUT_FORMATS[os.path.splitext(args.output)[1].lower()]
+    checkpoint_path = args.checkpoint or f"{args.output}.ckpt"
+
+    paths = list_images(args.source, args.file_list)
+    done = load_checkpoint(checkpoint_path) if args.resume else set()
+    todo = [path for path in paths if path not in done]
+    print(f"{len(paths)} image(s) trouvée(s), {len(todo)} à traiter", file=sys.stderr)
+    if not todo:
+        return 0
+
+    model = load_backend(args.backend, args.model)
+    writer = DetectionWriter(args.output, output_format, append=args.resume)
+    checkpoint = open(checkpoint_path, "a" if args.resume else "w", encoding="utf-8")
+
+    processed = failed = num_detections = 0
+    # Images dont les détections ne sont pas encore durables sur disque
+    uncommitted = []
+    start = last_report = time.perf_counter()
+    try:
+        decoded = decoded_images(todo, args.workers, prefetch=2 * args.batch_size)
+        for batch in batches(decoded, args.batch_size):
+            for path, _, error in batch:
+                if error is not None:
+                    failed += 1
+                    print(f"⚠️ {path} ignorée : {error}", file=sys.stderr)
+
+            valid = [(path, image) for path, image, error in batch if error is None]
+            if valid:
+                batch_detections = predict(
+                    model, [image for _, image in valid], batch_size=args.batch_size,
+                    imgsz=args.imgsz or PROFILES[args.profile], conf=args.conf, iou=args.iou,
+                )
+                frames = []
+                for (path, _), detections in zip(valid, batch_detections):
+                    df = to_dataframe(detections)
+                    df.insert(0, "Image", path)
+                    frames.append(df)
+                    num_detections += len(detections)
+                writer.write(pd.concat(frames, ignore_index=True))
+
+            # Les images ne sont marquées traitées qu'une fois leurs détections durables ;
+            # celles en erreur ne le sont jamais et sont retentées par --resume
+            uncommitted.extend(path for path, _ in valid)
+            if writer.flush():
+                checkpoint.write("".join(f"{path}\n" for path in uncommitted))
+                checkpoint.flush()
+                uncommitted.clear()
+            processed += len(batch)
+
+            now = time.perf_counter()
+            if now - last_report >= args.report_every:
+                rate = processed / (now - start)
+                print(f"{processed}/{len(todo)} images - {rate:.1f} images/s", file=sys.stderr)
+                last_report = now
+    except KeyboardInterrupt:
+        print("Interrompu : relancez avec --resume pour continuer", file=sys.stderr)
+        return 130
+    finally:
+        writer.close()
+        checkpoint.write("".join(f"{path}\n" for path in uncommitted))
+        checkpoint.close()
+        elapsed = time.perf_counter() - start
+        print(
+            f"{processed} image(s) traitée(s) en {elapsed:.1f} s "
+            f"({processed / elapsed if elapsed else 0:.1f} images/s), "
+            f"{num_detections} détection(s), {failed} erreur(s)",
+            file=sys.stderr,
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,255 @@
+"""
+Logique de détection partagée entre les interfaces
+Fichier : detection.py
+"""
+
+import io
+import math
+from dataclasses import dataclass, field
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from timing import timed
+
+# Chemin des poids du modèle
+MODEL_PATH = "best.pt"
+
+# Seuil plancher utilisé pour l'inférence : le seuil du curseur est appliqué
+# ensuite sur les détections en cache, sans relancer le modèle
+CONF_FLOOR = 0.05
+
+# Seuil de confiance par défaut des résultats (curseur, API, lignes de commande)
+DEFAULT_CONF = 0.5
+
+# Paramètres d'inférence (valeurs par défaut d'ultralytics)
+IMGSZ = 640
+IOU = 0.7
+
+# Profils vitesse / précision : taille d'entrée du modèle
+PROFILES = {"fast": 320, "balanced": 480, "accurate": 640, "accurate-hd": 960}
+PROFILE_LABELS = {
+    "fast": "Rapide (320)",
+    "balanced": "Équilibré (480)",
+    "accurate": "Précis (640)",
+    "accurate-hd": "Très précis (960)",
+}
+DEFAULT_PROFILE = "accurate"
+
+# Nombre d'images envoyées ensemble au modèle
+BATCH_SIZE = 8
+
+# Couleur de remplissage du letterbox (identique à ultralytics)
+LETTERBOX_COLOR = 114
+
+
+def load_yolo(model_path=MODEL_PATH):
+    """Charge le modèle YOLO à partir des poids"""
+    from ultralytics import YOLO
+
+    return YOLO(model_path)
+
+
+def inference_params(profile=None):
+    """Paramètres qui influencent le résultat de l'inférence (taille selon le profil)"""
+    return {"imgsz": PROFILES[profile] if profile else IMGSZ, "conf": CONF_FLOOR, "iou": IOU}
+
+
+@dataclass
+class Detections:
+    """Détections brutes d'une image, stockées en tableaux NumPy alignés"""
+    boxes: np.ndarray    # (N, 4) float32, coordonnées xyxy en pixels
+    scores: np.ndarray   # (N,) float32
+    classes: np.ndarray  # (N,) int64
+    names: dict
+    # Durées ultralytics en ms par image : preprocess, inference, postprocess
+    speed: dict = field(default_factory=dict)
+    # Identifiants de suivi (N,) int64, renseignés par tracking.Tracker
+    ids: np.ndarray = None
+
+    def __len__(self):
+        return len(self.scores)
+
+    def mask(self, conf_threshold):
+        """Masque booléen des détections au-dessus du seuil"""
+        return self.scores >= conf_threshold
+
+    def filter(self, conf_threshold):
+        """Retourne les détections dont la confiance atteint le seuil"""
+        keep = self.mask(conf_threshold)
+        return Detections(
+            self.boxes[keep], self.scores[keep], self.classes[keep], self.names, self.speed,
+            None if self.ids is None else self.ids[keep],
+        )
+
+    def to_original(self, scale=1.0, offset=(0.0, 0.0), shape=None):
+        """Ramène les boîtes dans le repère de l'image d'origine (inverse de letterbox)"""
+        boxes = (self.boxes - np.array([*offset, *offset], dtype=np.float32)) / scale
+        if shape is not None:
+            height, width = shape[:2]
+            np.clip(boxes[:, 0::2], 0, width, out=boxes[:, 0::2])
+            np.clip(boxes[:, 1::2], 0, height, out=boxes[:, 1::2])
+        return Detections(
+            boxes.astype(np.float32, copy=False), self.scores, self.classes, self.names, self.speed,
+            self.ids,
+        )
+
+
+def from_result(result):
+    """Convertit un résultat ultralytics en Détections NumPy"""
+    boxes = result.boxes
+    return Detections(
+        boxes=boxes.xyxy.cpu().numpy().astype(np.float32, copy=False),
+        scores=boxes.conf.cpu().numpy().astype(np.float32, copy=False),
+        classes=boxes.cls.cpu().numpy().astype(np.int64),
+        names=dict(result.names),
+        speed=dict(result.speed),
+    )
+
+
+def box_iou(boxes_a, boxes_b):
+    """Matrice des IoU entre deux ensembles de boîtes xyxy, (N, 4) x (M, 4) -> (N, M)"""
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    inter = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+    area_a = np.prod(boxes_a[:, 2:] - boxes_a[:, :2], axis=1)
+    area_b = np.prod(boxes_b[:, 2:] - boxes_b[:, :2], axis=1)
+    return inter / np.maximum(area_a[:, None] + area_b[None, :] - inter, 1e-9)
+
+
+@timed("décodage")
+def decode_image(data):
+    """Décode les octets d'une image envoyée en tableau RVB"""
+    return np.array(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+@timed("décodage")
+def decode_image_scaled(data, imgsz=IMGSZ):
+    """Décode une image directement réduite près de la taille d'entrée du modèle
+
+    Les JPEG sont réduits pendant le décodage (mode draft de PIL, mise à
+    l'échelle 1/2 à 1/8 dans le domaine DCT) sans descendre sous `imgsz` sur le
+    plus grand côté ; les autres formats sont décodés en entier. Retourne
+    l'image RVB, l'échelle appliquée et la taille d'origine (h, w) : les boîtes
+    se ramènent au repère d'origine avec `detections.to_original(scale, shape=shape)`.
+    """
+    image = Image.open(io.BytesIO(data))
+    width, height = image.size
+    ratio = imgsz / max(width, height)
+    if ratio < 1:
+        image.draft("RGB", (math.ceil(width * ratio), math.ceil(height * ratio)))
+    array = np.array(image.convert("RGB"))
+    return array, array.shape[1] / width, (height, width)
+
+
+def letterbox(image, size, color=LETTERBOX_COLOR):
+    """Redimensionne en conservant le ratio puis complète jusqu'à size x size"""
+    height, width = image.shape[:2]
+    scale = min(size / height, size / width)
+    new_width, new_height = round(width * scale), round(height * scale)
+    if (new_width, new_height) != (width, height):
+        image = cv2.resize(image, (new_width, new_height), interpolation=cv2.INTER_LINEAR)
+
+    pad_x = (size - new_width) // 2
+    pad_y = (size - new_height) // 2
+    canvas = np.full((size, size, 3), color, dtype=np.uint8)
+    canvas[pad_y:pad_y + new_height, pad_x:pad_x + new_width] = image
+    return canvas, scale, (pad_x, pad_y)
+
+
+def to_model_input(image, channels="RGB"):
+    """ultralytics interprète les tableaux NumPy en BGR : inversion des canaux RVB"""
+    if channels == "BGR":
+        return image
+    return np.ascontiguousarray(image[..., ::-1])
+
+
+def predict(model, images, batch_size=BATCH_SIZE, imgsz=IMGSZ, conf=CONF_FLOOR, iou=IOU,
+            channels="RGB"):
+    """Inférence par lots sur des images RVB (ou BGR) ; retourne une liste de Détections"""
+    # Moteurs alternatifs (ONNX Runtime, ...) : ils exposent la même interface
+    if hasattr(model, "predict_images"):
+        return model.predict_images(
+            images, batch_size=batch_size, imgsz=imgsz, conf=conf, iou=iou, channels=channels
+        )
+
+    detections = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        # Letterbox carré pour toute image, seule ou en lot : le résultat d'une image
+        # ne dépend pas des requêtes avec lesquelles elle partage un passage (cache)
+        boxed = [letterbox(image, imgsz) for image in chunk]
+        results = model.predict(
+            [to_model_input(canvas, channels) for canvas, _, _ in boxed],
+            imgsz=imgsz, conf=conf, iou=iou, verbose=False,
+        )
+        for image, (_, scale, offset), result in zip(chunk, boxed, results):
+            detections.append(from_result(result).to_original(scale, offset, image.shape))
+    return detections
+
+
+# Colonnes du tableau des détections
+COLUMNS = ["Classe", "Confiance", "X_min", "Y_min", "X_max", "Y_max"]
+
+
+def class_names(detections):
+    """Nom de classe de chaque détection, via une table de correspondance vectorisée"""
+    n_classes = max(len(detections.names), int(detections.classes.max(initial=-1)) + 1)
+    lookup = np.array(
+        [detections.names.get(i, f"Classe {i}") for i in range(n_classes)], dtype=object
+    )
+    return lookup[detections.classes]
+
+
+def to_records(detections):
+    """Détections sous forme de dictionnaires (mêmes champs que le tableau), pour le JSON"""
+    boxes = detections.boxes.tolist()
+    return [
+        {"Classe": name, "Confiance": conf, "X_min": x1, "Y_min": y1, "X_max": x2, "Y_max": y2}
+        for name, conf, (x1, y1, x2, y2) in zip(
+            class_names(detections).tolist(), detections.scores.tolist(), boxes
+        )
+    ]
+
+
+@timed("tableau")
+def to_dataframe(detections):
+    """Construit le tableau des détections colonne par colonne (types numériques conservés)"""
+    import pandas as pd
+
+    boxes = detections.boxes
+    df = pd.DataFrame({
+        "Classe": class_names(detections),
+        "Confiance": detections.scores,
+        "X_min": boxes[:, 0],
+        "Y_min": boxes[:, 1],
+        "X_max": boxes[:, 2],
+        "Y_max": boxes[:, 3],
+    }, columns=COLUMNS)
+    if detections.ids is not None:
+        df.insert(0, "ID", detections.ids)
+    return df
+
+
+def summarize(file_names, detections_list, conf_threshold):
+    """Tableau récapitulatif par image : nombre de détections par classe"""
+    import pandas as pd
+
+    names = detections_list[0].names if detections_list else {}
+    n_classes = max([len(names)] + [int(d.classes.max(initial=-1)) + 1 for d in detections_list])
+    counts = np.zeros((len(detections_list), n_classes), dtype=np.int64)
+    avg_conf = np.full(len(detections_list), np.nan)
+    for row, detections in enumerate(detections_list):
+        filtered = detections.filter(conf_threshold)
+        counts[row] = np.bincount(filtered.classes, minlength=n_classes)
+        if len(filtered):
+            avg_conf[row] = filtered.scores.mean()
+
+    summary = pd.DataFrame(
+        counts, columns=[names.get(i, f"Classe {i}") for i in range(n_classes)]
+    )
+    summary.insert(0, "Image", file_names)
+    summary.insert(1, "Total", counts.sum(axis=1))
+    summary["Confiance moyenne"] = avg_conf
+    return summary
@@ -0,0 +1,427 @@
+"""
+Inférence dans des processus séparés, poids partagés par projection mémoire
+Fichier : inference_pool.py
+
+Chaque processus de travail sert le modèle comme une réplique du
+planificateur de lots (voir `batching.MicroBatcher`) : le prétraitement,
+l'inférence et le post-traitement échappent au GIL du processus principal.
+
+Les processus sont des interpréteurs neufs (comme les bancs `--child`) : le
+script principal (application Streamlit, serveur) n'y est pas réexécuté.
+
+Les poids du réseau fusionné (moteur `pytorch`) sont écrits une fois, à plat,
+dans un fichier projeté en mémoire par tous les processus : le noyau ne garde
+qu'un exemplaire des pages. Les images passent par un segment de mémoire
+partagée propre à chaque processus ; seuls leurs formes et les résultats
+(quelques tableaux) transitent par le tube.
+"""
+
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Connection
+
+import numpy as np
+
+from backends import (
+    DEFAULT_BACKEND, WARMUP_BATCH_SIZES, WARMUP_IMGSZ, bind_worker_thread, configure_torch_threads,
+    cpu_layout, exported_path, load_backend_timed, remove_stale_exports, set_torch_threads, warm_up,
+    warmup_sizes,
+)
+from detection import MODEL_PATH, load_yolo, predict
+from timing import StageTimer
+
+# Nombre de processus d'inférence (0 = répliques dans le processus principal)
+INFERENCE_PROCESSES = int(os.environ.get("INFERENCE_PROCESSES", "0"))
+
+# Taille initiale du segment de mémoire partagée de chaque processus (agrandi au besoin)
+POOL_SHM_MB = float(os.environ.get("POOL_SHM_MB", "64"))
+
+# Lots traités avant qu'un processus soit remplacé par un neuf (0 = jamais)
+POOL_MAX_BATCHES = int(os.environ.get("POOL_MAX_BATCHES", "0"))
+
+# Délais de démarrage (chargement et préchauffage) et d'arrêt d'un processus (s)
+POOL_START_TIMEOUT = 300.0
+POOL_STOP_TIMEOUT = 10.0
+
+# Alignement des tenseurs dans le fichier de poids et des images dans le segment
+_ALIGN = 64
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
+
+
+def shared_weight_paths(model_path=MODEL_PATH):
+    """Squelette du réseau (sans tenseurs) et tenseurs à plat, liés à l'empreinte des poids"""
+    return exported_path(model_path, ".shared.pt"), exported_path(model_path, ".shared.bin")
+
+
+def export_shared_weights(model_path=MODEL_PATH):
+    """Écrit, une fois par version des poids, le réseau fusionné en squelette + tenseurs à plat
+
+    Les tenseurs sont fusionnés (Conv+BN) et en float32 : les processus les
+    utilisent tels quels, sans copie ni conversion qui dupliquerait les pages.
+    """
+    skeleton_path, weights_path = shared_weight_paths(model_path)
+    if os.path.exists(skeleton_path) and os.path.exists(weights_path):
+        return skeleton_path, weights_path
+    import torch
+
+    yolo = load_yolo(model_path)
+    network = yolo.model
+    network.fuse(verbose=False)
+    network.float().eval()
+    tensors = {**dict(network.named_parameters()), **dict(network.named_buffers())}
+
+    index = []
+    with open(weights_path + ".tmp", "wb") as f:
+        for name, tensor in tensors.items():
+            array = tensor.detach().contiguous().numpy()
+            offset = _aligned(f.tell())
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(array.tobytes())
+            index.append((name, array.dtype.str, array.shape, offset))
+
+    # Squelette : tenseurs vidés, remplacés au chargement par des vues du fichier projeté
+    for tensor in tensors.values():
+        tensor.data = torch.empty(0, dtype=tensor.dtype)
+    checkpoint = {k: v for k, v in yolo.ckpt.items() if k not in ("model", "ema", "optimizer")}
+    torch.save({**checkpoint, "model": network, "shared_index": index}, skeleton_path + ".tmp")
+
+    os.replace(weights_path + ".tmp", weights_path)
+    os.replace(skeleton_path + ".tmp", skeleton_path)
+    remove_stale_exports(model_path, exported_path(model_path, ".shared"), "*.shared.*")
+    return skeleton_path, weights_path
+
+
+def load_shared_yolo(skeleton_path, weights_path):
+    """Modèle YOLO dont les tenseurs sont des vues du fichier de poids projeté en mémoire
+
+    Projection en copie sur écriture : les pages restent communes à tous les
+    processus tant qu'aucun ne les modifie (l'inférence ne fait que les lire).
+    """
+    import torch
+
+    yolo = load_yolo(skeleton_path)
+    network = yolo.model
+    tensors = {**dict(network.named_parameters()), **dict(network.named_buffers())}
+    mapped = np.memmap(weights_path, dtype=np.uint8, mode="c")
+    for name, dtype, shape, offset in yolo.ckpt["shared_index"]:
+        array = np.ndarray(shape, dtype=dtype, buffer=mapped, offset=offset)
+        tensors[name].data = torch.from_numpy(array)
+    return yolo
+
+
+def _attach(name):
+    """Ouvre un segment créé par le processus principal, qui reste seul chargé de le supprimer"""
+    segment = shared_memory.SharedMemory(name=name)
+    # Sinon le suivi des ressources de ce processus supprimerait le segment à sa sortie
+    resource_tracker.unregister(segment._name, "shared_memory")
+    return segment
+
+
+def _worker_main(conn, backend, model_path, shared, cpus, threads, warmup, imgsz):
+    """Boucle d'un processus : charge le modèle puis sert les lots reçus par le tube"""
+    if backend.startswith("pytorch"):
+        import torch  # noqa: F401 (threads fixés avant tout calcul)
+
+        configure_torch_threads()
+    set_torch_threads(threads)
+    bind_worker_thread(cpus)
+
+    if shared:
+        timer = StageTimer()
+        with timer.stage("lecture des poids"):
+            model = load_shared_yolo(*shared)
+        if warmup:
+            with timer.stage("préchauffage", sum(warmup) * len(warmup_sizes(imgsz))):
+                warm_up(model, warmup, imgsz)
+    else:
+        model, timer = load_backend_timed(backend, model_path, warmup, imgsz)
+    conn.send(("ready", timer.report()))
+
+    segment = None
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        name, layout, params = message
+        if segment is None or segment.name != name:
+            if segment is not None:
+                segment.close()
+            segment = _attach(name)
+        try:
+            images = [
+                np.ndarray(shape, dtype=dtype, buffer=segment.buf, offset=offset)
+                for offset, shape, dtype in layout
+            ]
+            reply = ("ok", predict(model, images, **params))
+        except Exception as e:
+            reply = ("error", f"{type(e).__name__}: {e}")
+        images = None
+        conn.send(reply)
+
+    if segment is not None:
+        segment.close()
+    conn.close()
+
+
+class _WorkerExited(RuntimeError):
+    pass
+
+
+class WorkerProcess:
+    """Processus d'inférence vu comme un modèle (`predict_images`, comme les moteurs exportés)
+
+    Un seul lot à la fois : le thread du planificateur qui le sert attend sa
+    réponse. Un processus mort est relancé et le lot soumis une seconde fois ;
+    après `max_batches` lots, il est remplacé entre deux lots.
+    """
+
+    def __init__(self, index, backend=DEFAULT_BACKEND, model_path=MODEL_PATH, shared=None,
+                 cpus=None, threads=0, warmup=WARMUP_BATCH_SIZES, imgsz=WARMUP_IMGSZ,
+                 max_batches=POOL_MAX_BATCHES):
+        self.index = index
+        self.backend = backend
+        self.model_path = model_path
+        self.shared = shared
+        self.cpus = cpus
+        self.threads = threads
+        self.warmup = warmup
+        self.imgsz = imgsz
+        self.max_batches = max_batches
+        self.startup = []
+        self.batches = 0
+        self.restarts = 0
+        self._process = None
+        self._conn = None
+        self._segment = None
+        self._lock = threading.Lock()
+
+    @property
+    def pid(self):
+        return self._process.pid if self._process else None
+
+    @property
+    def alive(self):
+        return self._process is not None and self._process.poll() is None
+
+    def start(self):
+        """Lance le processus sans attendre son chargement (voir `wait_ready`)"""
+        self._conn, child = multiprocessing.Pipe()
+        config = {
+            "backend": self.backend, "model_path": self.model_path, "shared": self.shared,
+            "cpus": self.cpus, "threads": self.threads, "warmup": self.warmup, "imgsz": self.imgsz,
+        }
+        self._process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), "--worker", str(child.fileno()),
+             json.dumps(config)],
+            pass_fds=(child.fileno(),),
+        )
+        # Sans l'extrémité du processus, la fin du tube signale sa mort
+        child.close()
+        self.batches = 0
+
+    def wait_ready(self, timeout=POOL_START_TIMEOUT):
+        status, report = self._receive(timeout)
+        if status != "ready":
+            raise RuntimeError(f"Processus d'inférence {self.index} : démarrage inattendu ({status})")
+        self.startup = report
+
+    def stop(self, timeout=POOL_STOP_TIMEOUT):
+        """Arrêt gracieux : le lot en cours se termine, puis le processus sort"""
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        try:
+            self._process.wait(timeout)
+        except subprocess.TimeoutExpired:
+            self._process.kill()
+            self._process.wait()
+        self._conn.close()
+        self._process = None
+
+    def restart(self):
+        """Remplace le processus par un neuf, une fois le lot en cours terminé"""
+        with self._lock:
+            self._restart()
+
+    def _restart(self):
+        self.stop()
+        self.start()
+        self.wait_ready()
+        self.restarts += 1
+
+    def close(self):
+        with self._lock:
+            self.stop()
+            if self._segment is not None:
+                self._segment.close()
+                self._segment.unlink()
+                self._segment = None
+
+    def _receive(self, timeout=None):
+        """Réponse du processus ; sa mort est détectée au lieu d'attendre indéfiniment"""
+        deadline = None if timeout is None else time.perf_counter() + timeout
+        try:
+            while not self._conn.poll(0.5):
+                if not self.alive:
+                    raise _WorkerExited(f"Processus d'inférence {self.index} arrêté "
+                                        f"(code {self._process.returncode})")
+                if deadline is not None and time.perf_counter() > deadline:
+                    raise TimeoutError(f"Processus d'inférence {self.index} sans réponse")
+            return self._conn.recv()
+        except (EOFError, ConnectionResetError):
+            raise _WorkerExited(f"Processus d'inférence {self.index} arrêté")
+
+    def _write_images(self, images):
+        """Copie les images dans le segment partagé ; retourne leur disposition"""
+        layout, offset = [], 0
+        for image in images:
+            layout.append((offset, image.shape, image.dtype.str))
+            offset = _aligned(offset + image.nbytes)
+        if self._segment is None or self._segment.size < offset:
+            if self._segment is not None:
+                self._segment.close()
+                self._segment.unlink()
+            size = max(offset, int(POOL_SHM_MB * 2**20))
+            self._segment = shared_memory.SharedMemory(create=True, size=size)
+        for image, (start, shape, dtype) in zip(images, layout):
+            np.ndarray(shape, dtype=dtype, buffer=self._segment.buf, offset=start)[...] = image
+        return layout
+
+    def predict_images(self, images, **params):
+        """Détections des images (mêmes paramètres que `detection.predict`)"""
+        with self._lock:
+            if self.max_batches and self.batches >= self.max_batches:
+                self._restart()
+            layout = self._write_images(images)
+            message = (self._segment.name, layout, params)
+            try:
+                self._conn.send(message)
+                status, reply = self._receive()
+            except (_WorkerExited, BrokenPipeError):
+                # Processus mort (mémoire, signal) : relancé, le lot est soumis une seconde fois
+                self._restart()
+                self._conn.send(message)
+                status, reply = self._receive()
+            self.batches += 1
+        if status == "error":
+            raise RuntimeError(reply)
+        return reply
+
+    def stats(self):
+        return {
+            "index": self.index,
+            "pid": self.pid,
+            "alive": self.alive,
+            "batches": self.batches,
+            "restarts": self.restarts,
+            "cpus": self.cpus,
+        }
+
+
+class InferencePool:
+    """Processus d'inférence à donner au planificateur de lots (`MicroBatcher(pool.workers)`)
+
+    Avec le moteur `pytorch`, les processus partagent les poids par projection
+    mémoire ; les autres moteurs chargent leur export dans chaque processus.
+    """
+
+    def __init__(self, processes=INFERENCE_PROCESSES, backend=DEFAULT_BACKEND, model_path=MODEL_PATH,
+                 layout=None, warmup=WARMUP_BATCH_SIZES, imgsz=WARMUP_IMGSZ, share_weights=True,
+                 max_batches=POOL_MAX_BATCHES):
+        processes = max(1, processes)
+        self.timer = StageTimer()
+        shared = None
+        if share_weights and backend == "pytorch":
+            with self.timer.stage("poids partagés"):
+                shared = export_shared_weights(model_path)
+        layout = layout or cpu_layout(processes)
+        self.workers = [
+            WorkerProcess(index, backend, model_path, shared, cpus, threads, warmup, imgsz,
+                          max_batches)
+            for index, (cpus, threads) in enumerate(layout)
+        ]
+        # Chargements en parallèle
+        with self.timer.stage("démarrage des processus", processes):
+            for worker in self.workers:
+                worker.start()
+            try:
+                for worker in self.workers:
+                    worker.wait_ready()
+            except Exception:
+                self.close()
+                raise
+        atexit.register(self.close)
+
+    def restart(self):
+        """Redémarrage progressif : un processus à la fois, les autres continuent à servir"""
+        for worker in self.workers:
+            worker.restart()
+
+    def close(self):
+        for worker in self.workers:
+            worker.close()
+
+    def stats(self):
+        return {
+            "processes": len(self.workers),
+            "shared_weights": self.workers[0].shared is not None,
+            "restarts": sum(worker.restarts for worker in self.workers),
+            "workers": [worker.stats() for worker in self.workers],
+        }
+
+
+def start_pool_async(processes=INFERENCE_PROCESSES, backend=DEFAULT_BACKEND, model_path=MODEL_PATH,
+                     **kwargs):
+    """Démarre les processus dans un thread ; retourne un Future de (InferencePool, StageTimer)
+
+    Même contrat que `backends.load_backend_async` : l'interface s'affiche
+    pendant le chargement et le préchauffage des processus.
+    """
+    future = Future()
+
+    def run():
+        if future.set_running_or_notify_cancel():
+            try:
+                pool = InferencePool(processes, backend, model_path, **kwargs)
+                future.set_result((pool, pool.timer))
+            except Exception as e:
+                future.set_exception(e)
+
+    threading.Thread(target=run, name="pool-starting", daemon=True).start()
+    return future
+
+
+def main(argv=None):
+    """Point d'entrée d'un processus d'inférence (lancé par WorkerProcess)"""
+    parser = argparse.ArgumentParser(description=argparse.SUPPRESS)
+    parser.add_argument("--worker", type=int, required=True, help="Descripteur du tube")
+    parser.add_argument("config", help="Configuration JSON du processus")
+    args = parser.parse_args(argv)
+    config = json.loads(args.config)
+    _worker_main(
+        Connection(args.worker), config["backend"], config["model_path"], config["shared"],
+        config["cpus"], config["threads"], tuple(config["warmup"]), config["imgsz"],
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,198 @@
+"""
+Métriques Prometheus du service de détection
+Fichier : metrics.py
+
+Les compteurs du chemin de requête sont de simples entiers ; les familles
+Prometheus sont construites à la collecte, à partir de ces compteurs et de
+l'état du service (planificateur de lots, cache, démarrage, durées).
+"""
+
+import os
+import threading
+from collections import Counter
+
+import numpy as np
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, generate_latest
+from prometheus_client import ProcessCollector, start_http_server
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily, HistogramMetricFamily
+
+from timing import LATENCY_BUCKETS_MS, REQUEST_LATENCIES
+
+# Préfixe des séries exposées
+METRICS_PREFIX = "vehicle_detection"
+
+# Port du serveur de métriques lancé à côté de l'interface Streamlit (vide : désactivé)
+METRICS_PORT = os.environ.get("METRICS_PORT")
+
+# Bornes des classes de l'histogramme des tailles de lot
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32)
+
+# Type MIME de la réponse de /metrics
+METRICS_CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+
+class ServiceCounters:
+    """Requêtes, images et détections par classe depuis le démarrage (thread-safe)"""
+
+    def __init__(self):
+        self.requests = Counter()
+        self.images = Counter()
+        self.detections = Counter()
+        self._lock = threading.Lock()
+
+    def observe_request(self, endpoint, status):
+        """Compte une requête par chemin de route et code HTTP
+
+        Les interfaces Streamlit suivent le même schéma : une analyse d'images
+        lancée depuis la page compte comme ("/images", 200).
+        """
+        with self._lock:
+            self.requests[endpoint, str(status)] += 1
+
+    def observe_detections(self, detections_list, source):
+        """Compte les images et leurs détections ; les classes viennent de `names` du modèle"""
+        with self._lock:
+            self.images[source] += len(detections_list)
+            for detections in detections_list:
+                # Toutes les classes du modèle ont une série, même sans détection
+                for name in detections.names.values():
+                    self.detections.setdefault(name, 0)
+                counts = np.bincount(detections.classes, minlength=len(detections.names))
+                for cls in np.flatnonzero(counts):
+                    self.detections[detections.names[int(cls)]] += int(counts[cls])
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.requests), dict(self.images), dict(self.detections)
+
+
+# Compteurs du processus (API ou interface)
+SERVICE_COUNTERS = ServiceCounters()
+
+
+def _histogram(name, documentation, labels, series, bounds):
+    """Famille histogramme à partir d'effectifs par classe (dernière classe ouverte)"""
+    family = HistogramMetricFamily(name, documentation, labels=labels)
+    for label_values, (counts, total) in series:
+        cumulative = np.cumsum(counts).tolist()
+        buckets = [(str(bound), count) for bound, count in zip(bounds, cumulative)]
+        buckets.append(("+Inf", cumulative[-1]))
+        family.add_metric(label_values, buckets, total)
+    return family
+
+
+class MetricsCollector:
+    """Collecteur Prometheus lisant l'état du service à chaque collecte
+
+    `sources()` retourne un dictionnaire des éléments disponibles : `batcher`
+    (MicroBatcher), `pool` (InferencePool), `cache` (ResultCache), `startup`
+    (rapport de StageTimer), `pending` (requêtes en cours).
+    """
+
+    def __init__(self, sources=dict, counters=SERVICE_COUNTERS, latencies=REQUEST_LATENCIES):
+        self.sources = sources
+        self.counters = counters
+        self.latencies = latencies
+
+    def collect(self):
+        prefix = METRICS_PREFIX
+        requests, images, detections = self.counters.snapshot()
+        sources = self.sources()
+
+        family = CounterMetricFamily(
+            f"{prefix}_requests", "Requêtes de détection", labels=["endpoint", "status"]
+        )
+        for (endpoint, status), count in sorted(requests.items()):
+            family.add_metric([endpoint, status], count)
+        yield family
+
+        family = CounterMetricFamily(f"{prefix}_images", "Images analysées", labels=["source"])
+        for source, count in sorted(images.items()):
+            family.add_metric([source], count)
+        yield family
+
+        family = CounterMetricFamily(
+            f"{prefix}_detections", "Détections retournées par classe", labels=["class_name"]
+        )
+        for name, count in sorted(detections.items()):
+            family.add_metric([name], count)
+        yield family
+
+        yield _histogram(
+            f"{prefix}_stage_seconds", "Durée de chaque étape d'une requête", ["stage"],
+            [([name], value) for name, value in self.latencies.cumulative().items()],
+            [bound / 1000 for bound in LATENCY_BUCKETS_MS],
+        )
+
+        batcher = sources.get("batcher")
+        if batcher is not None:
+            stats = batcher.stats()
+            counts = [0] * (len(BATCH_SIZE_BUCKETS) + 1)
+            for size, count in stats["batch_size_distribution"].items():
+                counts[np.searchsorted(BATCH_SIZE_BUCKETS, size)] += count
+            yield _histogram(
+                f"{prefix}_batch_size", "Images par passage du modèle", [],
+                [([], (counts, stats["images"]))], BATCH_SIZE_BUCKETS,
+            )
+            yield GaugeMetricFamily(
+                f"{prefix}_queue_depth", "Images en attente du planificateur de lots",
+                value=stats["queue_depth"],
+            )
+
+        pool = sources.get("pool")
+        if pool is not None:
+            family = CounterMetricFamily(
+                f"{prefix}_worker_restarts", "Redémarrages des processus d'inférence", labels=["worker"]
+            )
+            for worker in pool.stats()["workers"]:
+                family.add_metric([str(worker["index"])], worker["restarts"])
+            yield family
+
+        if sources.get("pending") is not None:
+            yield GaugeMetricFamily(
+                f"{prefix}_pending_requests", "Requêtes en cours de traitement",
+                value=sources["pending"],
+            )
+
+        cache = sources.get("cache")
+        if cache is not None:
+            yield CounterMetricFamily(f"{prefix}_cache_hits", "Résultats servis par le cache",
+                                      value=cache.hits)
+            yield CounterMetricFamily(f"{prefix}_cache_misses", "Résultats absents du cache",
+                                      value=cache.misses)
+            lookups = cache.hits + cache.misses
+            yield GaugeMetricFamily(
+                f"{prefix}_cache_hit_ratio", "Part des résultats servis par le cache",
+                value=cache.hits / lookups if lookups else 0.0,
+            )
+            yield GaugeMetricFamily(f"{prefix}_cache_bytes", "Taille du cache en mémoire",
+                                    value=cache.total_bytes)
+
+        startup = sources.get("startup")
+        if startup:
+            family = GaugeMetricFamily(
+                f"{prefix}_model_load_seconds", "Durée de chaque étape du chargement du modèle",
+                labels=["stage"],
+            )
+            for row in startup:
+                family.add_metric([row["Étape"]], row["Temps total (s)"])
+            family.add_metric(["total"], sum(row["Temps total (s)"] for row in startup))
+            yield family
+
+
+def create_registry(collector):
+    """Registre propre au service : ses métriques et celles du processus (mémoire, CPU)"""
+    registry = CollectorRegistry(auto_describe=False)
+    registry.register(collector)
+    ProcessCollector(registry=registry)
+    return registry
+
+
+def render_metrics(registry):
+    """Texte au format d'exposition Prometheus"""
+    return generate_latest(registry)
+
+
+def start_metrics_server(port, collector):
+    """Sert /metrics sur `port` dans un thread (interfaces sans serveur HTTP propre)"""
+    start_http_server(int(port), registry=create_registry(collector))
@@ -0,0 +1,169 @@
+"""
+Filtre de mouvement devant le modèle pour les caméras fixes
+Fichier : motion.py
+
+Chaque image analysée est comparée, en niveaux de gris réduits, à la dernière
+image passée au modèle. Sans changement notable, l'inférence est sautée et
+les détections précédentes sont reprises ; un mouvement localisé n'est
+analysé que sur la région qui a changé.
+"""
+
+import math
+
+import cv2
+import numpy as np
+
+from detection import Detections
+from timing import StageTimer
+
+# Largeur de l'image réduite sur laquelle le mouvement est mesuré (pixels)
+MOTION_WIDTH = 160
+
+# Écart de niveau de gris (0-255) à partir duquel un pixel est considéré comme changé
+MOTION_PIXEL_DIFF = 25
+
+# Fraction de pixels changés sous laquelle l'inférence est sautée
+MOTION_THRESHOLD = 0.002
+
+# Au-delà de cette fraction de l'image, la région en mouvement n'est pas recadrée
+MOTION_CROP_MAX_AREA = 0.4
+
+# Marge ajoutée autour de la région en mouvement (fraction du plus grand côté)
+MOTION_CROP_MARGIN = 0.05
+
+# Taille d'entrée minimale du modèle pour une région recadrée
+MOTION_CROP_MIN_IMGSZ = 128
+
+# Inférence complète forcée au moins toutes les N images analysées
+MOTION_REFRESH = 50
+
+# Actions décidées pour chaque image
+FULL, CROP, SKIP = "complète", "recadrée", "sautée"
+
+
+class MotionGate:
+    """Décide pour chaque image : inférence complète, sur la région changée, ou aucune
+
+    L'état (image de référence, dernières détections) suit l'ordre des images :
+    une instance par flux vidéo.
+    """
+
+    def __init__(self, threshold=MOTION_THRESHOLD, pixel_diff=MOTION_PIXEL_DIFF,
+                 crop_max_area=MOTION_CROP_MAX_AREA, refresh=MOTION_REFRESH):
+        self.threshold = threshold
+        self.pixel_diff = pixel_diff
+        self.crop_max_area = crop_max_area
+        self.refresh = refresh
+        self._kernel = np.ones((3, 3), dtype=np.uint8)
+        self._reference = None
+        self._last = None
+        self._since_full = 0
+        self._actions = dict.fromkeys((FULL, CROP, SKIP), 0)
+
+    def _prepare(self, frame):
+        """Niveaux de gris réduits et lissés : insensibles au bruit du capteur"""
+        height, width = frame.shape[:2]
+        size = (MOTION_WIDTH, max(1, round(height * MOTION_WIDTH / width)))
+        small = cv2.resize(frame, size, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY) if small.ndim == 3 else small
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def plan(self, frame):
+        """Action pour l'image suivante du flux, et région (x0, y0, x1, y1) si recadrée"""
+        small = self._prepare(frame)
+        action, region = FULL, None
+        if self._reference is not None and self._since_full < self.refresh:
+            changed = cv2.dilate(
+                (cv2.absdiff(small, self._reference) > self.pixel_diff).astype(np.uint8),
+                self._kernel,
+            )
+            if np.count_nonzero(changed) < self.threshold * changed.size:
+                action = SKIP
+            else:
+                region = self._region(changed, frame.shape)
+                if region is not None:
+                    action = CROP
+
+        self._actions[action] += 1
+        self._since_full = 0 if action == FULL else self._since_full + 1
+        if action != SKIP:
+            self._reference = small
+        return action, region
+
+    def _region(self, changed, shape):
+        """Rectangle englobant les pixels changés, avec marge, dans le repère de l'image"""
+        height, width = shape[:2]
+        x, y, w, h = cv2.boundingRect(changed)
+        factor = width / changed.shape[1]
+        margin = MOTION_CROP_MARGIN * max(width, height)
+        x0 = max(0, math.floor(x * factor - margin))
+        y0 = max(0, math.floor(y * factor - margin))
+        x1 = min(width, math.ceil((x + w) * factor + margin))
+        y1 = min(height, math.ceil((y + h) * factor + margin))
+        if (x1 - x0) * (y1 - y0) > self.crop_max_area * width * height:
+            return None
+        return x0, y0, x1, y1
+
+    def crop_imgsz(self, regions, shape, imgsz):
+        """Taille d'entrée des régions : même résolution que l'image entière à `imgsz`"""
+        side = max(max(x1 - x0, y1 - y0) for x0, y0, x1, y1 in regions)
+        crop = math.ceil(side * imgsz / max(shape[:2]) / 32) * 32
+        return min(imgsz, max(MOTION_CROP_MIN_IMGSZ, crop))
+
+    def combine(self, detections, region, shape):
+        """Détections de la région, complétées par les précédentes hors de la région"""
+        x0, y0, x1, y1 = region
+        shifted = detections.to_original(1.0, (-x0, -y0), shape)
+        previous = self._last
+        centres = (previous.boxes[:, :2] + previous.boxes[:, 2:]) / 2
+        outside = ~np.all((centres >= (x0, y0)) & (centres < (x1, y1)), axis=1)
+        return Detections(
+            boxes=np.concatenate([previous.boxes[outside], shifted.boxes]).reshape(-1, 4),
+            scores=np.concatenate([previous.scores[outside], shifted.scores]),
+            classes=np.concatenate([previous.classes[outside], shifted.classes]),
+            names=shifted.names,
+            speed=shifted.speed,
+        )
+
+    def run(self, infer, frames, imgsz, timer=None):
+        """Applique le filtre à des images BGR consécutives du flux
+
+        `infer(images, imgsz)` exécute le modèle ; il est appelé au plus deux
+        fois (images entières, puis régions recadrées). Retourne les Détections
+        de chaque image et l'action retenue.
+        """
+        timer = timer or StageTimer()
+        with timer.stage("mouvement", len(frames)):
+            plans = [self.plan(frame) for frame in frames]
+
+        full = [frame for frame, (action, _) in zip(frames, plans) if action == FULL]
+        regions = [region for action, region in plans if action == CROP]
+        # Régions recadrées : vues du tableau décodé, sans copie
+        crops = [
+            frame[y0:y1, x0:x1]
+            for frame, (x0, y0, x1, y1) in zip(
+                [frame for frame, (action, _) in zip(frames, plans) if action == CROP], regions
+            )
+        ]
+        full_detections = iter(infer(full, imgsz) if full else [])
+        crop_detections = iter(
+            infer(crops, self.crop_imgsz(regions, frames[0].shape, imgsz)) if crops else []
+        )
+
+        results = []
+        for frame, (action, region) in zip(frames, plans):
+            if action == FULL:
+                self._last = next(full_detections)
+            elif action == CROP:
+                self._last = self.combine(next(crop_detections), region, frame.shape)
+            results.append((self._last, action))
+        return results
+
+    def stats(self):
+        """Nombre d'images par action et fraction d'images sans inférence"""
+        total = sum(self._actions.values())
+        return {
+            "images": total,
+            **self._actions,
+            "fraction sautée": self._actions[SKIP] / total if total else 0.0,
+        }
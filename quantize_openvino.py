@@ -0,0 +1,165 @@
+"""
+Quantification INT8 du modèle OpenVINO et contrôle de sa précision
+Fichier : quantize_openvino.py
+
+UTILISATION :
+python quantize_openvino.py calibrate images_calibration/ --subset 300
+python quantize_openvino.py check images_validation/
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+from backends import OpenVinoBackend, export_openvino, openvino_paths, quantize_openvino
+from detect_batch import list_images, read_image
+from detection import CONF_FLOOR, IMGSZ, IOU, MODEL_PATH, box_iou
+
+# Nombre d'images de calibration utilisées par défaut (valeur recommandée par NNCF)
+CALIBRATION_SUBSET = 300
+
+# Seuils du contrôle de précision
+CHECK_CONF = 0.25
+MATCH_IOU = 0.5
+
+
+def match_detections(reference, candidate, iou_threshold=MATCH_IOU):
+    """Appariement glouton (même classe, IoU ≥ seuil) des détections candidates aux références
+
+    Retourne les couples d'indices appariés et leurs IoU.
+    """
+    pairs, ious = [], []
+    if len(reference) == 0 or len(candidate) == 0:
+        return pairs, ious
+    iou = box_iou(reference.boxes, candidate.boxes)
+    iou[reference.classes[:, None] != candidate.classes[None, :]] = 0.0
+    for _ in range(min(iou.shape)):
+        i, j = np.unravel_index(iou.argmax(), iou.shape)
+        if iou[i, j] < iou_threshold:
+            break
+        pairs.append((i, j))
+        ious.append(iou[i, j])
+        iou[i, :] = 0.0
+        iou[:, j] = 0.0
+    return pairs, ious
+
+
+def compare(reference_model, candidate_model, images, conf=CHECK_CONF, imgsz=IMGSZ, iou=IOU):
+    """Compare les détections INT8 aux détections fp32, classe par classe"""
+    names = reference_model.names
+    per_class = {
+        cls: {"fp32": 0, "int8": 0, "appariées": 0, "iou": [], "écart conf.": []}
+        for cls in names
+    }
+    latency = {"fp32": 0.0, "int8": 0.0}
+
+    for image in images:
+        outputs = {}
+        for key, model in (("fp32", reference_model), ("int8", candidate_model)):
+            start = time.perf_counter()
+            outputs[key] = model.predict_images([image], imgsz=imgsz, conf=conf, iou=iou)[0]
+            latency[key] += time.perf_counter() - start
+        reference, candidate = outputs["fp32"], outputs["int8"]
+
+        for key, detections in outputs.items():
+            for cls in detections.classes.tolist():
+                per_class[cls][key] += 1
+        pairs, ious = match_detections(reference, candidate)
+        for (i, j), value in zip(pairs, ious):
+            stats = per_class[int(reference.classes[i])]
+            stats["appariées"] += 1
+            stats["iou"].append(value)
+            stats["écart conf."].append(abs(float(reference.scores[i] - candidate.scores[j])))
+
+    rows = []
+    for cls, stats in per_class.items():
+        matched = stats["appariées"]
+        rows.append({
+            "Classe": names[cls],
+            "fp32": stats["fp32"],
+            "int8": stats["int8"],
+            "Rappel / fp32": matched / stats["fp32"] if stats["fp32"] else float("nan"),
+            "Précision / fp32": matched / stats["int8"] if stats["int8"] else float("nan"),
+            "IoU moyen": float(np.mean(stats["iou"])) if matched else float("nan"),
+            "|Δ conf.| moyen": float(np.mean(stats["écart conf."])) if matched else float("nan"),
+        })
+    count = max(len(images), 1)
+    return rows, {key: 1000 * total / count for key, total in latency.items()}
+
+
+def load_images(source, limit=None, seed=0):
+    """Chemins et images RVB d'un dossier, éventuellement tirés au hasard jusqu'à `limit`
+
+    Les fichiers illisibles sont signalés et ignorés.
+    """
+    paths = list_images(source)
+    if limit and len(paths) > limit:
+        paths = sorted(random.Random(seed).sample(paths, limit))
+    loaded, images = [], []
+    for path in paths:
+        try:
+            images.append(read_image(path))
+        except Exception as e:
+            print(f"{path} ignorée : {e}", file=sys.stderr)
+            continue
+        loaded.append(path)
+    return loaded, images
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Quantification INT8 OpenVINO du modèle")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ, help="Taille d'entrée du modèle")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate = commands.add_parser("calibrate", help="Calibre et enregistre le modèle INT8")
+    calibrate.add_argument("images", help="Dossier d'images représentatives")
+    calibrate.add_argument("--subset", type=int, default=CALIBRATION_SUBSET,
+                           help="Nombre maximal d'images de calibration")
+
+    check = commands.add_parser("check", help="Compare les détections INT8 à celles du fp32")
+    check.add_argument("images", help="Dossier d'images de validation")
+    check.add_argument("--limit", type=int, help="Nombre maximal d'images comparées")
+    check.add_argument("--conf", type=float, default=CHECK_CONF, help="Seuil de confiance")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    _, images = load_images(args.images, args.subset if args.command == "calibrate" else args.limit)
+    if not images:
+        print(f"Aucune image trouvée dans {args.images}", file=sys.stderr)
+        return 1
+
+    if args.command == "calibrate":
+        start = time.perf_counter()
+        xml_path = quantize_openvino(images, args.model, args.imgsz)
+        print(f"Modèle INT8 calibré sur {len(images)} image(s) en "
+              f"{time.perf_counter() - start:.1f} s : {xml_path}", file=sys.stderr)
+        return 0
+
+    int8_path, _ = openvino_paths(args.model, "int8")
+    if not os.path.exists(int8_path):
+        print("Modèle INT8 absent : lancez d'abord la commande calibrate", file=sys.stderr)
+        return 1
+    candidate = OpenVinoBackend(int8_path)
+    reference = OpenVinoBackend(export_openvino(args.model, args.imgsz))
+    rows, latency = compare(reference, candidate, images, max(args.conf, CONF_FLOOR), args.imgsz)
+
+    print(f"{'Classe':<14}{'fp32':>6}{'int8':>6}{'Rappel':>8}{'Précis.':>9}{'IoU':>7}{'|Δconf|':>9}")
+    for row in rows:
+        print(
+            f"{row['Classe']:<14}{row['fp32']:>6}{row['int8']:>6}{row['Rappel / fp32']:>8.3f}"
+            f"{row['Précision / fp32']:>9.3f}{row['IoU moyen']:>7.3f}{row['|Δ conf.| moyen']:>9.3f}"
+        )
+    print(f"Latence moyenne : fp32 {latency['fp32']:.1f} ms, int8 {latency['int8']:.1f} ms "
+          f"(×{latency['fp32'] / latency['int8'] if latency['int8'] else 0:.2f})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
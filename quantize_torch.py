@@ -0,0 +1,171 @@
+"""
+Quantification INT8 du modèle PyTorch (sans export) et mesure de son effet
+Fichier : quantize_torch.py
+
+UTILISATION :
+python quantize_torch.py calibrate images_calibration/ --subset 300
+python quantize_torch.py check dataset/valid/images/
+
+Le contrôle utilise les annotations YOLO (dossier labels/ voisin de images/,
+ou fichier .txt à côté de l'image) ; sans annotation, les détections fp32
+servent de référence.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+from backends import TORCH_QUANT_ENGINE, load_torch_int8, quantize_torch, torch_int8_path
+from detection import CONF_FLOOR, IMGSZ, IOU, MODEL_PATH, box_iou, load_yolo, predict
+from quantize_openvino import CALIBRATION_SUBSET, CHECK_CONF, MATCH_IOU, load_images
+
+
+def label_path(image_path):
+    """Fichier d'annotations YOLO associé à une image"""
+    stem = os.path.splitext(image_path)[0]
+    parts = stem.split(os.sep)
+    if "images" in parts:
+        index = len(parts) - 1 - parts[::-1].index("images")
+        candidate = os.sep.join(parts[:index] + ["labels"] + parts[index + 1:]) + ".txt"
+        if os.path.exists(candidate):
+            return candidate
+    return stem + ".txt" if os.path.exists(stem + ".txt") else None
+
+
+def read_labels(path, shape):
+    """Annotations YOLO (classe, centre et taille normalisés) -> boîtes xyxy en pixels"""
+    rows = np.loadtxt(path, ndmin=2, dtype=np.float32) if os.path.getsize(path) else np.zeros((0, 5))
+    height, width = shape[:2]
+    centers = rows[:, 1:3] * (width, height)
+    half = rows[:, 3:5] * (width, height) / 2
+    boxes = np.concatenate([centers - half, centers + half], axis=1)
+    return boxes.astype(np.float32), rows[:, 0].astype(np.int64)
+
+
+def average_precision(scores, matched, n_truth):
+    """Aire sous l'enveloppe de la courbe précision-rappel"""
+    if n_truth == 0 or len(scores) == 0:
+        return 0.0
+    order = np.argsort(-np.asarray(scores), kind="stable")
+    tp = np.cumsum(np.asarray(matched, dtype=np.float64)[order])
+    recall = np.concatenate([[0.0], tp / n_truth, [1.0]])
+    precision = np.concatenate([[1.0], tp / np.arange(1, len(tp) + 1), [0.0]])
+    precision = np.maximum.accumulate(precision[::-1])[::-1]
+    return float(np.sum(np.diff(recall) * precision[1:]))
+
+
+def mean_average_precision(truths, detections_list, n_classes, iou_threshold=MATCH_IOU):
+    """mAP à IoU `iou_threshold`, moyenné sur les classes présentes dans la vérité terrain"""
+    scores = [[] for _ in range(n_classes)]
+    matched = [[] for _ in range(n_classes)]
+    n_truth = np.zeros(n_classes, dtype=np.int64)
+
+    for (truth_boxes, truth_classes), detections in zip(truths, detections_list):
+        np.add.at(n_truth, truth_classes, 1)
+        iou = box_iou(detections.boxes, truth_boxes)
+        iou[detections.classes[:, None] != truth_classes[None, :]] = 0.0
+        taken = np.zeros(len(truth_boxes), dtype=bool)
+        # Chaque vérité est attribuée à la détection de meilleur score qui la recouvre
+        for i in np.argsort(-detections.scores, kind="stable"):
+            candidates = np.where(~taken & (iou[i] >= iou_threshold), iou[i], -1.0)
+            j = int(candidates.argmax()) if len(candidates) else -1
+            hit = j >= 0 and candidates[j] >= 0
+            if hit:
+                taken[j] = True
+            cls = int(detections.classes[i])
+            scores[cls].append(float(detections.scores[i]))
+            matched[cls].append(hit)
+
+    present = [cls for cls in range(n_classes) if n_truth[cls]]
+    per_class = {cls: average_precision(scores[cls], matched[cls], n_truth[cls]) for cls in present}
+    return (float(np.mean(list(per_class.values()))) if per_class else 0.0), per_class
+
+
+def timed_predictions(model, images, imgsz):
+    """Détections image par image et latence moyenne en ms"""
+    predict(model, images[:1], batch_size=1, imgsz=imgsz)  # préchauffage
+    start = time.perf_counter()
+    detections = [predict(model, [image], batch_size=1, imgsz=imgsz, conf=CONF_FLOOR, iou=IOU)[0]
+                  for image in images]
+    return detections, 1000 * (time.perf_counter() - start) / len(images)
+
+
+def check(args):
+    int8_path = torch_int8_path(args.model, args.engine)
+    if not os.path.exists(int8_path):
+        print("Modèle INT8 absent : lancez d'abord la commande calibrate", file=sys.stderr)
+        return 1
+
+    paths, images = load_images(args.images, args.limit)
+    if not images:
+        print(f"Aucune image trouvée dans {args.images}", file=sys.stderr)
+        return 1
+
+    fp32 = load_yolo(args.model)
+    int8 = load_torch_int8(args.model, args.engine)
+    fp32_detections, fp32_ms = timed_predictions(fp32, images, args.imgsz)
+    int8_detections, int8_ms = timed_predictions(int8, images, args.imgsz)
+
+    labels = [label_path(path) for path in paths]
+    if all(labels):
+        truths = [read_labels(path, image.shape) for path, image in zip(labels, images)]
+        reference = "annotations"
+    else:
+        truths = [(d.boxes, d.classes) for d in (d.filter(CHECK_CONF) for d in fp32_detections)]
+        reference = f"détections fp32 (conf ≥ {CHECK_CONF})"
+
+    names = fp32.names
+    fp32_map, fp32_ap = mean_average_precision(truths, fp32_detections, len(names))
+    int8_map, int8_ap = mean_average_precision(truths, int8_detections, len(names))
+
+    print(f"{len(images)} image(s), référence : {reference}, moteur {args.engine}")
+    print(f"{'Classe':<14}{'AP50 fp32':>11}{'AP50 int8':>11}{'Δ':>8}")
+    for cls in fp32_ap:
+        print(f"{names[cls]:<14}{fp32_ap[cls]:>11.4f}{int8_ap[cls]:>11.4f}"
+              f"{int8_ap[cls] - fp32_ap[cls]:>+8.4f}")
+    print(f"{'mAP50':<14}{fp32_map:>11.4f}{int8_map:>11.4f}{int8_map - fp32_map:>+8.4f}")
+    print(f"Latence moyenne : fp32 {fp32_ms:.1f} ms, int8 {int8_ms:.1f} ms "
+          f"(×{fp32_ms / int8_ms if int8_ms else 0:.2f})")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Quantification INT8 PyTorch du modèle")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--imgsz", type=int, default=IMGSZ, help="Taille d'entrée du modèle")
+    parser.add_argument("--engine", choices=("fbgemm", "qnnpack", "x86"), default=TORCH_QUANT_ENGINE,
+                        help="Moteur de quantification (fbgemm sur x86, qnnpack sur ARM)")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    calibrate = commands.add_parser("calibrate", help="Calibre et enregistre le modèle INT8")
+    calibrate.add_argument("images", help="Dossier d'images représentatives")
+    calibrate.add_argument("--subset", type=int, default=CALIBRATION_SUBSET,
+                           help="Nombre maximal d'images de calibration")
+
+    check_parser = commands.add_parser("check", help="Accélération et écart de mAP50 face au fp32")
+    check_parser.add_argument("images", help="Dossier d'images de validation")
+    check_parser.add_argument("--limit", type=int, help="Nombre maximal d'images évaluées")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "check":
+        return check(args)
+
+    _, images = load_images(args.images, args.subset)
+    if not images:
+        print(f"Aucune image trouvée dans {args.images}", file=sys.stderr)
+        return 1
+    start = time.perf_counter()
+    target = quantize_torch(images, args.model, args.imgsz, args.engine)
+    print(f"Modèle INT8 calibré sur {len(images)} image(s) en "
+          f"{time.perf_counter() - start:.1f} s : {target}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
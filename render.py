@@ -0,0 +1,68 @@
+"""
+Rendu en mémoire des détections (sans fichier temporaire)
+Fichier : render.py
+"""
+
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from timing import timed
+
+# Palette de couleurs (RVB) par classe, reprise de celle d'ultralytics
+PALETTE = [
+    (255, 56, 56), (255, 157, 151), (255, 112, 31), (255, 178, 29), (207, 210, 49),
+    (72, 249, 10), (146, 204, 23), (61, 219, 134), (26, 147, 52), (0, 212, 187),
+    (44, 153, 168), (0, 194, 255), (52, 69, 147), (100, 115, 255), (0, 24, 236),
+    (132, 56, 255), (82, 0, 133), (203, 56, 255), (255, 149, 200), (255, 55, 199),
+]
+
+# Formats proposés pour l'envoi de l'image annotée au navigateur
+IMAGE_FORMATS = ("JPEG", "WEBP", "PNG")
+
+
+def class_color(cls, channels="RGB"):
+    """Couleur associée à un identifiant de classe"""
+    color = PALETTE[int(cls) % len(PALETTE)]
+    return color[::-1] if channels == "BGR" else color
+
+
+@timed("dessin des boîtes")
+def draw_detections(image, detections, channels="RGB"):
+    """Dessine les boîtes sur une copie de l'image (RVB ou BGR) et retourne le tableau annoté"""
+    canvas = image.copy()
+    line_width = max(round(sum(canvas.shape[:2]) / 2 * 0.003), 2)
+    font_scale = line_width / 3
+    font_thickness = max(line_width - 1, 1)
+
+    boxes = np.rint(detections.boxes).astype(np.int32).tolist()
+    ids = detections.ids.tolist() if detections.ids is not None else [None] * len(boxes)
+    for (x1, y1, x2, y2), cls, conf, track_id in zip(boxes, detections.classes, detections.scores, ids):
+        color = class_color(cls, channels)
+        cv2.rectangle(canvas, (x1, y1), (x2, y2), color, line_width, cv2.LINE_AA)
+
+        label = f"{detections.names.get(int(cls), cls)} {conf:.2f}"
+        if track_id is not None:
+            label = f"#{track_id} {label}"
+        (text_w, text_h), _ = cv2.getTextSize(label, 0, font_scale, font_thickness)
+        outside = y1 - text_h >= 3
+        y_text = y1 - text_h - 3 if outside else y1 + text_h + 3
+        cv2.rectangle(canvas, (x1, y1), (x1 + text_w, y_text), color, -1, cv2.LINE_AA)
+        cv2.putText(
+            canvas, label, (x1, y1 - 2 if outside else y1 + text_h + 2),
+            0, font_scale, (255, 255, 255), font_thickness, cv2.LINE_AA,
+        )
+    return canvas
+
+
+@timed("encodage de l'image")
+def encode_image(image, image_format="JPEG", quality=85, channels="RGB"):
+    """Encode une seule fois le tableau (JPEG/WebP/PNG) pour l'envoi au navigateur"""
+    if channels == "BGR":
+        image = image[..., ::-1]
+    buffer = io.BytesIO()
+    options = {} if image_format == "PNG" else {"quality": int(quality)}
+    Image.fromarray(image).save(buffer, format=image_format, **options)
+    return buffer.getvalue()
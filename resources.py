@@ -0,0 +1,130 @@
+"""
+Ressources partagées des applications Streamlit (app.py et app_streamlit.py)
+Fichier : resources.py
+
+Modèle, cache des résultats, planificateur de lots et serveur de métriques
+sont créés une seule fois par serveur (st.cache_resource) et partagés entre
+les sessions ; l'affichage des résultats reste dans ui.py.
+"""
+
+import os
+import sys
+
+import streamlit as st
+
+from backends import INFERENCE_REPLICAS, cpu_layout, load_backend_async, load_replicas
+from batching import MicroBatcher
+from detection import MODEL_PATH
+from inference_pool import INFERENCE_PROCESSES, start_pool_async
+from metrics import METRICS_PORT, MetricsCollector, start_metrics_server
+from result_cache import ResultCache
+
+
+def require_model_file():
+    """Arrête la page avec un message si le fichier de poids est absent"""
+    if not os.path.exists(MODEL_PATH):
+        st.error(f"❌ Modèle non trouvé : {MODEL_PATH}")
+        st.info("Placez le fichier best.pt dans le même dossier que cette application")
+        st.stop()
+
+
+# Chargement du modèle en arrière-plan, partagé entre les sessions
+@st.cache_resource
+def start_model_loading(backend):
+    """Lance le chargement et le préchauffage du modèle sans bloquer l'affichage
+
+    Le Future donne le modèle et le détail du temps de démarrage
+    (imports, poids, fusion, préchauffage). Avec INFERENCE_PROCESSES, ce sont
+    les processus d'inférence qui démarrent : le « modèle » est alors leur
+    InferencePool, et l'interface n'en charge aucun exemplaire.
+    """
+    if INFERENCE_PROCESSES:
+        loading = start_pool_async(INFERENCE_PROCESSES, backend, MODEL_PATH)
+    else:
+        loading = load_backend_async(backend, MODEL_PATH)
+    loading.add_done_callback(log_startup)
+    return loading
+
+
+def log_startup(loading):
+    """Écrit le détail du démarrage dans le journal du serveur"""
+    if loading.exception() is None:
+        print(f"Démarrage du modèle :\n{loading.result()[1].format_report()}", file=sys.stderr)
+
+
+class ModelLoading:
+    """Chargement du modèle vu depuis une page : l'interface s'affiche pendant qu'il se termine"""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.loading = start_model_loading(backend)
+        self.status = st.empty()
+        if not self.loading.done():
+            self.status.info("🔄 Chargement du modèle en arrière-plan...")
+
+    def get(self):
+        """Attend la fin du chargement du modèle (immédiat une fois chargé) ; None en cas d'échec"""
+        try:
+            model, _ = self.loading.result()
+        except Exception as e:
+            # Nouvelle tentative au prochain rechargement de la page
+            start_model_loading.clear()
+            self.status.error(f"❌ Erreur lors du chargement du modèle : {e}")
+            return None
+        self.status.success("✅ Modèle chargé avec succès !")
+        return model
+
+    def startup_report(self):
+        """Détail du temps de démarrage (à appeler une fois get() réussi)"""
+        return self.loading.result()[1].report()
+
+
+# Cache des résultats d'inférence, partagé entre les sessions
+@st.cache_resource
+def get_result_cache():
+    """Crée le cache des résultats (taille et dossier disque configurables)"""
+    return ResultCache(
+        max_bytes=int(os.environ.get("RESULT_CACHE_MB", "256")) * 1024 * 1024,
+        disk_dir=os.environ.get("RESULT_CACHE_DIR") or None,
+    )
+
+
+# Planificateur de micro-lots partagé par toutes les sessions
+@st.cache_resource
+def get_batcher(backend, _model):
+    """Regroupe en lots les inférences des sessions concurrentes
+
+    INFERENCE_PROCESSES > 0 : `_model` est le pool de processus d'inférence
+    partageant les poids ; sinon INFERENCE_REPLICAS répliques dans le
+    processus de l'interface.
+    """
+    if INFERENCE_PROCESSES:
+        return MicroBatcher(_model.workers)
+    models = [_model]
+    if INFERENCE_REPLICAS > 1:
+        models += load_replicas(backend, MODEL_PATH, INFERENCE_REPLICAS - 1)[0]
+    return MicroBatcher(models, layout=cpu_layout(len(models)))
+
+
+# Métriques Prometheus servies à côté de l'interface (METRICS_PORT)
+@st.cache_resource
+def start_metrics():
+    """Lance le serveur /metrics ; le dictionnaire retourné est lu à chaque collecte
+
+    Retourne None si METRICS_PORT n'est pas défini.
+    """
+    if not METRICS_PORT:
+        return None
+    sources = {}
+    start_metrics_server(METRICS_PORT, MetricsCollector(lambda: dict(sources)))
+    return sources
+
+
+def publish_metrics(model_loading, model, result_cache):
+    """Expose le planificateur, le cache, le démarrage et le pool une fois le modèle chargé"""
+    sources = start_metrics()
+    if sources is not None:
+        sources.update(
+            batcher=get_batcher(model_loading.backend, model), cache=result_cache,
+            startup=model_loading.startup_report(), pool=model if INFERENCE_PROCESSES else None,
+        )
@@ -0,0 +1,160 @@
+"""
+Cache des résultats d'inférence adressé par le contenu
+Fichier : result_cache.py
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+# Taille par défaut du niveau mémoire (octets)
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Version du format des entrées, incluse dans la clé (invalide le niveau disque)
+CACHE_FORMAT = 6
+
+_fingerprints = {}
+
+
+def hash_bytes(data):
+    """Empreinte rapide du contenu d'un fichier envoyé"""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def model_fingerprint(model_path):
+    """Empreinte des poids du modèle, recalculée seulement si le fichier change"""
+    stat = os.stat(model_path)
+    signature = (os.path.abspath(model_path), stat.st_size, stat.st_mtime_ns)
+    if signature not in _fingerprints:
+        digest = hashlib.blake2b(digest_size=16)
+        with open(model_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        _fingerprints[signature] = digest.hexdigest()
+    return _fingerprints[signature]
+
+
+def make_key(data, fingerprint, params):
+    """Clé de cache : contenu de l'image + modèle + paramètres d'inférence"""
+    params_repr = ",".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"v{CACHE_FORMAT}-{hash_bytes(data)}-{fingerprint[:16]}-{hash_bytes(params_repr.encode())[:8]}"
+
+
+class ResultCache:
+    """Cache LRU borné en mémoire, avec un niveau disque optionnel"""
+
+    def __init__(self, max_bytes=DEFAULT_MAX_BYTES, disk_dir=None, max_disk_bytes=None):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def total_bytes(self):
+        return self._total_bytes
+
+    def get(self, key):
+        """Retourne la valeur en cache, ou None si absente"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+
+        value = self._load_from_disk(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._store(key, value, _estimate_nbytes(value))
+        return value
+
+    def put(self, key, value, nbytes=None):
+        """Ajoute une valeur en cache, en évinçant les entrées les plus anciennes"""
+        if nbytes is None:
+            nbytes = _estimate_nbytes(value)
+        with self._lock:
+            self._store(key, value, nbytes)
+        self._save_to_disk(key, value)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._total_bytes = 0
+
+    def _store(self, key, value, nbytes):
+        if nbytes > self.max_bytes:
+            return
+        if key in self._entries:
+            self._total_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (value, nbytes)
+        self._total_bytes += nbytes
+        while self._total_bytes > self.max_bytes:
+            _, (_, evicted_bytes) = self._entries.popitem(last=False)
+            self._total_bytes -= evicted_bytes
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def _load_from_disk(self, key):
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return None
+        os.utime(path)
+        return value
+
+    def _save_to_disk(self, key, value):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        if self.max_disk_bytes:
+            self._trim_disk()
+
+    def _trim_disk(self):
+        """Supprime les fichiers les moins récemment utilisés au-delà du quota disque"""
+        files = []
+        for name in os.listdir(self.disk_dir):
+            if name.endswith(".pkl"):
+                path = os.path.join(self.disk_dir, name)
+                stat = os.stat(path)
+                files.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def _estimate_nbytes(value):
+    """Estimation de la taille mémoire d'une valeur (somme des tableaux NumPy)"""
+    if hasattr(value, "nbytes"):
+        return int(value.nbytes)
+    if isinstance(value, dict):
+        return sum(_estimate_nbytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_estimate_nbytes(v) for v in value)
+    if hasattr(value, "__dict__"):
+        return sum(_estimate_nbytes(v) for v in vars(value).values())
+    return 64
@@ -0,0 +1,42 @@
+"""
+Configuration commune des tests
+Fichier : tests/conftest.py
+
+UTILISATION :
+python -m pytest tests
+"""
+
+import os
+import sys
+
+import cv2
+import numpy as np
+import pytest
+
+# Les modules de l'application sont à la racine du dépôt
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Images synthétiques : tailles (largeur, hauteur) parcourues dans l'ordre, graine fixe
+SYNTHETIC_SIZES = ((640, 480), (1280, 720), (1920, 1080), (3840, 2160))
+SYNTHETIC_SEED = 0
+
+
+@pytest.fixture(scope="session")
+def synthetic_jpegs():
+    """Octets JPEG déterministes : chaussée grise et rectangles colorés de tailles variées"""
+    rng = np.random.default_rng(SYNTHETIC_SEED)
+    images = []
+    for width, height in SYNTHETIC_SIZES:
+        image = np.full((height, width, 3), 110, dtype=np.uint8)
+        image[: height // 3] = (200, 170, 140)
+        for _ in range(12):
+            w = int(rng.integers(width // 20, width // 5))
+            h = int(rng.integers(height // 20, height // 5))
+            x = int(rng.integers(0, width - w))
+            y = int(rng.integers(height // 3, height - h))
+            color = tuple(int(c) for c in rng.integers(0, 255, 3))
+            cv2.rectangle(image, (x, y), (x + w, y + h), color, -1)
+        noise = rng.integers(-8, 9, image.shape, dtype=np.int16)
+        image = np.clip(image.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+        images.append(cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes())
+    return images
@@ -0,0 +1,75 @@
+"""
+Tests de l'API HTTP
+Fichier : tests/test_api.py
+"""
+
+import numpy as np
+import pytest
+
+from detection import Detections
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+from metrics import SERVICE_COUNTERS  # noqa: E402
+
+
+class FakeModel:
+    """Modèle factice (interface des moteurs alternatifs) : deux boîtes par image, scores 0.1 et 0.9"""
+
+    def predict_images(self, images, batch_size, conf, **params):
+        return [
+            Detections(
+                boxes=np.array([[10, 10, 50, 50], [60, 60, 120, 100]], dtype=np.float32),
+                scores=np.array([0.1, 0.9], dtype=np.float32),
+                classes=np.array([0, 1], dtype=np.int64),
+                names={0: "car", 1: "bus"},
+            )
+            for _ in images
+        ]
+
+
+@pytest.fixture
+def client():
+    with TestClient(api.create_app(FakeModel()), raise_server_exceptions=False) as client:
+        yield client
+
+
+def requests_count(endpoint, status):
+    return SERVICE_COUNTERS.snapshot()[0].get((endpoint, str(status)), 0)
+
+
+def test_detect_filters_by_conf(client, synthetic_jpegs):
+    response = client.post("/detect?conf=0.5", content=synthetic_jpegs[0])
+    assert response.status_code == 200
+    body = response.json()
+    assert (body["width"], body["height"]) == (640, 480)
+    assert [d["Classe"] for d in body["detections"]] == ["bus"]
+    assert client.post("/detect?conf=0.05", content=synthetic_jpegs[0]).json()["count"] == 2
+
+
+def test_conf_below_inference_floor_is_rejected(client, synthetic_jpegs):
+    assert client.post("/detect?conf=0.01", content=synthetic_jpegs[0]).status_code == 422
+
+
+@pytest.mark.parametrize("cut", [0.5, 0.05])
+def test_truncated_image_is_a_client_error(client, synthetic_jpegs, cut):
+    data = synthetic_jpegs[1]
+    before = requests_count("/detect", 400)
+    response = client.post("/detect", content=data[:int(len(data) * cut)])
+    assert response.status_code == 400
+    assert requests_count("/detect", 400) == before + 1
+
+
+def test_invalid_requests(client):
+    assert client.post("/detect", content=b"pas une image").status_code == 400
+    assert client.post("/detect", content=b"").status_code == 400
+    assert client.post("/detect?profile=inconnu", content=b"x").status_code == 400
+
+
+def test_multipart_upload(client, synthetic_jpegs):
+    response = client.post("/detect", files={"file": ("image.jpg", synthetic_jpegs[0], "image/jpeg")})
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
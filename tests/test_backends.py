@@ -0,0 +1,104 @@
+"""
+Tests des moteurs d'inférence exportés
+Fichier : tests/test_backends.py
+"""
+
+import sys
+import types
+
+import numpy as np
+import pytest
+
+import backends
+from backends import (
+    ExportedBackend, cpu_layout, decode_output, nms, preprocess_batch, set_torch_threads,
+)
+
+NAMES = {0: "car", 1: "bus"}
+
+
+def raw_output(rows, anchors=8):
+    """Sortie brute YOLOv8 (4 + nc, ancres) : une ancre par ligne (cx, cy, w, h, score, classe)"""
+    output = np.zeros((4 + len(NAMES), anchors), dtype=np.float32)
+    for anchor, (cx, cy, w, h, score, cls) in enumerate(rows):
+        output[:4, anchor] = (cx, cy, w, h)
+        output[4 + cls, anchor] = score
+    return output
+
+
+class FixedBackend(ExportedBackend):
+    """Moteur factice : la même sortie brute pour chaque image du lot"""
+
+    names = NAMES
+
+    def __init__(self, output):
+        self.output = output
+        self.batches = []
+
+    def run(self, batch):
+        self.batches.append(batch.shape)
+        return np.stack([self.output] * len(batch))
+
+
+def test_exported_backend_requires_run():
+    with pytest.raises(TypeError):
+        ExportedBackend()
+
+
+def test_preprocess_batch_letterboxes_to_nchw():
+    images = [np.zeros((100, 200, 3), dtype=np.uint8), np.full((50, 50, 3), 255, dtype=np.uint8)]
+    batch, transforms = preprocess_batch(images, 64)
+    assert batch.shape == (2, 3, 64, 64) and batch.dtype == np.float32
+    assert transforms == [(0.32, (0, 16)), (1.28, (0, 0))]
+    assert batch[1].min() == 1.0
+    assert batch[0, :, 0, 0] == pytest.approx([114 / 255] * 3)
+
+
+def test_preprocess_batch_bgr_swaps_channels():
+    image = np.zeros((8, 8, 3), dtype=np.uint8)
+    image[..., 0] = 255
+    assert preprocess_batch([image], 8)[0][0, 0].max() == 1.0
+    assert preprocess_batch([image], 8, "BGR")[0][0, 2].max() == 1.0
+
+
+def test_nms_is_per_class_and_sorted_by_score():
+    boxes = np.array([[0, 0, 10, 10], [1, 1, 11, 11], [0, 0, 10, 10]], dtype=np.float32)
+    scores = np.array([0.6, 0.9, 0.8], dtype=np.float32)
+    classes = np.array([0, 0, 1])
+    assert nms(boxes, scores, classes, iou=0.5).tolist() == [1, 2]
+    assert nms(boxes, scores, classes, iou=0.5, max_det=1).tolist() == [1]
+    assert nms(boxes[:0], scores[:0], classes[:0], iou=0.5).tolist() == []
+
+
+def test_decode_output_filters_and_converts_boxes():
+    output = raw_output([(20, 20, 10, 10, 0.9, 1), (40, 40, 8, 4, 0.02, 0)])
+    detections = decode_output(output, conf=0.05, iou=0.7, names=NAMES)
+    assert detections.boxes.tolist() == [[15, 15, 25, 25]]
+    assert detections.scores.tolist() == pytest.approx([0.9])
+    assert detections.classes.tolist() == [1]
+
+
+def test_predict_images_maps_boxes_to_original_image():
+    backend = FixedBackend(raw_output([(32, 32, 16, 16, 0.8, 0)]))
+    images = [np.zeros((100, 200, 3), dtype=np.uint8)] * 3
+    detections = backend.predict_images(images, batch_size=2, imgsz=64)
+    assert backend.batches == [(2, 3, 64, 64), (1, 3, 64, 64)]
+    assert len(detections) == 3
+    assert detections[0].boxes[0].tolist() == pytest.approx([75, 25, 125, 75])
+    assert set(detections[0].speed) == {"preprocess", "inference", "postprocess"}
+
+
+def test_cpu_layout_splits_available_cores(monkeypatch):
+    monkeypatch.setattr(backends, "available_cpus", lambda: list(range(8)))
+    assert cpu_layout(3) == [(None, 2)] * 3
+    assert cpu_layout(2, pin=True) == [([0, 1, 2, 3], 4), ([4, 5, 6, 7], 4)]
+    assert cpu_layout(3, threads=3, pin=True) == [([0, 1, 2], 3), ([3, 4, 5], 3), ([6, 7, 0], 3)]
+    assert cpu_layout(16) == [(None, 1)] * 16
+
+
+def test_set_torch_threads_is_process_wide(monkeypatch):
+    calls = []
+    monkeypatch.setitem(sys.modules, "torch", types.SimpleNamespace(set_num_threads=calls.append))
+    set_torch_threads(0)
+    set_torch_threads(4)
+    assert calls == [4]
@@ -0,0 +1,96 @@
+"""
+Tests du planificateur de micro-lots
+Fichier : tests/test_batching.py
+"""
+
+import threading
+
+import numpy as np
+import pytest
+
+from batching import MicroBatcher
+from detection import Detections
+
+
+class FakeModel:
+    """Modèle factice (interface des moteurs alternatifs) : une boîte par image, marquée par sa valeur"""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def predict_images(self, images, batch_size, **params):
+        if self.fail:
+            raise RuntimeError("échec du modèle")
+        with self.lock:
+            self.calls.extend(len(images[start:start + batch_size])
+                              for start in range(0, len(images), batch_size))
+        return [
+            Detections(np.full((1, 4), image[0, 0, 0], dtype=np.float32),
+                       np.full(1, params["conf"], dtype=np.float32), np.zeros(1, dtype=np.int64), {})
+            for image in images
+        ]
+
+
+def images(count):
+    return [np.full((4, 4, 3), value, dtype=np.uint8) for value in range(count)]
+
+
+def test_concurrent_requests_share_a_batch():
+    model = FakeModel()
+    batcher = MicroBatcher(model, max_batch_size=4, max_wait_ms=200)
+    try:
+        results = batcher.predict(images(4))
+    finally:
+        batcher.close()
+    assert model.calls == [4]
+    assert [int(d.boxes[0, 0]) for d in results] == [0, 1, 2, 3]
+    assert batcher.stats()["batch_size_distribution"] == {4: 1}
+
+
+def test_batch_is_capped_at_max_size():
+    model = FakeModel()
+    batcher = MicroBatcher(model, max_batch_size=3, max_wait_ms=200)
+    try:
+        results = batcher.predict(images(7))
+    finally:
+        batcher.close()
+    assert sum(model.calls) == 7 and max(model.calls) <= 3
+    assert [int(d.boxes[0, 0]) for d in results] == list(range(7))
+
+
+def test_different_params_are_not_mixed():
+    model = FakeModel()
+    batcher = MicroBatcher(model, max_batch_size=8, max_wait_ms=200)
+    try:
+        futures = [batcher.submit(image, conf=0.25) for image in images(2)]
+        futures += [batcher.submit(image, conf=0.5) for image in images(2)]
+        scores = [float(future.result().scores[0]) for future in futures]
+    finally:
+        batcher.close()
+    assert sorted(model.calls) == [2, 2]
+    assert scores == [0.25, 0.25, 0.5, 0.5]
+
+
+def test_run_batch_splits_by_batch_size():
+    model = FakeModel()
+    batcher = MicroBatcher(model)
+    try:
+        results = batcher.run_batch(images(10), 4)
+    finally:
+        batcher.close()
+    assert model.calls == [4, 4, 2]
+    assert len(results) == 10
+    assert batcher.stats()["batch_size_distribution"] == {2: 1, 4: 2}
+
+
+def test_model_error_reaches_every_caller():
+    batcher = MicroBatcher(FakeModel(fail=True), max_batch_size=4, max_wait_ms=50)
+    try:
+        futures = [batcher.submit(image) for image in images(3)]
+        for future in futures:
+            with pytest.raises(RuntimeError):
+                future.result()
+    finally:
+        batcher.close()
@@ -0,0 +1,112 @@
+"""
+Tests du comptage par lignes et zones
+Fichier : tests/test_counting.py
+"""
+
+import numpy as np
+import pytest
+
+from counting import CrossingCounter, Line, Zone, build_counters, line_crossings, parse_points
+from detection import Detections
+from tracking import Tracker
+
+NAMES = {0: "voiture", 1: "camion"}
+
+
+def tracks(*vehicles):
+    """Détections suivies : (id, classe, x centre, y bas) par véhicule, boîtes de 20 x 20"""
+    ids, classes, x, y = (np.array(values) for values in zip(*vehicles)) if vehicles else ([],) * 4
+    boxes = np.stack([np.asarray(x) - 10, np.asarray(y) - 20, np.asarray(x) + 10, np.asarray(y)], axis=1)
+    return Detections(
+        boxes=boxes.astype(np.float32).reshape(-1, 4),
+        scores=np.ones(len(ids), dtype=np.float32),
+        classes=np.asarray(classes, dtype=np.int64),
+        names=NAMES,
+        ids=np.asarray(ids, dtype=np.int64),
+    )
+
+
+def test_parse_points_relative_and_pixels():
+    np.testing.assert_allclose(parse_points("0,0.6,1,0.6", 200, 100), [[0, 60], [200, 60]])
+    np.testing.assert_allclose(parse_points("10,20 30,40", 200, 100), [[10, 20], [30, 40]])
+    with pytest.raises(ValueError):
+        parse_points("1,2,3", 200, 100)
+
+
+def test_line_crossings_sign_and_segment():
+    line = np.array([[0.0, 50.0], [100.0, 50.0]])
+    previous = np.array([[10.0, 40.0], [10.0, 60.0], [150.0, 40.0], [10.0, 40.0]])
+    current = np.array([[10.0, 60.0], [10.0, 40.0], [150.0, 60.0], [20.0, 45.0]])
+    # Descente, remontée, passage hors du segment, pas de franchissement
+    assert line_crossings(line, previous, current).tolist() == [1, -1, 0, 0]
+
+
+def test_line_counts_each_vehicle_once_per_direction():
+    counter = CrossingCounter([Line("ligne 1", np.array([[0.0, 50.0], [100.0, 50.0]]))])
+    assert counter.update(tracks((1, 0, 50, 40), (2, 1, 80, 60)), 0.0, 0) == []
+    events = counter.update(tracks((1, 0, 50, 60), (2, 1, 80, 40)), 0.5, 1)
+    assert [(e["ID"], e["Classe"], e["Sens"]) for e in events] == [
+        (1, "voiture", "aller"), (2, "camion", "retour"),
+    ]
+    # Le véhicule 1 oscille autour de la ligne : un seul comptage par sens
+    counter.update(tracks((1, 0, 50, 40)), 1.0, 2)
+    assert counter.update(tracks((1, 0, 50, 60)), 1.5, 3) == []
+    assert counter.counts == {
+        ("ligne 1", "voiture", "aller"): 1,
+        ("ligne 1", "voiture", "retour"): 1,
+        ("ligne 1", "camion", "retour"): 1,
+    }
+    summary = {(row["Classe"], row["Sens"]): row["Véhicules / min"] for row in counter.summary()}
+    assert summary[("voiture", "aller")] == pytest.approx(40.0)
+
+
+def test_new_track_does_not_cross_line():
+    """Une piste vue pour la première fois de l'autre côté n'a pas franchi la ligne"""
+    counter = CrossingCounter([Line("ligne 1", np.array([[0.0, 50.0], [100.0, 50.0]]))])
+    counter.update(tracks((1, 0, 50, 40)), 0.0)
+    assert counter.update(tracks((2, 0, 50, 60)), 0.5) == []
+
+
+def test_crossing_on_low_score_frame_is_counted():
+    """Le franchissement a lieu pendant que la piste n'est associée qu'à une détection faible"""
+    tracker = Tracker()
+    counter = CrossingCounter([Line("ligne 1", np.array([[0.0, 100.0], [200.0, 100.0]]))])
+    events = []
+    for step in range(10):
+        # Bas de la boîte : 72, 77, ... 117 ; détections faibles autour du franchissement
+        y = 72.0 + 5.0 * step
+        score = 0.3 if step in (5, 6, 7) else 0.9
+        detections = Detections(
+            boxes=np.array([[70.0, y - 60.0, 130.0, y]], dtype=np.float32),
+            scores=np.array([score], dtype=np.float32),
+            classes=np.zeros(1, dtype=np.int64),
+            names=NAMES,
+        )
+        tracks = tracker.update(detections)
+        assert tracks.ids.tolist() == [1]
+        # Pistes non filtrées par le seuil d'affichage (0.5 dans l'interface)
+        events += counter.update(tracks, step / 10, step)
+    assert [(e["ID"], e["Image"], e["Sens"]) for e in events] == [(1, 6, "aller")]
+
+
+def test_zone_entry_and_exit():
+    square = np.array([[0.0, 0.0], [100.0, 0.0], [100.0, 100.0], [0.0, 100.0]])
+    counter = CrossingCounter([Zone("zone 1", square)])
+    assert counter.update(tracks((1, 0, 150, 50)), 0.0) == []
+    events = counter.update(tracks((1, 0, 50, 50), (2, 0, 20, 20)), 0.5)
+    assert [e["Sens"] for e in events] == ["entrée", "entrée"]
+    assert counter.update(tracks((1, 0, 60, 50), (2, 0, 20, 20)), 1.0) == []
+    assert [(e["ID"], e["Sens"]) for e in counter.update(tracks((1, 0, 150, 50)), 1.5)] == [(1, "sortie")]
+
+
+def test_untracked_detections_are_rejected():
+    counter = CrossingCounter(build_counters(["0,0.5,1,0.5"], width=100, height=100))
+    detections = tracks((1, 0, 50, 40))
+    detections.ids = None
+    with pytest.raises(ValueError):
+        counter.update(detections, 0.0)
+
+
+def test_zone_needs_three_points():
+    with pytest.raises(ValueError):
+        build_counters(zones=["0,0 1,1"], width=100, height=100)
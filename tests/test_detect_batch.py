@@ -0,0 +1,88 @@
+"""
+Tests de la détection par lots en ligne de commande
+Fichier : tests/test_detect_batch.py
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import detect_batch
+from detect_batch import DetectionWriter, load_checkpoint
+from detection import DEFAULT_CONF, Detections
+
+
+class FakeModel:
+    """Modèle factice (interface des moteurs alternatifs) : une boîte par image au score 0.9"""
+
+    def __init__(self):
+        self.confs = []
+
+    def predict_images(self, images, batch_size, conf, **params):
+        self.confs.append(conf)
+        return [
+            Detections(np.array([[1, 2, 3, 4]], dtype=np.float32), np.array([0.9], dtype=np.float32),
+                       np.zeros(1, dtype=np.int64), {0: "car"})
+            for _ in images
+        ]
+
+
+@pytest.fixture
+def image_dir(tmp_path, synthetic_jpegs):
+    folder = tmp_path / "images"
+    folder.mkdir()
+    for i, data in enumerate(synthetic_jpegs[:3]):
+        (folder / f"{i}.jpg").write_bytes(data)
+    (folder / "bad.jpg").write_bytes(b"pas une image")
+    return folder
+
+
+@pytest.fixture
+def model(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(detect_batch, "load_backend", lambda backend, path: model)
+    return model
+
+
+def test_failed_images_are_retried_on_resume(image_dir, tmp_path, model, capsys):
+    output = tmp_path / "detections.csv"
+    assert detect_batch.main([str(image_dir), "-o", str(output), "--batch-size", "2"]) == 0
+    done = load_checkpoint(f"{output}.ckpt")
+    assert len(done) == 3 and str(image_dir / "bad.jpg") not in done
+    assert len(pd.read_csv(output)) == 3
+    assert model.confs[0] == DEFAULT_CONF
+
+    capsys.readouterr()
+    detect_batch.main([str(image_dir), "-o", str(output), "--resume"])
+    assert "1 à traiter" in capsys.readouterr().err
+    assert len(pd.read_csv(output)) == 3
+
+
+def test_jsonl_writer_appends_on_resume(tmp_path):
+    path = str(tmp_path / "out.jsonl")
+    frame = pd.DataFrame({"Image": ["a"], "Confiance": [0.9]})
+    writer = DetectionWriter(path, "jsonl")
+    writer.write(frame)
+    writer.close()
+    writer = DetectionWriter(path, "jsonl", append=True)
+    writer.write(frame)
+    writer.close()
+    with open(path, encoding="utf-8") as f:
+        assert [json.loads(line)["Image"] for line in f] == ["a", "a"]
+
+
+def test_parquet_part_is_durable_only_once_closed(tmp_path, monkeypatch):
+    pytest.importorskip("pyarrow")
+    monkeypatch.setattr(detect_batch, "PARQUET_PART_ROWS", 2)
+    path = tmp_path / "out.parquet"
+    writer = DetectionWriter(str(path), "parquet")
+    writer.write(pd.DataFrame({"Image": ["a"]}))
+    assert not writer.flush() and not path.exists()
+    writer.write(pd.DataFrame({"Image": ["b"]}))
+    assert writer.flush() and path.exists()
+    writer.write(pd.DataFrame({"Image": ["c"]}))
+    writer.close()
+    parts = [path, tmp_path / "out.part1.parquet"]
+    assert pd.concat(pd.read_parquet(part) for part in parts)["Image"].tolist() == ["a", "b", "c"]
@@ -0,0 +1,40 @@
+"""
+Tests de l'inférence par lots
+Fichier : tests/test_detection.py
+"""
+
+import os
+
+import numpy as np
+import pytest
+
+from detection import MODEL_PATH, decode_image, letterbox, predict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_letterbox_keeps_ratio_and_centres():
+    image = np.zeros((100, 200, 3), dtype=np.uint8)
+    canvas, scale, (pad_x, pad_y) = letterbox(image, 320)
+    assert canvas.shape == (320, 320, 3)
+    assert scale == pytest.approx(1.6)
+    assert (pad_x, pad_y) == (0, 80)
+
+
+@pytest.fixture(scope="module")
+def model():
+    pytest.importorskip("ultralytics")
+    from detection import load_yolo
+
+    return load_yolo(os.path.join(ROOT, MODEL_PATH))
+
+
+def test_batch_does_not_change_results(model, synthetic_jpegs):
+    """Une image donne les mêmes détections seule ou dans un lot (résultats mis en cache)"""
+    x, y = (decode_image(data) for data in synthetic_jpegs[2:4])
+    alone = predict(model, [x], conf=0.01)[0]
+    batched = predict(model, [x, y], conf=0.01)[0]
+    assert len(alone.boxes) > 0
+    np.testing.assert_array_equal(alone.boxes, batched.boxes)
+    np.testing.assert_array_equal(alone.scores, batched.scores)
+    np.testing.assert_array_equal(alone.classes, batched.classes)
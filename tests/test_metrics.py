@@ -0,0 +1,64 @@
+"""
+Tests des métriques Prometheus
+Fichier : tests/test_metrics.py
+"""
+
+import numpy as np
+
+from detection import Detections
+from metrics import MetricsCollector, ServiceCounters, create_registry, render_metrics
+from result_cache import ResultCache
+from timing import LatencyRecorder
+
+NAMES = {0: "car", 1: "bus", 2: "van"}
+
+
+def detections(classes):
+    n = len(classes)
+    return Detections(
+        boxes=np.zeros((n, 4), dtype=np.float32), scores=np.ones(n, dtype=np.float32),
+        classes=np.array(classes, dtype=np.int64), names=NAMES,
+    )
+
+
+def exposition(counters, sources=dict):
+    registry = create_registry(MetricsCollector(sources, counters, LatencyRecorder()))
+    return render_metrics(registry).decode().splitlines()
+
+
+def test_requests_share_route_and_status_labels():
+    counters = ServiceCounters()
+    counters.observe_request("/detect", 200)
+    counters.observe_request("/images", 200)
+    counters.observe_request("/detect", "200")
+    lines = exposition(counters)
+    assert 'vehicle_detection_requests_total{endpoint="/detect",status="200"} 2.0' in lines
+    assert 'vehicle_detection_requests_total{endpoint="/images",status="200"} 1.0' in lines
+
+
+def test_detections_counted_per_class_with_empty_series():
+    counters = ServiceCounters()
+    counters.observe_detections([detections([0, 0, 1]), detections([])], "api")
+    lines = exposition(counters)
+    assert 'vehicle_detection_images_total{source="api"} 2.0' in lines
+    assert 'vehicle_detection_detections_total{class_name="car"} 2.0' in lines
+    assert 'vehicle_detection_detections_total{class_name="bus"} 1.0' in lines
+    assert 'vehicle_detection_detections_total{class_name="van"} 0.0' in lines
+
+
+def test_cache_and_startup_sources():
+    cache = ResultCache(max_bytes=1000)
+    cache.put("a", np.zeros(100, dtype=np.uint8))
+    cache.get("a")
+    cache.get("b")
+    startup = [{"Étape": "poids", "Temps total (s)": 1.5}, {"Étape": "préchauffage", "Temps total (s)": 0.5}]
+    lines = exposition(ServiceCounters(), lambda: {"cache": cache, "startup": startup})
+    assert "vehicle_detection_cache_hits_total 1.0" in lines
+    assert "vehicle_detection_cache_misses_total 1.0" in lines
+    assert "vehicle_detection_cache_hit_ratio 0.5" in lines
+    assert 'vehicle_detection_model_load_seconds{stage="total"} 2.0' in lines
+
+
+def test_missing_sources_are_not_exposed():
+    lines = exposition(ServiceCounters())
+    assert not any(line.startswith(("vehicle_detection_cache", "vehicle_detection_queue")) for line in lines)
@@ -0,0 +1,87 @@
+"""
+Tests du filtre de mouvement
+Fichier : tests/test_motion.py
+"""
+
+import numpy as np
+
+from detection import Detections
+from motion import CROP, FULL, SKIP, MotionGate
+
+NAMES = {0: "car"}
+HEIGHT, WIDTH = 480, 640
+
+
+def background():
+    return np.full((HEIGHT, WIDTH, 3), 100, dtype=np.uint8)
+
+
+def with_square(x, y, size=40):
+    frame = background()
+    frame[y:y + size, x:x + size] = 250
+    return frame
+
+
+class FakeModel:
+    """Une boîte de 10 px dans le coin haut gauche de chaque image reçue ; garde les appels"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, imgsz):
+        self.calls.append(([image.shape[:2] for image in images], imgsz))
+        return [
+            Detections(
+                boxes=np.array([[0, 0, 10, 10]], dtype=np.float32),
+                scores=np.array([0.9], dtype=np.float32),
+                classes=np.array([0], dtype=np.int64),
+                names=NAMES,
+            )
+            for _ in images
+        ]
+
+
+def test_static_frames_reuse_previous_detections():
+    gate, model = MotionGate(), FakeModel()
+    results = gate.run(model, [background()] * 4, 640)
+    assert [action for _, action in results] == [FULL, SKIP, SKIP, SKIP]
+    assert all(detections is results[0][0] for detections, _ in results)
+    assert model.calls == [([(HEIGHT, WIDTH)], 640)]
+    assert gate.stats()["fraction sautée"] == 0.75
+
+
+def test_local_motion_is_cropped_and_combined():
+    gate, model = MotionGate(), FakeModel()
+    gate.run(model, [background()], 640)
+    (detections, action), = gate.run(model, [with_square(400, 300)], 640)
+    assert action == CROP
+    shapes, imgsz = model.calls[1]
+    height, width = shapes[0]
+    assert height < HEIGHT // 2 and width < WIDTH // 2
+    assert 128 <= imgsz < 640 and imgsz % 32 == 0
+    # Boîte de la région décalée dans le repère de l'image ; l'ancienne, hors région, conservée
+    assert len(detections) == 2
+    assert detections.boxes[0].tolist() == [0, 0, 10, 10]
+    x0, y0 = detections.boxes[1, :2]
+    assert 340 <= x0 <= 400 and 240 <= y0 <= 300
+
+
+def test_large_motion_runs_the_full_model():
+    gate, model = MotionGate(), FakeModel()
+    changed = background()
+    changed[:, : WIDTH // 2 + 100] = 250
+    actions = [action for _, action in gate.run(model, [background(), changed], 640)]
+    assert actions == [FULL, FULL]
+
+
+def test_refresh_forces_full_inference():
+    gate, model = MotionGate(refresh=3), FakeModel()
+    actions = [action for _, action in gate.run(model, [background()] * 8, 640)]
+    assert actions == [FULL, SKIP, SKIP, SKIP, FULL, SKIP, SKIP, SKIP]
+
+
+def test_crop_imgsz_keeps_full_frame_resolution():
+    gate = MotionGate()
+    assert gate.crop_imgsz([(0, 0, 160, 100)], (HEIGHT, WIDTH), 640) == 160
+    assert gate.crop_imgsz([(0, 0, 10, 10)], (HEIGHT, WIDTH), 640) == 128
+    assert gate.crop_imgsz([(0, 0, 630, 470)], (HEIGHT, WIDTH), 640) == 640
@@ -0,0 +1,74 @@
+"""
+Tests du cache des résultats
+Fichier : tests/test_result_cache.py
+"""
+
+import numpy as np
+
+from result_cache import ResultCache, make_key
+
+
+def array(nbytes):
+    return np.zeros(nbytes, dtype=np.uint8)
+
+
+def test_lru_eviction_by_bytes():
+    cache = ResultCache(max_bytes=300)
+    for key in "abc":
+        cache.put(key, array(100))
+    assert cache.total_bytes == 300
+    cache.get("a")                      # « a » devient la plus récente
+    cache.put("d", array(150))
+    assert cache.get("b") is None and cache.get("c") is None
+    assert cache.get("a") is not None and cache.get("d") is not None
+    assert cache.total_bytes == 250
+
+
+def test_oversized_entry_is_not_stored():
+    cache = ResultCache(max_bytes=100)
+    cache.put("a", array(50))
+    cache.put("big", array(500))
+    assert cache.get("big") is None
+    assert cache.get("a") is not None
+    assert cache.total_bytes == 50
+
+
+def test_replacing_a_key_updates_total():
+    cache = ResultCache(max_bytes=1000)
+    cache.put("a", array(100))
+    cache.put("a", array(300))
+    assert len(cache) == 1
+    assert cache.total_bytes == 300
+
+
+def test_hits_and_misses():
+    cache = ResultCache()
+    cache.put("a", array(10))
+    cache.get("a")
+    cache.get("b")
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_disk_tier_survives_memory_eviction(tmp_path):
+    cache = ResultCache(max_bytes=100, disk_dir=str(tmp_path))
+    cache.put("a", array(80))
+    cache.put("b", array(80))
+    assert len(cache) == 1
+    np.testing.assert_array_equal(cache.get("a"), array(80))
+    assert ResultCache(disk_dir=str(tmp_path)).get("b") is not None
+
+
+def test_disk_quota_removes_oldest_files(tmp_path):
+    cache = ResultCache(max_bytes=0, disk_dir=str(tmp_path), max_disk_bytes=1500)
+    for key in "abc":
+        cache.put(key, array(600))
+    names = sorted(path.name for path in tmp_path.iterdir())
+    assert "a.pkl" not in names and len(names) == 2
+
+
+def test_key_depends_on_content_model_and_params():
+    key = make_key(b"image", "modele", {"conf": 0.05, "imgsz": 640})
+    assert key == make_key(b"image", "modele", {"imgsz": 640, "conf": 0.05})
+    assert key != make_key(b"image2", "modele", {"conf": 0.05, "imgsz": 640})
+    assert key != make_key(b"image", "autre", {"conf": 0.05, "imgsz": 640})
+    assert key != make_key(b"image", "modele", {"conf": 0.05, "imgsz": 320})
@@ -0,0 +1,69 @@
+"""
+Tests de l'inférence par tuiles
+Fichier : tests/test_tiling.py
+"""
+
+import numpy as np
+
+from detection import Detections
+from tiling import merge_detections, predict_tiled, tile_windows
+
+NAMES = {0: "voiture", 1: "camion"}
+
+
+def detections(boxes, scores, classes):
+    return Detections(
+        boxes=np.array(boxes, dtype=np.float32).reshape(-1, 4),
+        scores=np.array(scores, dtype=np.float32),
+        classes=np.array(classes, dtype=np.int64),
+        names=NAMES,
+        speed={"inference": 1.0},
+    )
+
+
+def test_tile_windows_cover_image_with_overlap():
+    windows = tile_windows((1000, 1500), tile=640, overlap=0.2)
+    assert windows[0] == (0, 0, 640, 640)
+    assert max(x1 for _, _, x1, _ in windows) == 1500
+    assert max(y1 for _, _, _, y1 in windows) == 1000
+    assert tile_windows((480, 640), tile=640) == [(0, 0, 640, 480)]
+
+
+def test_nms_merges_duplicates_across_seam():
+    """Un véhicule à cheval sur deux tuiles n'est gardé qu'une fois, avec le meilleur score"""
+    left = detections([[600, 100, 700, 160]], [0.8], [0])
+    right = detections([[602, 101, 701, 161], [900, 100, 950, 150]], [0.9, 0.7], [0, 0])
+    merged = merge_detections([left, right], "nms")
+    assert len(merged) == 2
+    np.testing.assert_allclose(sorted(merged.scores), [0.7, 0.9], rtol=1e-6)
+    assert merged.speed == {"inference": 2.0}
+
+
+def test_nms_keeps_overlapping_boxes_of_other_classes():
+    merged = merge_detections([detections([[0, 0, 50, 50]], [0.8], [0]),
+                               detections([[0, 0, 50, 50]], [0.9], [1])], "nms")
+    assert sorted(merged.classes.tolist()) == [0, 1]
+
+
+def test_wbf_averages_boxes_weighted_by_score():
+    left = detections([[600, 100, 700, 160]], [0.6], [0])
+    right = detections([[610, 100, 710, 160]], [0.9], [0])
+    merged = merge_detections([left, right], "wbf")
+    assert len(merged) == 1
+    np.testing.assert_allclose(merged.boxes[0], [606, 100, 706, 160], rtol=1e-5)
+    assert merged.scores[0] == np.float32(0.9)
+
+
+def test_predict_tiled_maps_boxes_to_image_frame():
+    image = np.zeros((640, 1200, 3), dtype=np.uint8)
+    calls = []
+
+    def run_batch(images, batch_size, **params):
+        calls.append([img.shape for img in images])
+        # Une boîte au même endroit de chaque tuile
+        return [detections([[10, 10, 50, 50]], [0.9], [0]) for _ in images]
+
+    result = predict_tiled(run_batch, image, tile=640, overlap=0.2, include_full=False)
+    x0s = [x0 for x0, _, _, _ in tile_windows(image.shape, 640, 0.2)]
+    assert calls == [[(640, 640, 3)] * len(x0s)]
+    np.testing.assert_allclose(sorted(result.boxes[:, 0]), [x0 + 10 for x0 in x0s])
@@ -0,0 +1,118 @@
+"""
+Tests de la mesure du temps par étape et par requête
+Fichier : tests/test_timing.py
+"""
+
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from detection import Detections
+from timing import (
+    LATENCY_BUCKETS_MS, LatencyRecorder, RequestTrace, StageTimer, add_model_stages, add_stage,
+    request_trace, stage, timed,
+)
+
+
+def trace_of(total, **stages):
+    trace = RequestTrace()
+    trace.stages = dict(stages)
+    trace.total = total
+    return trace
+
+
+def with_speed(preprocess, inference, postprocess):
+    return Detections(
+        boxes=np.zeros((0, 4), dtype=np.float32), scores=np.zeros(0, dtype=np.float32),
+        classes=np.zeros(0, dtype=np.int64), names={0: "car"},
+        speed={"preprocess": preprocess, "inference": inference, "postprocess": postprocess},
+    )
+
+
+def test_stage_timer_report():
+    timer = StageTimer()
+    timer.add("décodage", 0.5, 10)
+    timer.add("inférence", 1.0, 4)
+    timer.add("décodage", 0.5, 10)
+    rows = {row["Étape"]: row for row in timer.report()}
+    assert list(rows) == ["décodage", "inférence"]
+    assert rows["décodage"]["Éléments"] == 20
+    assert rows["décodage"]["ms / élément"] == pytest.approx(50.0)
+    assert rows["inférence"]["Éléments / s"] == pytest.approx(4.0)
+    assert "inférence" in timer.format_report()
+
+
+def test_request_trace_collects_nested_stages():
+    recorder = LatencyRecorder()
+
+    @timed("post-traitement")
+    def work():
+        add_stage("attente", 0.002)
+
+    with request_trace(recorder, enabled=True) as trace:
+        with stage("lecture"):
+            pass
+        work()
+        work()
+    assert list(trace.stages) == ["lecture", "attente", "post-traitement"]
+    assert trace.stages["attente"] == pytest.approx(0.004)
+    assert trace.total > 0
+    assert {row["Étape"] for row in recorder.percentiles()} == {
+        "lecture", "post-traitement", "attente", "total",
+    }
+
+
+def test_stages_outside_a_request_are_ignored():
+    recorder = LatencyRecorder()
+    with stage("lecture"):
+        pass
+    add_stage("attente", 1.0)
+    assert timed("calcul")(lambda: 42)() == 42
+    with request_trace(recorder, enabled=False) as trace:
+        assert trace is None
+    # Requête sans étape chronométrée : rien d'enregistré
+    with request_trace(recorder, enabled=True):
+        pass
+    assert recorder.percentiles() == []
+
+
+def test_traces_are_isolated_between_threads():
+    stages = {}
+
+    def handle(name):
+        with request_trace(None, enabled=True) as trace:
+            with stage(name):
+                pass
+        stages[name] = list(trace.stages)
+
+    threads = [threading.Thread(target=handle, args=(name,)) for name in ("a", "b", "c")]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert stages == {"a": ["a"], "b": ["b"], "c": ["c"]}
+
+
+def test_model_stages_split_elapsed_time():
+    with request_trace(None, enabled=True) as trace:
+        add_model_stages([with_speed(2.0, 10.0, 3.0), with_speed(2.0, 10.0, 3.0)], elapsed=0.05)
+    assert trace.stages["inférence"] == pytest.approx(0.02)
+    assert trace.stages["attente du modèle"] == pytest.approx(0.05 - 0.03)
+
+
+def test_latency_recorder_percentiles_histograms_and_export(tmp_path):
+    recorder = LatencyRecorder(max_samples=3)
+    for ms in (1, 3, 30, 300):
+        recorder.record(trace_of(ms / 1000, modèle=ms / 1000))
+    (row,) = [row for row in recorder.percentiles() if row["Étape"] == "modèle"]
+    assert row["Requêtes"] == 3 and row["max (ms)"] == pytest.approx(300)
+    histogram = recorder.histograms()["modèle"]
+    assert len(histogram) == len(LATENCY_BUCKETS_MS) + 1 and sum(histogram) == 3
+    # Les effectifs cumulés gardent toutes les requêtes depuis le démarrage
+    counts, total = recorder.cumulative()["modèle"]
+    assert sum(counts) == 4 and total == pytest.approx(0.334)
+    path = tmp_path / "latences.json"
+    recorder.export(str(path))
+    assert json.loads(path.read_text(encoding="utf-8"))["buckets_ms"] == list(LATENCY_BUCKETS_MS)
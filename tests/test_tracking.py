@@ -0,0 +1,79 @@
+"""
+Tests du suivi des véhicules
+Fichier : tests/test_tracking.py
+"""
+
+import numpy as np
+
+from detection import Detections
+from tracking import Tracker
+
+NAMES = {0: "voiture"}
+
+
+def frame(*boxes, score=0.9):
+    """Détections d'une image : une boîte xyxy par véhicule, tous de classe 0"""
+    boxes = np.array(boxes, dtype=np.float32).reshape(-1, 4)
+    return Detections(
+        boxes=boxes,
+        scores=np.full(len(boxes), score, dtype=np.float32),
+        classes=np.zeros(len(boxes), dtype=np.int64),
+        names=NAMES,
+    )
+
+
+def moving_box(step, x0=0.0, y=100.0, speed=5.0):
+    x = x0 + speed * step
+    return (x, y, x + 40.0, y + 30.0)
+
+
+def test_ids_are_stable_while_vehicles_move():
+    tracker = Tracker()
+    ids = []
+    for step in range(10):
+        tracks = tracker.update(frame(moving_box(step), moving_box(step, x0=300.0)))
+        ids.append(sorted(tracks.ids.tolist()))
+    assert ids[0] == [1, 2]
+    assert all(frame_ids == [1, 2] for frame_ids in ids)
+
+
+def test_id_survives_missed_frames():
+    """Le filtre de Kalman prolonge la trajectoire : la piste est retrouvée après des images vides"""
+    tracker = Tracker()
+    for step in range(5):
+        tracker.update(frame(moving_box(step)))
+    for step in range(5, 10):
+        assert len(tracker.update(frame()).ids) == 0
+    tracks = tracker.update(frame(moving_box(10)))
+    assert tracks.ids.tolist() == [1]
+
+
+def test_lost_track_is_dropped_after_buffer():
+    tracker = Tracker(track_buffer=3)
+    for step in range(3):
+        tracker.update(frame(moving_box(step, speed=0.0)))
+    for _ in range(4):
+        tracker.update(frame())
+    assert len(tracker) == 0
+    # Nouvelle piste, affichée une fois confirmée par une deuxième association
+    assert len(tracker.update(frame(moving_box(0, speed=0.0))).ids) == 0
+    assert tracker.update(frame(moving_box(0, speed=0.0))).ids.tolist() == [2]
+
+
+def test_low_score_detection_keeps_existing_track_only():
+    """Une détection faible prolonge une piste suivie mais n'en crée pas"""
+    tracker = Tracker()
+    tracker.update(frame(moving_box(0)))
+    tracks = tracker.update(frame(moving_box(1), score=0.3))
+    assert tracks.ids.tolist() == [1]
+    tracks = tracker.update(frame(moving_box(2), (500.0, 500.0, 540.0, 530.0), score=0.3))
+    assert tracks.ids.tolist() == [1]
+
+
+def test_propagate_moves_tracks_without_detections():
+    tracker = Tracker()
+    for step in range(5):
+        tracker.update(frame(moving_box(step)))
+    before = tracker.propagate(0).boxes[0, 0]
+    after = tracker.propagate(2).boxes[0, 0]
+    assert after > before
@@ -0,0 +1,93 @@
+"""
+Tests de la lecture et de l'analyse des vidéos
+Fichier : tests/test_video.py
+"""
+
+import cv2
+import numpy as np
+import pytest
+
+from detection import Detections
+from timing import StageTimer
+from video import detect_video, frame_stride, read_frames, track_video, video_info
+
+FRAMES, FPS, WIDTH, HEIGHT = 12, 10.0, 320, 240
+
+
+@pytest.fixture
+def video_path(tmp_path):
+    """Courte vidéo : un carré blanc qui avance de 4 pixels par image"""
+    path = str(tmp_path / "route.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), FPS, (WIDTH, HEIGHT))
+    for index in range(FRAMES):
+        frame = np.zeros((HEIGHT, WIDTH, 3), dtype=np.uint8)
+        x = 40 + 4 * index
+        frame[100:140, x:x + 40] = 255
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+class FakeBatch:
+    """run_batch factice : une boîte autour des pixels clairs de chaque image"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, images, batch_size, **params):
+        self.calls.append((len(images), params))
+        detections = []
+        for image in images:
+            ys, xs = np.nonzero(image[..., 0] > 128)
+            detections.append(Detections(
+                boxes=np.array([[xs.min(), ys.min(), xs.max() + 1, ys.max() + 1]], dtype=np.float32),
+                scores=np.array([0.9], dtype=np.float32),
+                classes=np.array([0], dtype=np.int64),
+                names={0: "car"},
+                speed={"preprocess": 1.0, "inference": 8.0, "postprocess": 1.0},
+            ))
+        return detections
+
+
+def test_video_info(video_path):
+    assert video_info(video_path) == {"frames": FRAMES, "fps": FPS, "width": WIDTH, "height": HEIGHT}
+    with pytest.raises(ValueError):
+        video_info(video_path + ".absente")
+
+
+def test_frame_stride():
+    assert frame_stride(30, stride=3) == 3
+    assert frame_stride(30, stride=3, target_fps=5) == 6
+    assert frame_stride(10, target_fps=30) == 1
+    assert frame_stride(25, stride=0) == 1
+
+
+def test_detect_video_batches_sampled_frames(video_path):
+    run_batch, timer = FakeBatch(), StageTimer()
+    results = list(detect_video(run_batch, video_path, stride=2, batch_size=4, timer=timer, imgsz=320))
+    assert [r.index for r in results] == [0, 2, 4, 6, 8, 10]
+    assert [r.timestamp for r in results] == pytest.approx([0.0, 0.2, 0.4, 0.6, 0.8, 1.0])
+    assert [n for n, _ in run_batch.calls] == [4, 2]
+    assert run_batch.calls[0][1] == {"channels": "BGR", "imgsz": 320}
+    assert all(r.inferred and len(r.detections) == 1 for r in results)
+    assert results[1].detections.boxes[0, 0] == pytest.approx(48, abs=2)
+    stages = {row["Étape"] for row in timer.report()}
+    assert {"décodage", "prétraitement", "inférence", "post-traitement"} <= stages
+
+
+def test_track_video_propagates_between_detections(video_path):
+    run_batch = FakeBatch()
+    results = list(track_video(run_batch, video_path, detect_every=3, batch_size=2))
+    assert len(results) == FRAMES
+    assert [r.inferred for r in results] == [index % 3 == 0 for index in range(FRAMES)]
+    assert sum(n for n, _ in run_batch.calls) == 4
+    # Piste confirmée à la deuxième détection, puis identifiant stable
+    ids = [r.detections.ids.tolist() for r in results[3:]]
+    assert ids == [[1]] * (FRAMES - 3)
+
+
+def test_read_frames_stops_early(video_path):
+    frames = read_frames(video_path, queue_size=2)
+    index, _, frame = next(frames)
+    assert index == 0 and frame.shape == (HEIGHT, WIDTH, 3)
+    frames.close()
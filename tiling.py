@@ -0,0 +1,107 @@
+"""
+Inférence par tuiles pour les images haute résolution (vues aériennes, autoroutes)
+Fichier : tiling.py
+"""
+
+import numpy as np
+
+from backends import nms
+from detection import IOU, Detections, box_iou
+
+# Taille des tuiles (pixels) et recouvrement relatif entre tuiles voisines
+TILE_SIZE = 640
+TILE_OVERLAP = 0.2
+
+# Méthodes de fusion des détections des tuiles
+MERGE_METHODS = ("nms", "wbf")
+
+# Seuil IoU de fusion des détections d'un même objet vu par plusieurs tuiles
+MERGE_IOU = 0.5
+
+
+def tile_starts(length, tile, overlap):
+    """Positions de départ des tuiles sur un axe ; la dernière est calée sur le bord"""
+    if length <= tile:
+        return [0]
+    step = max(1, int(tile * (1 - overlap)))
+    starts = list(range(0, length - tile, step))
+    return starts + [length - tile]
+
+
+def tile_windows(shape, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+    """Fenêtres (x0, y0, x1, y1) qui couvrent l'image avec le recouvrement demandé"""
+    height, width = shape[:2]
+    return [
+        (x0, y0, min(x0 + tile, width), min(y0 + tile, height))
+        for y0 in tile_starts(height, tile, overlap)
+        for x0 in tile_starts(width, tile, overlap)
+    ]
+
+
+def weighted_box_fusion(detections, iou_threshold=MERGE_IOU):
+    """Fusion pondérée des boîtes (WBF) : chaque groupe de boîtes d'une même classe
+    qui se recouvrent devient une boîte moyenne pondérée par les scores, au score maximal"""
+    order = np.argsort(-detections.scores, kind="stable")
+    boxes, scores, classes = detections.boxes[order], detections.scores[order], detections.classes[order]
+    remaining = np.ones(len(scores), dtype=bool)
+    fused_boxes, fused_scores, fused_classes = [], [], []
+    for i in range(len(scores)):
+        if not remaining[i]:
+            continue
+        overlaps = box_iou(boxes[i:i + 1], boxes)[0]
+        group = remaining & (classes == classes[i]) & (overlaps >= iou_threshold)
+        group[i] = True
+        weights = scores[group]
+        fused_boxes.append((boxes[group] * weights[:, None]).sum(axis=0) / weights.sum())
+        fused_scores.append(scores[i])
+        fused_classes.append(classes[i])
+        remaining &= ~group
+    return Detections(
+        boxes=np.array(fused_boxes, dtype=np.float32).reshape(-1, 4),
+        scores=np.array(fused_scores, dtype=np.float32),
+        classes=np.array(fused_classes, dtype=np.int64),
+        names=detections.names,
+        speed=detections.speed,
+    )
+
+
+def merge_detections(parts, method="nms", iou_threshold=MERGE_IOU):
+    """Regroupe des Détections déjà dans le repère de l'image et supprime les doublons"""
+    merged = Detections(
+        boxes=np.concatenate([d.boxes for d in parts]).reshape(-1, 4),
+        scores=np.concatenate([d.scores for d in parts]),
+        classes=np.concatenate([d.classes for d in parts]),
+        names=parts[0].names,
+        # Durées cumulées sur toutes les tuiles de l'image
+        speed={key: sum(d.speed.get(key, 0.0) for d in parts) for key in parts[0].speed},
+    )
+    if method == "wbf":
+        return weighted_box_fusion(merged, iou_threshold)
+    keep = nms(merged.boxes, merged.scores, merged.classes, iou_threshold)
+    return Detections(
+        merged.boxes[keep], merged.scores[keep], merged.classes[keep], merged.names, merged.speed
+    )
+
+
+def predict_tiled(run_batch, image, tile=TILE_SIZE, overlap=TILE_OVERLAP, batch_size=8,
+                  merge="nms", include_full=True, iou=IOU, **params):
+    """Détection par tuiles recouvrantes envoyées en lots, puis fusion dans le repère de l'image
+
+    Les tuiles sont des vues du tableau décodé (aucune copie). L'image entière
+    réduite est ajoutée au lot si `include_full` : les grands véhicules coupés
+    par les tuiles restent détectés. `run_batch(images, batch_size, **params)`
+    exécute le modèle (ex. `MicroBatcher.run_batch`).
+    """
+    windows = tile_windows(image.shape, tile, overlap)
+    if len(windows) == 1:
+        return run_batch([image], 1, iou=iou, **params)[0]
+
+    tiles = [image[y0:y1, x0:x1] for x0, y0, x1, y1 in windows]
+    results = run_batch(tiles, batch_size, iou=iou, **params)
+    parts = [
+        detections.to_original(1.0, (-x0, -y0), image.shape)
+        for (x0, y0, _, _), detections in zip(windows, results)
+    ]
+    if include_full:
+        parts += run_batch([image], 1, iou=iou, **params)
+    return merge_detections(parts, merge)
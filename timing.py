@@ -0,0 +1,267 @@
+"""
+Mesure du temps passé dans chaque étape du traitement
+Fichier : timing.py
+"""
+
+import atexit
+import bisect
+import functools
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+import numpy as np
+
+# Détail du temps de chaque requête (REQUEST_TIMING=0 pour désactiver)
+REQUEST_TIMING = os.environ.get("REQUEST_TIMING", "1") != "0"
+
+# Nombre de requêtes récentes conservées par étape pour les percentiles
+LATENCY_SAMPLES = int(os.environ.get("LATENCY_SAMPLES", "10000"))
+
+# Fichier JSON où exporter percentiles et histogrammes à la fin du processus
+REQUEST_TIMING_EXPORT = os.environ.get("REQUEST_TIMING_EXPORT")
+
+# Bornes supérieures (ms) des classes des histogrammes exportés
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+# Étapes internes d'ultralytics (clés de `result.speed`)
+SPEED_STAGES = (("prétraitement", "preprocess"), ("inférence", "inference"),
+                ("post-traitement", "postprocess"))
+
+_current_trace = ContextVar("request_trace", default=None)
+_NO_STAGE = nullcontext()
+
+
+class StageTimer:
+    """Cumule le temps et le nombre d'éléments traités par étape (thread-safe)"""
+
+    def __init__(self):
+        self._totals = defaultdict(float)
+        self._counts = defaultdict(int)
+        self._order = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name, count=1):
+        """Chronomètre un bloc et l'attribue à l'étape `name`"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, count)
+
+    def add(self, name, seconds, count=1):
+        """Ajoute une durée mesurée ailleurs (ex. `result.speed` d'ultralytics)"""
+        with self._lock:
+            if name not in self._totals:
+                self._order.append(name)
+            self._totals[name] += seconds
+            self._counts[name] += count
+
+    def report(self):
+        """Temps total, temps par élément et débit de chaque étape"""
+        with self._lock:
+            rows = []
+            for name in self._order:
+                total, count = self._totals[name], self._counts[name]
+                rows.append({
+                    "Étape": name,
+                    "Éléments": count,
+                    "Temps total (s)": total,
+                    "ms / élément": 1000 * total / count if count else 0.0,
+                    "Éléments / s": count / total if total else 0.0,
+                })
+            return rows
+
+    def format_report(self):
+        """Rapport texte pour la ligne de commande"""
+        lines = [f"{'Étape':<20}{'Éléments':>10}{'Total (s)':>12}{'ms/élém.':>11}{'élém./s':>10}"]
+        for row in self.report():
+            lines.append(
+                f"{row['Étape']:<20}{row['Éléments']:>10}{row['Temps total (s)']:>12.2f}"
+                f"{row['ms / élément']:>11.2f}{row['Éléments / s']:>10.1f}"
+            )
+        return "\n".join(lines)
+
+
+class RequestTrace:
+    """Durées des étapes d'une requête, dans l'ordre d'exécution
+
+    Les étapes sont chronométrées par `stage()` ou `@timed()` dans le code
+    appelé pendant `request_trace()`, sans avoir à transmettre la trace.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self._start = time.perf_counter()
+        self.total = 0.0
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self):
+        self.total = time.perf_counter() - self._start
+
+    def report(self):
+        """Temps de chaque étape et part du temps total de la requête"""
+        total = self.total or time.perf_counter() - self._start
+        stages = dict(self.stages)
+        other = total - sum(stages.values())
+        if other > 0:
+            stages["autre"] = other
+        return [
+            {"Étape": name, "Temps (ms)": 1000 * seconds,
+             "Part (%)": 100 * seconds / total if total else 0.0}
+            for name, seconds in stages.items()
+        ]
+
+
+class LatencyRecorder:
+    """Durées par étape des dernières requêtes : percentiles et histogrammes (thread-safe)
+
+    Les percentiles portent sur les `max_samples` dernières requêtes ; les
+    effectifs cumulés depuis le démarrage alimentent les métriques Prometheus.
+    """
+
+    def __init__(self, max_samples=LATENCY_SAMPLES):
+        self.max_samples = max_samples
+        self._samples = {}
+        self._cumulative = {}
+        self._lock = threading.Lock()
+
+    def record(self, trace):
+        with self._lock:
+            for name, seconds in (*trace.stages.items(), ("total", trace.total)):
+                if name not in self._samples:
+                    self._samples[name] = deque(maxlen=self.max_samples)
+                    self._cumulative[name] = [[0] * (len(LATENCY_BUCKETS_MS) + 1), 0.0]
+                self._samples[name].append(seconds)
+                counts = self._cumulative[name]
+                counts[0][bisect.bisect_left(LATENCY_BUCKETS_MS, 1000 * seconds)] += 1
+                counts[1] += seconds
+
+    def cumulative(self):
+        """Effectifs par classe de durée et somme des durées (s) depuis le démarrage"""
+        with self._lock:
+            return {name: (list(counts), total) for name, (counts, total) in self._cumulative.items()}
+
+    def _snapshot(self):
+        with self._lock:
+            return {name: np.array(samples) * 1000 for name, samples in self._samples.items()}
+
+    def percentiles(self):
+        """p50 / p95 / p99 de chaque étape, en millisecondes"""
+        rows = []
+        for name, samples in self._snapshot().items():
+            p50, p95, p99 = np.percentile(samples, (50, 95, 99))
+            rows.append({
+                "Étape": name,
+                "Requêtes": len(samples),
+                "p50 (ms)": float(p50),
+                "p95 (ms)": float(p95),
+                "p99 (ms)": float(p99),
+                "max (ms)": float(samples.max()),
+            })
+        return rows
+
+    def histograms(self, buckets=LATENCY_BUCKETS_MS):
+        """Effectifs par classe de durée (bornes supérieures en ms, dernière classe ouverte)"""
+        edges = np.array(buckets, dtype=np.float64)
+        return {
+            name: np.bincount(np.searchsorted(edges, samples, side="left"),
+                              minlength=len(edges) + 1).tolist()
+            for name, samples in self._snapshot().items()
+        }
+
+    def export(self, path=None):
+        """Percentiles et histogrammes en JSON (écrits dans `path` s'il est fourni)"""
+        data = json.dumps({
+            "buckets_ms": list(LATENCY_BUCKETS_MS),
+            "percentiles": self.percentiles(),
+            "histograms": self.histograms(),
+        }, ensure_ascii=False, indent=2)
+        if path is not None:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(data)
+        return data
+
+
+# Durées des requêtes de détection du processus (interfaces et API)
+REQUEST_LATENCIES = LatencyRecorder()
+if REQUEST_TIMING_EXPORT:
+    atexit.register(REQUEST_LATENCIES.export, REQUEST_TIMING_EXPORT)
+
+
+@contextmanager
+def request_trace(recorder=REQUEST_LATENCIES, enabled=REQUEST_TIMING):
+    """Trace la requête en cours ; donne None si le détail est désactivé"""
+    if not enabled:
+        yield None
+        return
+    trace = RequestTrace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        trace.finish()
+        # Affichage sans aucune étape chronométrée (page sans image) : rien à enregistrer
+        if recorder is not None and trace.stages:
+            recorder.record(trace)
+
+
+def stage(name):
+    """Chronomètre un bloc dans la requête en cours ; sans effet hors requête"""
+    trace = _current_trace.get()
+    return _NO_STAGE if trace is None else trace.stage(name)
+
+
+def add_stage(name, seconds):
+    """Ajoute à la requête en cours une durée mesurée ailleurs"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def add_model_stages(detections_list, elapsed):
+    """Répartit le temps d'un appel au modèle entre les étapes d'ultralytics
+
+    `elapsed` est la durée observée par l'appelant : l'écart avec les durées
+    internes (file du planificateur de lots, conversions) forme l'étape
+    « attente du modèle ».
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return
+    model = 0.0
+    for stage_name, key in SPEED_STAGES:
+        seconds = sum(d.speed.get(key, 0.0) for d in detections_list) / 1000
+        trace.add(stage_name, seconds)
+        model += seconds
+    trace.add("attente du modèle", max(0.0, elapsed - model))
+
+
+def timed(name):
+    """Décorateur : chronomètre chaque appel comme étape de la requête en cours"""
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            trace = _current_trace.get()
+            if trace is None:
+                return function(*args, **kwargs)
+            with trace.stage(name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
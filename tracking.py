@@ -0,0 +1,207 @@
+"""
+Suivi des véhicules d'une image à l'autre (association type ByteTrack, CPU)
+Fichier : tracking.py
+"""
+
+import numpy as np
+
+from detection import Detections, box_iou
+
+# Détections associées en premier, puis détections faibles (deuxième passe ByteTrack)
+TRACK_HIGH_THRESH = 0.5
+TRACK_LOW_THRESH = 0.1
+
+# Score minimal d'une détection non associée pour créer une nouvelle piste
+NEW_TRACK_THRESH = 0.6
+
+# IoU minimal d'association : première passe, puis détections faibles
+MATCH_IOU = 0.2
+LOW_MATCH_IOU = 0.5
+
+# Nombre d'images sans association avant l'abandon d'une piste
+TRACK_BUFFER = 30
+
+# Écarts-types du filtre de Kalman, relatifs à la taille de la boîte
+STD_POSITION = 1 / 20
+STD_VELOCITY = 1 / 160
+
+
+def to_cxcywh(boxes):
+    """Boîtes xyxy -> centre, largeur, hauteur"""
+    return np.concatenate([(boxes[:, :2] + boxes[:, 2:]) / 2, boxes[:, 2:] - boxes[:, :2]], axis=1)
+
+
+def to_xyxy(boxes):
+    """Boîtes centre, largeur, hauteur -> xyxy"""
+    half = boxes[:, 2:4] / 2
+    return np.concatenate([boxes[:, :2] - half, boxes[:, :2] + half], axis=1)
+
+
+def _box_std(sizes, weight):
+    """Écarts-types (cx, cy, w, h) proportionnels à la largeur et à la hauteur de chaque piste"""
+    return weight * np.concatenate([sizes, sizes], axis=1)
+
+
+class KalmanBoxes:
+    """Filtre de Kalman à vitesse constante sur (cx, cy, w, h), vectorisé sur toutes les pistes
+
+    État (N, 8) : position, taille et leurs vitesses en pixels par image ;
+    covariances (N, 8, 8).
+    """
+
+    @staticmethod
+    def initiate(measurements):
+        mean = np.concatenate([measurements, np.zeros_like(measurements)], axis=1)
+        sizes = measurements[:, 2:4]
+        std = np.concatenate([_box_std(sizes, 2 * STD_POSITION), _box_std(sizes, 10 * STD_VELOCITY)], axis=1)
+        return mean, std[:, :, None] ** 2 * np.eye(8)
+
+    @staticmethod
+    def predict(mean, cov, dt=1):
+        """Avance l'état de `dt` images"""
+        transition = np.eye(8)
+        transition[:4, 4:] = dt * np.eye(4)
+        sizes = mean[:, 2:4]
+        std = np.concatenate([_box_std(sizes, STD_POSITION), _box_std(sizes, STD_VELOCITY)], axis=1)
+        noise = dt * std[:, :, None] ** 2 * np.eye(8)
+        return mean @ transition.T, transition @ cov @ transition.T + noise
+
+    @staticmethod
+    def update(mean, cov, measurements):
+        """Corrige l'état avec les boîtes mesurées (une mesure par piste)"""
+        noise = _box_std(mean[:, 2:4], STD_POSITION)[:, :, None] ** 2 * np.eye(4)
+        innovation_cov = cov[:, :4, :4] + noise
+        # Gain K = P Hᵀ S⁻¹, avec H qui extrait les 4 premières composantes
+        gain = np.linalg.solve(innovation_cov, cov[:, :4, :]).transpose(0, 2, 1)
+        mean = mean + (gain @ (measurements - mean[:, :4])[:, :, None])[:, :, 0]
+        cov = cov - gain @ innovation_cov @ gain.transpose(0, 2, 1)
+        return mean, cov
+
+
+def associate(track_boxes, track_classes, boxes, classes, min_iou):
+    """Affectation optimale (hongroise) pistes/détections de même classe ; retourne les couples"""
+    if len(track_boxes) == 0 or len(boxes) == 0:
+        return np.empty((0, 2), dtype=np.int64)
+    from scipy.optimize import linear_sum_assignment
+
+    iou = box_iou(track_boxes, boxes)
+    iou[track_classes[:, None] != classes[None, :]] = 0.0
+    rows, cols = linear_sum_assignment(1.0 - iou)
+    keep = iou[rows, cols] >= min_iou
+    return np.stack([rows[keep], cols[keep]], axis=1)
+
+
+class Tracker:
+    """Pistes persistantes construites sur les détections de chaque image (style ByteTrack)
+
+    `update` associe les détections d'une image analysée ; `propagate` fait
+    avancer les pistes avec le modèle de mouvement sur les images sautées,
+    sans inférence. Chaque véhicule garde son identifiant et sa classe.
+    """
+
+    def __init__(self, high_thresh=TRACK_HIGH_THRESH, low_thresh=TRACK_LOW_THRESH,
+                 new_track_thresh=NEW_TRACK_THRESH, match_iou=MATCH_IOU,
+                 low_match_iou=LOW_MATCH_IOU, track_buffer=TRACK_BUFFER):
+        self.high_thresh = high_thresh
+        self.low_thresh = low_thresh
+        self.new_track_thresh = new_track_thresh
+        self.match_iou = match_iou
+        self.low_match_iou = low_match_iou
+        self.track_buffer = track_buffer
+        self.names = {}
+        self.next_id = 1
+        self.steps = 0
+        self.mean = np.zeros((0, 8))
+        self.cov = np.zeros((0, 8, 8))
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.classes = np.zeros(0, dtype=np.int64)
+        self.scores = np.zeros(0, dtype=np.float32)
+        self.missed = np.zeros(0, dtype=np.int64)      # images depuis la dernière association
+        self.confirmed = np.zeros(0, dtype=bool)       # associée au moins deux fois
+
+    def __len__(self):
+        return len(self.ids)
+
+    def propagate(self, dt=1):
+        """Pistes actives prédites `dt` images plus tard, sans nouvelle détection"""
+        if len(self):
+            self.mean, self.cov = KalmanBoxes.predict(self.mean, self.cov, dt)
+        return self._output(self.confirmed & (self.missed == 0))
+
+    def update(self, detections, dt=1):
+        """Associe les détections d'une image analysée (`dt` images après l'étape précédente)"""
+        self.names = detections.names
+        if len(self):
+            self.mean, self.cov = KalmanBoxes.predict(self.mean, self.cov, dt)
+        first_step = self.steps == 0
+        self.steps += 1
+
+        scores, classes = detections.scores, detections.classes
+        high = np.flatnonzero(scores >= self.high_thresh)
+        low = np.flatnonzero((scores >= self.low_thresh) & (scores < self.high_thresh))
+        track_boxes = to_xyxy(self.mean[:, :4])
+        matched = np.zeros(len(self), dtype=bool)
+        track_idx, det_idx = [], []
+
+        # 1re passe : toutes les pistes (y compris perdues) face aux détections sûres
+        pairs = associate(track_boxes, self.classes, detections.boxes[high], classes[high], self.match_iou)
+        track_idx.append(pairs[:, 0])
+        det_idx.append(high[pairs[:, 1]])
+        matched[pairs[:, 0]] = True
+        unmatched_high = np.setdiff1d(high, high[pairs[:, 1]])
+
+        # 2e passe : pistes suivies à l'étape précédente face aux détections faibles
+        remaining = np.flatnonzero(~matched & (self.missed == 0))
+        pairs = associate(
+            track_boxes[remaining], self.classes[remaining], detections.boxes[low], classes[low],
+            self.low_match_iou,
+        )
+        track_idx.append(remaining[pairs[:, 0]])
+        det_idx.append(low[pairs[:, 1]])
+        matched[remaining[pairs[:, 0]]] = True
+
+        track_idx, det_idx = np.concatenate(track_idx), np.concatenate(det_idx)
+        if len(track_idx):
+            self.mean[track_idx], self.cov[track_idx] = KalmanBoxes.update(
+                self.mean[track_idx], self.cov[track_idx], to_cxcywh(detections.boxes[det_idx])
+            )
+            self.scores[track_idx] = scores[det_idx]
+            self.confirmed[track_idx] = True
+        self.missed[matched] = 0
+        self.missed[~matched] += dt
+
+        # Pistes non confirmées manquées une fois ou pistes perdues trop longtemps : supprimées
+        keep = (self.confirmed | matched) & (self.missed <= self.track_buffer)
+        self._select(keep)
+
+        new = unmatched_high[scores[unmatched_high] >= self.new_track_thresh]
+        self._start(detections.boxes[new], classes[new], scores[new], confirmed=first_step)
+
+        output = self._output(self.confirmed & (self.missed == 0))
+        output.speed = detections.speed
+        return output
+
+    def _select(self, keep):
+        for name in ("mean", "cov", "ids", "classes", "scores", "missed", "confirmed"):
+            setattr(self, name, getattr(self, name)[keep])
+
+    def _start(self, boxes, classes, scores, confirmed):
+        mean, cov = KalmanBoxes.initiate(to_cxcywh(boxes))
+        count = len(boxes)
+        self.mean = np.concatenate([self.mean, mean])
+        self.cov = np.concatenate([self.cov, cov])
+        self.ids = np.concatenate([self.ids, np.arange(self.next_id, self.next_id + count)])
+        self.classes = np.concatenate([self.classes, classes])
+        self.scores = np.concatenate([self.scores, scores])
+        self.missed = np.concatenate([self.missed, np.zeros(count, dtype=np.int64)])
+        self.confirmed = np.concatenate([self.confirmed, np.full(count, confirmed)])
+        self.next_id += count
+
+    def _output(self, mask):
+        return Detections(
+            boxes=to_xyxy(self.mean[mask, :4]).astype(np.float32),
+            scores=self.scores[mask],
+            classes=self.classes[mask],
+            names=self.names,
+            ids=self.ids[mask],
+        )
@@ -0,0 +1,317 @@
+"""
+Composants Streamlit partagés pour l'affichage des résultats
+Fichier : ui.py
+"""
+
+import math
+import time
+
+import numpy as np
+import streamlit as st
+
+from counting import EVENT_COLUMNS, CrossingCounter, build_counters
+from detection import DEFAULT_PROFILE, PROFILE_LABELS, PROFILES, summarize, to_dataframe
+from motion import MotionGate
+from render import IMAGE_FORMATS, draw_detections, encode_image
+from timing import REQUEST_LATENCIES, StageTimer, stage
+from video import detect_video, track_video, video_info
+
+# Intervalle minimal entre deux rafraîchissements de l'aperçu vidéo (s)
+VIDEO_REFRESH_INTERVAL = 0.2
+
+# Formatage des colonnes numériques du tableau des détections
+DISPLAY_FORMATS = {
+    "Confiance": "{:.2%}",
+    "X_min": "{:.0f}",
+    "Y_min": "{:.0f}",
+    "X_max": "{:.0f}",
+    "Y_max": "{:.0f}",
+}
+
+
+def profile_option():
+    """Choix du profil vitesse / précision dans la barre latérale"""
+    return st.selectbox(
+        "Profil vitesse / précision",
+        list(PROFILES),
+        index=list(PROFILES).index(DEFAULT_PROFILE),
+        format_func=PROFILE_LABELS.get,
+        help="Taille d'entrée du modèle : 320 pour les petites images de bord de route, "
+             "640 ou 960 pour les vues larges d'autoroute"
+    )
+
+
+def image_output_options():
+    """Options de la barre latérale pour l'encodage de l'image annotée"""
+    image_format = st.selectbox(
+        "Format de l'image annotée",
+        IMAGE_FORMATS,
+        help="Encodage unique avant l'envoi au navigateur (PNG : sans perte, plus lourd)"
+    )
+    quality = st.slider(
+        "Qualité d'encodage",
+        min_value=50,
+        max_value=100,
+        value=85,
+        step=5,
+        disabled=image_format == "PNG",
+    )
+    return image_format, quality
+
+
+def show_results(image, detections, conf_threshold, image_format="JPEG", quality=85,
+                 display_scale=1.0):
+    """Affiche l'image annotée, le tableau et les statistiques pour un seuil donné
+
+    `display_scale` : échelle de `image` par rapport à l'image d'origine, dans
+    le repère de laquelle sont exprimées les détections (décodage réduit).
+    """
+    # Filtrage vectorisé des détections en cache : pas de nouvelle inférence
+    filtered = detections.filter(conf_threshold)
+
+    # Afficher l'image avec détections, dessinée en mémoire
+    drawn = filtered.to_original(1 / display_scale) if display_scale != 1.0 else filtered
+    result_img = encode_image(draw_detections(image, drawn), image_format, quality)
+    with stage("affichage de l'image"):
+        st.image(result_img, caption="Image avec détections", use_container_width=True)
+
+    # Nombre de détections
+    num_detections = len(filtered)
+
+    if num_detections == 0:
+        st.warning("⚠️ Aucun objet détecté. Essayez de réduire le seuil de confiance.")
+        return
+
+    st.success(f"✅ {num_detections} objet(s) détecté(s)")
+
+    # Créer un DataFrame avec les détections
+    st.subheader("📋 Détails des détections")
+
+    # Afficher le tableau (le formatage n'est appliqué qu'à l'affichage)
+    df = to_dataframe(filtered)
+    with stage("affichage du tableau"):
+        st.dataframe(df.style.format(DISPLAY_FORMATS), use_container_width=True)
+
+    # Statistiques par classe
+    st.subheader("📈 Statistiques")
+    with stage("graphique"):
+        class_counts = df['Classe'].value_counts()
+        st.bar_chart(class_counts)
+
+    # Métriques
+    col_m1, col_m2, col_m3 = st.columns(3)
+    with col_m1:
+        st.metric("Total détections", num_detections)
+    with col_m2:
+        avg_conf = df['Confiance'].mean()
+        st.metric("Confiance moyenne", f"{avg_conf:.2%}")
+    with col_m3:
+        st.metric("Classes différentes", len(class_counts))
+
+
+def show_batch_summary(file_names, detections_list, conf_threshold):
+    """Affiche le tableau récapitulatif d'un envoi de plusieurs images"""
+    summary = summarize(file_names, detections_list, conf_threshold)
+
+    st.subheader("🗂️ Récapitulatif")
+    col_m1, col_m2 = st.columns(2)
+    with col_m1:
+        st.metric("Images analysées", len(summary))
+    with col_m2:
+        st.metric("Total détections", int(summary["Total"].sum()))
+
+    st.dataframe(
+        summary.style.format({"Confiance moyenne": "{:.2%}"}, na_rep="-"),
+        use_container_width=True,
+        hide_index=True,
+    )
+    class_totals = summary.drop(columns=["Image", "Total", "Confiance moyenne"]).sum()
+    st.bar_chart(class_totals[class_totals > 0])
+
+
+def show_video_analysis(run_batch, video_path, stride, conf_threshold, params,
+                        image_format="JPEG", quality=85, tracking=False, detect_every=1,
+                        lines=(), zones=(), motion_gate=False):
+    """Analyse une vidéo et affiche les résultats au fur et à mesure
+
+    Avec `tracking`, les véhicules sont suivis d'une image à l'autre : chacun
+    n'est compté qu'une fois, et le modèle ne tourne que sur une image lue
+    sur `detect_every`. Les `lines` et `zones` (voir `counting.parse_points`)
+    comptent alors les passages de chaque véhicule. Avec `motion_gate`, les
+    images sans mouvement (caméra fixe) reprennent les détections précédentes.
+    """
+    info = video_info(video_path)
+    expected_frames = max(1, math.ceil(info["frames"] / stride))
+    st.caption(
+        f"{info['frames']} images à {info['fps']:.1f} i/s ({info['width']}x{info['height']}) "
+        f"- analyse d'une image sur {stride}"
+    )
+
+    progress = st.progress(0.0, text="Analyse en cours...")
+    frame_placeholder = st.empty()
+    metrics_placeholder = st.empty()
+    chart_placeholder = st.empty()
+
+    counter = None
+    if lines or zones:
+        if tracking:
+            try:
+                counter = CrossingCounter(
+                    build_counters(lines, zones, info["width"], info["height"])
+                )
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                return
+            st.subheader("🚦 Comptage")
+            counts_placeholder = st.empty()
+            events = []
+        else:
+            st.warning("⚠️ Le comptage par ligne ou zone nécessite le suivi des véhicules.")
+
+    timer = StageTimer()
+    gate = MotionGate() if motion_gate else None
+    names = None
+    class_totals = None
+    track_classes = {}
+    last_refresh = 0.0
+    processed = 0
+    start = time.perf_counter()
+
+    if tracking:
+        results = track_video(
+            run_batch, video_path, stride, detect_every, timer=timer, gate=gate, **params
+        )
+    else:
+        results = detect_video(run_batch, video_path, stride, timer=timer, gate=gate, **params)
+    for result in results:
+        filtered = result.detections.filter(conf_threshold)
+        if names is None:
+            names = filtered.names
+            class_totals = np.zeros(len(names), dtype=np.int64)
+        if tracking:
+            # Un véhicule suivi n'est compté qu'une fois, quelle que soit sa durée à l'image
+            track_classes.update(zip(filtered.ids.tolist(), filtered.classes.tolist()))
+            class_totals = np.bincount(
+                np.fromiter(track_classes.values(), dtype=np.int64, count=len(track_classes)),
+                minlength=len(names),
+            )[:len(names)]
+        else:
+            class_totals += np.bincount(filtered.classes, minlength=len(names))[:len(names)]
+        if counter is not None:
+            # Toutes les pistes confirmées, quel que soit le seuil d'affichage : une piste
+            # associée à une détection faible (2e passe du suivi) reste comptée
+            with timer.stage("comptage"):
+                events.extend(counter.update(result.detections, result.timestamp, result.index))
+        processed += 1
+
+        # Aperçu rafraîchi à intervalle régulier pour ne pas saturer le navigateur
+        now = time.perf_counter()
+        if now - last_refresh >= VIDEO_REFRESH_INTERVAL or processed == expected_frames:
+            with timer.stage("rendu"):
+                annotated = draw_detections(result.frame, filtered, "BGR")
+                if counter is not None:
+                    counter.draw(annotated, "BGR")
+                    counts_placeholder.dataframe(
+                        counter.summary(),
+                        use_container_width=True,
+                        hide_index=True,
+                        column_config={
+                            "Véhicules / min": st.column_config.NumberColumn(format="%.1f"),
+                        },
+                    )
+                frame_placeholder.image(
+                    encode_image(annotated, image_format, quality, "BGR"),
+                    caption=f"Image {result.index} - {result.timestamp:.1f} s",
+                    use_container_width=True,
+                )
+                with metrics_placeholder.container():
+                    col_m1, col_m2, col_m3 = st.columns(3)
+                    col_m1.metric("Images analysées", processed)
+                    col_m2.metric(
+                        "Véhicules suivis" if tracking else "Détections (cumul)",
+                        int(class_totals.sum()),
+                    )
+                    col_m3.metric("Débit", f"{processed / (now - start):.1f} i/s")
+                    if gate is not None:
+                        st.caption(
+                            f"Filtre de mouvement : {gate.stats()['fraction sautée']:.0%} "
+                            "des images sans inférence"
+                        )
+                label = "Véhicules" if tracking else "Détections"
+                chart_placeholder.bar_chart(
+                    {label: {names[i]: int(count) for i, count in enumerate(class_totals)}}
+                )
+            last_refresh = now
+
+        progress.progress(
+            min(processed / expected_frames, 1.0),
+            text=f"Analyse en cours... {processed}/{expected_frames} images",
+        )
+
+    progress.progress(1.0, text=f"✅ {processed} image(s) analysée(s)")
+    if counter is not None:
+        import pandas as pd
+
+        st.download_button(
+            "📥 Télécharger les passages (CSV)",
+            pd.DataFrame(events, columns=EVENT_COLUMNS).to_csv(index=False),
+            file_name="passages.csv",
+            mime="text/csv",
+        )
+
+    # Débit de chaque étape du pipeline
+    st.subheader("⏱️ Débit par étape")
+    st.dataframe(
+        timer.report(),
+        use_container_width=True,
+        column_config={
+            "Temps total (s)": st.column_config.NumberColumn(format="%.2f"),
+            "ms / élément": st.column_config.NumberColumn(format="%.1f"),
+            "Éléments / s": st.column_config.NumberColumn(format="%.1f"),
+        },
+    )
+
+
+def show_request_timing(trace):
+    """Détail repliable du temps de la requête et percentiles des requêtes récentes"""
+    if trace is None:
+        return
+    with st.expander(f"⏱️ Temps de la requête : {1000 * trace.total:.0f} ms"):
+        st.dataframe(
+            trace.report(),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "Temps (ms)": st.column_config.NumberColumn(format="%.1f"),
+                "Part (%)": st.column_config.NumberColumn(format="%.0f"),
+            },
+        )
+        st.caption("Requêtes récentes du serveur")
+        st.dataframe(
+            REQUEST_LATENCIES.percentiles(),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                column: st.column_config.NumberColumn(format="%.1f")
+                for column in ("p50 (ms)", "p95 (ms)", "p99 (ms)", "max (ms)")
+            },
+        )
+        st.download_button(
+            "📥 Exporter les percentiles et histogrammes (JSON)",
+            REQUEST_LATENCIES.export(),
+            file_name="latences.json",
+            mime="application/json",
+        )
+
+
+def show_startup_report(report):
+    """Détail du démarrage du modèle dans la barre latérale (suivi des régressions)"""
+    total = sum(row["Temps total (s)"] for row in report)
+    with st.sidebar.expander(f"⏱️ Démarrage du modèle : {total:.1f} s"):
+        st.dataframe(
+            report,
+            use_container_width=True,
+            hide_index=True,
+            column_order=("Étape", "Éléments", "Temps total (s)"),
+            column_config={"Temps total (s)": st.column_config.NumberColumn(format="%.2f")},
+        )
@@ -0,0 +1,382 @@
+"""
+Détection de véhicules sur des fichiers vidéo (MP4, AVI)
+Fichier : video.py
+
+UTILISATION :
+python video.py dashcam.mp4 --target-fps 5 -o detections.csv
+python video.py route.avi --stride 10 --save annotated.mp4
+python video.py autoroute.mp4 --track --detect-every 3 -o pistes.csv
+python video.py camera_fixe.mp4 --motion-gate --target-fps 5
+python video.py carrefour.mp4 --line 0,0.6,1,0.6 --zone "0.1,0.1 0.4,0.1 0.4,0.4 0.1,0.4" --events passages.csv
+"""
+
+import argparse
+import queue
+import sys
+import threading
+import time
+from dataclasses import dataclass
+
+import cv2
+import numpy as np
+
+from backends import BACKENDS, DEFAULT_BACKEND, load_backend
+from counting import EVENT_COLUMNS, CrossingCounter, build_counters
+from detection import (
+    CONF_FLOOR, DEFAULT_CONF, DEFAULT_PROFILE, IMGSZ, IOU, MODEL_PATH, PROFILES, Detections, predict,
+    to_dataframe,
+)
+from motion import MOTION_THRESHOLD, SKIP, MotionGate
+from render import draw_detections
+from timing import StageTimer
+from tracking import Tracker
+
+# Extensions vidéo acceptées par l'interface
+VIDEO_EXTENSIONS = ["mp4", "avi"]
+
+# Nombre d'images décodées à l'avance par le thread producteur
+FRAME_QUEUE_SIZE = 32
+
+# Images envoyées ensemble au modèle
+VIDEO_BATCH_SIZE = 4
+
+_END = object()
+
+
+@dataclass
+class FrameResult:
+    """Détections d'une image de la vidéo"""
+    index: int           # numéro de l'image dans la vidéo
+    timestamp: float     # position en secondes
+    frame: np.ndarray    # image BGR telle que décodée par OpenCV
+    detections: Detections
+    inferred: bool = True  # False : détections reprises ou propagées, sans inférence
+
+
+def video_info(path):
+    """Nombre d'images, fréquence et dimensions d'une vidéo"""
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Impossible d'ouvrir la vidéo : {path}")
+    try:
+        return {
+            "frames": int(capture.get(cv2.CAP_PROP_FRAME_COUNT)),
+            "fps": capture.get(cv2.CAP_PROP_FPS) or 25.0,
+            "width": int(capture.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(capture.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        capture.release()
+
+
+def frame_stride(fps, stride=1, target_fps=None):
+    """Pas entre deux images analysées : fixé, ou déduit d'une fréquence cible"""
+    if target_fps:
+        return max(1, round(fps / target_fps))
+    return max(1, int(stride))
+
+
+def read_frames(path, stride=1, timer=None, queue_size=FRAME_QUEUE_SIZE, stop_event=None):
+    """Décode la vidéo dans un thread producteur et produit (index, temps, image BGR)
+
+    Les images sautées sont seulement avancées avec `grab()`, sans conversion.
+    """
+    capture = cv2.VideoCapture(path)
+    if not capture.isOpened():
+        raise ValueError(f"Impossible d'ouvrir la vidéo : {path}")
+    fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+    frames = queue.Queue(maxsize=queue_size)
+    stop_event = stop_event or threading.Event()
+
+    def produce():
+        index = 0
+        # Le temps passé sur les images sautées est compté avec l'image suivante analysée
+        skipped_time = 0.0
+        try:
+            while not stop_event.is_set():
+                start = time.perf_counter()
+                if not capture.grab():
+                    break
+                if index % stride == 0:
+                    ok, frame = capture.retrieve()
+                    if not ok:
+                        break
+                    if timer is not None:
+                        timer.add("décodage", skipped_time + time.perf_counter() - start)
+                    skipped_time = 0.0
+                    frames.put((index, index / fps, frame))
+                else:
+                    skipped_time += time.perf_counter() - start
+                index += 1
+        finally:
+            capture.release()
+            frames.put(_END)
+
+    producer = threading.Thread(target=produce, name="video-decode", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = frames.get()
+            if item is _END:
+                break
+            yield item
+    finally:
+        # Arrêt anticipé du consommateur : libérer le producteur bloqué sur la file
+        stop_event.set()
+        while producer.is_alive():
+            try:
+                frames.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def run_timed(run_batch, frames, batch_size, timer, **params):
+    """Exécute le modèle sur des images BGR et répartit le temps mesuré entre les étapes"""
+    start = time.perf_counter()
+    batch_detections = run_batch(frames, batch_size, channels="BGR", **params)
+    elapsed = time.perf_counter() - start
+    # Répartition du temps mesuré selon les durées internes d'ultralytics
+    speeds = [d.speed for d in batch_detections if d.speed]
+    model_ms = sum(sum(speed.values()) for speed in speeds)
+    for stage, key in (("prétraitement", "preprocess"), ("inférence", "inference"),
+                       ("post-traitement", "postprocess")):
+        stage_ms = sum(speed.get(key, 0.0) for speed in speeds)
+        share = stage_ms / model_ms if model_ms else (1.0 if key == "inference" else 0.0)
+        timer.add(stage, elapsed * share, len(frames))
+    return batch_detections
+
+
+def run_gated(run_batch, frames, batch_size, timer, gate=None, **params):
+    """`run_timed` précédé du filtre de mouvement `gate` (motion.MotionGate) s'il est fourni
+
+    Retourne les Détections de chaque image et un booléen indiquant si le
+    modèle a tourné dessus (False : détections précédentes reprises).
+    """
+    if gate is None:
+        return [(detections, True) for detections in
+                run_timed(run_batch, frames, batch_size, timer, **params)]
+    imgsz = params.pop("imgsz", IMGSZ)
+
+    def infer(images, size):
+        return run_timed(run_batch, images, batch_size, timer, imgsz=size, **params)
+
+    return [
+        (detections, action != SKIP)
+        for detections, action in gate.run(infer, frames, imgsz, timer)
+    ]
+
+
+def detect_video(run_batch, path, stride=1, batch_size=VIDEO_BATCH_SIZE, timer=None, gate=None,
+                 **params):
+    """Détecte les véhicules image par image et produit les FrameResult au fil de l'eau
+
+    `run_batch(images, batch_size, **params)` exécute le modèle (ex. `MicroBatcher.run_batch`).
+    Avec `gate` (motion.MotionGate), les images sans mouvement reprennent les
+    détections précédentes.
+    """
+    timer = timer or StageTimer()
+    pending = []
+
+    def flush():
+        frames = [frame for _, _, frame in pending]
+        batch_detections = run_gated(run_batch, frames, batch_size, timer, gate, **params)
+        results = [
+            FrameResult(index, timestamp, frame, detections, inferred)
+            for (index, timestamp, frame), (detections, inferred) in zip(pending, batch_detections)
+        ]
+        pending.clear()
+        return results
+
+    for item in read_frames(path, stride, timer):
+        pending.append(item)
+        if len(pending) >= batch_size:
+            yield from flush()
+    if pending:
+        yield from flush()
+
+
+def track_video(run_batch, path, stride=1, detect_every=1, batch_size=VIDEO_BATCH_SIZE,
+                timer=None, tracker=None, gate=None, **params):
+    """Suit les véhicules et produit un FrameResult par image lue, détections avec identifiants
+
+    Le modèle ne tourne que sur une image lue sur `detect_every` ; entre deux,
+    les pistes sont propagées par le modèle de mouvement. Les images à analyser
+    d'une fenêtre sont envoyées ensemble au modèle, puis le suivi avance dans l'ordre.
+    Avec `gate` (motion.MotionGate), ces images passent d'abord le filtre de mouvement.
+    """
+    timer = timer or StageTimer()
+    tracker = tracker or Tracker()
+    window = []
+    last_index = None
+
+    def flush():
+        nonlocal last_index
+        inferred = [item for position, item in enumerate(window) if position % detect_every == 0]
+        batch_detections = iter(run_gated(
+            run_batch, [frame for _, _, frame in inferred], batch_size, timer, gate, **params
+        ))
+        results = []
+        with timer.stage("suivi", len(window)):
+            for position, (index, timestamp, frame) in enumerate(window):
+                dt = index - last_index if last_index is not None else 1
+                if position % detect_every == 0:
+                    detections, ran = next(batch_detections)
+                    tracks = tracker.update(detections, dt)
+                else:
+                    tracks, ran = tracker.propagate(dt), False
+                results.append(FrameResult(index, timestamp, frame, tracks, ran))
+                last_index = index
+        window.clear()
+        return results
+
+    for item in read_frames(path, stride, timer):
+        window.append(item)
+        if len(window) >= detect_every * batch_size:
+            yield from flush()
+    if window:
+        yield from flush()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Détection de véhicules sur une vidéo")
+    parser.add_argument("video", help="Fichier vidéo (MP4, AVI)")
+    parser.add_argument("-o", "--output", help="Détections par image (.csv, .parquet ou .jsonl)")
+    parser.add_argument("--save", help="Vidéo annotée en sortie (.mp4)")
+    parser.add_argument("--model", default=MODEL_PATH, help="Poids du modèle")
+    parser.add_argument("--backend", choices=BACKENDS, default=DEFAULT_BACKEND, help="Moteur d'inférence")
+    parser.add_argument("--stride", type=int, default=1, help="Analyser une image sur N")
+    parser.add_argument("--target-fps", type=float, help="Fréquence d'analyse visée (remplace --stride)")
+    parser.add_argument("--conf", type=float, default=DEFAULT_CONF, help="Seuil de confiance")
+    parser.add_argument("--iou", type=float, default=IOU, help="Seuil IoU de la NMS")
+    parser.add_argument("--profile", choices=PROFILES, default=DEFAULT_PROFILE,
+                        help="Profil vitesse / précision (taille d'entrée du modèle)")
+    parser.add_argument("--imgsz", type=int, help="Taille d'entrée du modèle (remplace --profile)")
+    parser.add_argument("--batch-size", type=int, default=VIDEO_BATCH_SIZE, help="Images par lot")
+    parser.add_argument("--track", action="store_true", help="Suivre les véhicules (identifiants persistants)")
+    parser.add_argument("--detect-every", type=int, default=1,
+                        help="Avec --track : inférence sur une image lue sur N, pistes propagées entre deux")
+    parser.add_argument("--motion-gate", action="store_true",
+                        help="Caméra fixe : sauter l'inférence sur les images sans mouvement")
+    parser.add_argument("--motion-threshold", type=float, default=MOTION_THRESHOLD,
+                        help="Fraction de pixels changés sous laquelle l'inférence est sautée")
+    parser.add_argument("--line", action="append", default=[],
+                        help="Ligne de comptage x1,y1,x2,y2 (pixels ou relatifs), répétable ; active --track")
+    parser.add_argument("--zone", action="append", default=[],
+                        help="Zone de comptage \"x1,y1 x2,y2 x3,y3 ...\", répétable ; active --track")
+    parser.add_argument("--events", help="Événements de comptage (.csv, .parquet ou .jsonl)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    import pandas as pd
+
+    from detect_batch import OUTPUT_FORMATS, DetectionWriter
+
+    args = parse_args(argv)
+    counter = None
+    info = video_info(args.video)
+    if args.line or args.zone:
+        # Le comptage s'appuie sur les identifiants des pistes
+        args.track = True
+        counter = CrossingCounter(
+            build_counters(args.line, args.zone, info["width"], info["height"])
+        )
+    stride = frame_stride(info["fps"], args.stride, args.target_fps)
+    print(
+        f"{info['frames']} images à {info['fps']:.1f} i/s ({info['width']}x{info['height']}), "
+        f"analyse d'une image sur {stride}",
+        file=sys.stderr,
+    )
+
+    model = load_backend(args.backend, args.model)
+
+    def run_batch(images, batch_size, **params):
+        return predict(model, images, batch_size=batch_size, **params)
+
+    formats = {}
+    for path in (args.output, args.events):
+        if path:
+            formats[path] = OUTPUT_FORMATS.get(path[path.rfind("."):].lower())
+    if None in formats.values():
+        print("Les fichiers de sortie doivent se terminer par .csv, .parquet ou .jsonl", file=sys.stderr)
+        return 2
+    writer = DetectionWriter(args.output, formats[args.output]) if args.output else None
+    events_writer = None
+    if args.events and counter is not None:
+        events_writer = DetectionWriter(args.events, formats[args.events])
+    video_writer = None
+    if args.save:
+        fourcc = cv2.VideoWriter_fourcc(*"mp4v")
+        video_writer = cv2.VideoWriter(
+            args.save, fourcc, info["fps"] / stride, (info["width"], info["height"])
+        )
+
+    timer = StageTimer()
+    gate = MotionGate(args.motion_threshold) if args.motion_gate else None
+    # Le suivi associe aussi les détections faibles (2e passe) : inférence au seuil
+    # plancher, --conf n'est appliqué qu'aux détections écrites et dessinées
+    conf = min(args.conf, CONF_FLOOR) if args.track else args.conf
+    params = {"imgsz": args.imgsz or PROFILES[args.profile], "conf": conf, "iou": args.iou}
+    if args.track:
+        results = track_video(
+            run_batch, args.video, stride, args.detect_every, args.batch_size, timer,
+            gate=gate, **params
+        )
+    else:
+        results = detect_video(
+            run_batch, args.video, stride, args.batch_size, timer, gate, **params
+        )
+    track_ids = set()
+    processed = 0
+    start = time.perf_counter()
+    try:
+        for result in results:
+            shown = result.detections.filter(args.conf)
+            if shown.ids is not None:
+                track_ids.update(shown.ids.tolist())
+            if counter is not None:
+                with timer.stage("comptage"):
+                    events = counter.update(result.detections, result.timestamp, result.index)
+                    if events and events_writer is not None:
+                        events_writer.write(pd.DataFrame(events, columns=EVENT_COLUMNS))
+            with timer.stage("rendu"):
+                if writer is not None:
+                    df = to_dataframe(shown)
+                    df.insert(0, "Temps (s)", result.timestamp)
+                    df.insert(0, "Image", result.index)
+                    writer.write(df)
+                if video_writer is not None:
+                    annotated = draw_detections(result.frame, shown, "BGR")
+                    if counter is not None:
+                        counter.draw(annotated, "BGR")
+                    video_writer.write(annotated)
+            processed += 1
+    except KeyboardInterrupt:
+        print("Interrompu", file=sys.stderr)
+    finally:
+        if writer is not None:
+            writer.close()
+        if events_writer is not None:
+            events_writer.close()
+        if video_writer is not None:
+            video_writer.release()
+
+    elapsed = time.perf_counter() - start
+    print(f"{processed} image(s) analysée(s) en {elapsed:.1f} s "
+          f"({processed / elapsed if elapsed else 0:.1f} images/s)", file=sys.stderr)
+    if gate is not None:
+        stats = gate.stats()
+        print(f"Filtre de mouvement : {stats['fraction sautée']:.1%} d'images sans inférence, "
+              f"{stats['recadrée']} recadrée(s), {stats['complète']} complète(s)", file=sys.stderr)
+    if args.track:
+        print(f"{len(track_ids)} véhicule(s) suivi(s)", file=sys.stderr)
+    if counter is not None:
+        for row in counter.summary():
+            print(f"{row['Compteur']:<10}{row['Classe']:<14}{row['Sens']:<8}{row['Véhicules']:>6}"
+                  f"{row['Véhicules / min']:>9.1f} /min", file=sys.stderr)
+    print(timer.format_report(), file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())